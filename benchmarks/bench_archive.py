@@ -0,0 +1,68 @@
+# .tar.gz creation on a mixed tree (compressible logs, random binaries, many small files):
+# tarfile's single-threaded "w:gz" against archive create with its block-parallel ParallelGzip.
+# Both outputs are read back with tarfile to check they hold the same members.
+# usage: python benchmarks/bench_archive.py [megabytes] [jobs]   (default 256, one per CPU)
+import os
+import sys
+import time
+import random
+import tarfile
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import custom_shell  # noqa: E402
+
+
+# half log text, a quarter random data, a quarter 2 KB source-like files
+def build_tree(root, megabytes):
+    rng = random.Random(7)
+    words = [b'GET', b'POST', b'/api/v1/items', b'200', b'404', b'user=', b'latency_ms=', b'INFO', b'WARN', b'request']
+    os.makedirs(os.path.join(root, 'logs'))
+    os.makedirs(os.path.join(root, 'bin'))
+    os.makedirs(os.path.join(root, 'src'))
+    unit = 1024 * 1024
+    for number in range(megabytes // 2 // 16 or 1):
+        with open(os.path.join(root, 'logs', f'app{number}.log'), 'wb') as f:
+            for _ in range(16 * unit // 64):
+                f.write(b' '.join(rng.choices(words, k=6)) + b' %d\n' % rng.randrange(10 ** 6))
+    for number in range(megabytes // 4 // 8 or 1):
+        with open(os.path.join(root, 'bin', f'blob{number}'), 'wb') as f:
+            f.write(os.urandom(8 * unit))
+    for number in range(megabytes // 4 * 512):
+        with open(os.path.join(root, 'src', f'module{number}.py'), 'wb') as f:
+            f.write(b'\n'.join(b'def f%d(x):\n    return x * %d' % (n, n) for n in range(64)))
+
+
+def measure(function):
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+def main():
+    megabytes = int(sys.argv[1]) if len(sys.argv) > 1 else 256
+    jobs = int(sys.argv[2]) if len(sys.argv) > 2 else custom_shell.ARCHIVE_WORKERS
+    with tempfile.TemporaryDirectory(dir=os.environ.get('BENCH_DIR')) as base:
+        root = os.path.join(base, 'tree')
+        build_tree(root, megabytes)
+        single_path, parallel_path = os.path.join(base, 'single.tar.gz'), os.path.join(base, 'parallel.tar.gz')
+        create = custom_shell.Bash()._Bash__archive_create
+
+        def single():
+            with tarfile.open(single_path, 'w:gz', compresslevel=custom_shell.ARCHIVE_LEVEL) as bundle:
+                bundle.add(root, arcname='tree')
+
+        single_time = measure(single)
+        os.chdir(base)
+        parallel_time = measure(lambda: create('tgz', parallel_path, ['tree'], jobs, custom_shell.ARCHIVE_LEVEL))
+        with tarfile.open(single_path) as one, tarfile.open(parallel_path) as other:
+            assert one.getnames() == other.getnames()
+        size = sum(os.path.getsize(os.path.join(directory, name)) for directory, _, names in os.walk(root) for name in names)
+        print(f'{size / 1e6:.0f} MB tree, {jobs} jobs')
+        print(f"{'compressor':<24} {'time (s)':>9} {'MB/s':>7} {'output (MB)':>12}")
+        for name, elapsed, path in (('tarfile w:gz', single_time, single_path), ('archive create', parallel_time, parallel_path)):
+            print(f'{name:<24} {elapsed:>9.2f} {size / 1e6 / elapsed:>7.0f} {os.path.getsize(path) / 1e6:>12.1f}')
+
+
+if __name__ == '__main__':
+    main()
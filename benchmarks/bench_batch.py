@@ -0,0 +1,44 @@
+# Commands per second through the interactive loop (banner, readline, prompt per command) against
+# batch mode (script file, no banner or prompt). Both run the same dispatch.
+# usage: python benchmarks/bench_batch.py [commands]
+import os
+import sys
+import time
+import tempfile
+import subprocess
+
+SHELL = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'custom_shell.py')
+COMMANDS = ['pwd', 'echo hello world', 'date', 'whoami', 'cd .', 'hash', 'ls | grep py | wc -l']
+
+
+def run(arguments, stdin, env):
+    start = time.perf_counter()
+    subprocess.run([sys.executable, SHELL] + arguments, stdin=stdin, stdout=subprocess.DEVNULL,
+                   stderr=subprocess.DEVNULL, env=env, check=False)
+    return time.perf_counter() - start
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    env = dict(os.environ, COMPUTERNAME=os.environ.get('COMPUTERNAME', 'bench'))
+    with tempfile.NamedTemporaryFile('w', suffix='.sh', delete=False) as script:
+        for i in range(count):
+            script.write(COMMANDS[i % len(COMMANDS)] + '\n')
+        script.write('exit\n')
+        path = script.name
+    try:
+        with open(path) as stdin:
+            interactive = run(['-i'], stdin, env)
+        batch = run([path], subprocess.DEVNULL, env)
+        with open(path) as stdin:
+            piped = run([], stdin, env)
+        print(f'{count} commands')
+        for name, elapsed in (('interactive (-i < script)', interactive), ('batch (script file)', batch),
+                              ('batch (piped stdin)', piped)):
+            print(f'{name:<28} {elapsed:7.2f} s  {count / elapsed:9.0f} commands/s')
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
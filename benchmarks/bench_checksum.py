@@ -0,0 +1,67 @@
+# checksum throughput in GB/s over three file-size distributions: a one-thread read()+update loop,
+# the builtin's thread pool (readinto / mmap), and a rerun answered from the digest cache.
+# usage: python benchmarks/bench_checksum.py [megabytes per distribution] [algorithm]   (default 512 sha256)
+import os
+import sys
+import time
+import hashlib
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import custom_shell  # noqa: E402
+
+DISTRIBUTIONS = (('4 KB files', 4 * 1024), ('1 MB files', 1024 * 1024), ('64 MB files', 64 * 1024 * 1024))
+
+
+def build_files(root, file_size, total):
+    os.makedirs(root)
+    block = os.urandom(min(file_size, 1024 * 1024))
+    paths = []
+    for number in range(max(total // file_size, 1)):
+        path = os.path.join(root, f'f{number}')
+        with open(path, 'wb') as f:
+            for _ in range(file_size // len(block)):
+                f.write(block)
+        paths.append(path)
+    past = time.time() - 3600  # older than CHECKSUM_RACY_SECONDS, so the digests are cached
+    for path in paths:
+        os.utime(path, (past, past))
+    return paths
+
+
+def sequential(paths, algorithm):
+    for path in paths:
+        digest = hashlib.new(algorithm)
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        digest.hexdigest()
+
+
+def measure(function, size):
+    start = time.perf_counter()
+    function()
+    return size / (time.perf_counter() - start) / 1e9
+
+
+def main():
+    megabytes = int(sys.argv[1]) if len(sys.argv) > 1 else 512
+    algorithm = sys.argv[2] if len(sys.argv) > 2 else 'sha256'
+    with tempfile.TemporaryDirectory(dir=os.environ.get('BENCH_DIR')) as base:
+        custom_shell.INDEX_DIR = os.path.join(base, 'cache')
+        bash = custom_shell.Bash()
+        hash_files = lambda paths, cache: list(bash._Bash__hash_files(paths, algorithm, cache))
+        print(f'{algorithm}, {megabytes} MB per distribution, {custom_shell.CHECKSUM_WORKERS} threads (page cache warm)')
+        print(f"{'files':<12} {'1 thread GB/s':>14} {'pool GB/s':>10} {'cached GB/s':>12}")
+        for name, file_size in DISTRIBUTIONS:
+            paths = build_files(os.path.join(base, name.split()[0]), file_size, megabytes * 1024 * 1024)
+            size = file_size * len(paths)
+            sequential(paths, algorithm)  # warm the page cache
+            one = measure(lambda: sequential(paths, algorithm), size)
+            pool = measure(lambda: hash_files(paths, True), size)
+            cached = measure(lambda: hash_files(paths, True), size)
+            print(f'{name:<12} {one:>14.2f} {pool:>10.2f} {cached:>12.1f}')
+
+
+if __name__ == '__main__':
+    main()
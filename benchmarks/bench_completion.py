@@ -0,0 +1,70 @@
+# Tab-completion latency on a synthetic large directory: the old listdir-per-callback completer
+# against the shell's mtime-cached, bisect-based index.
+# usage: python benchmarks/bench_completion.py [entries]
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from custom_shell import Bash
+
+PREFIXES = ['file_1', 'file_12', 'file_123', 'dir_4', 'zzz']
+
+
+# the old completer: readline calls it once per state and it lists the directory every time
+def old_completer(text, state):
+    options = [f for f in os.listdir(os.getcwd()) if f.startswith(text)]
+    return options[state] if state < len(options) else None
+
+
+# what one Tab press costs: call the completer for state 0, 1, 2, ... until it returns None
+def press_tab(completer, text):
+    state = 0
+    while completer(text, state) is not None:
+        state += 1
+    return state
+
+
+def main():
+    entries = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    root = tempfile.mkdtemp(prefix='bench_completion_')
+    cwd = os.getcwd()
+    try:
+        for i in range(entries):
+            if i % 100 == 0:
+                os.mkdir(os.path.join(root, f'dir_{i}'))
+            else:
+                open(os.path.join(root, f'file_{i}'), 'w').close()
+        os.chdir(root)
+
+        complete = Bash()._Bash__complete_matches
+        start = time.perf_counter()
+        complete('x')
+        cold = time.perf_counter() - start
+
+        print(f'{entries} entries, index build (first Tab): {cold * 1000:.1f} ms')
+        print(f"{'prefix':<10} {'matches':>8} {'old (ms)':>10} {'indexed (ms)':>13}")
+        for prefix in PREFIXES:
+            start = time.perf_counter()
+            matches = press_tab(old_completer, prefix) if entries <= 20_000 or len(prefix) > 7 else None
+            old = time.perf_counter() - start
+            start = time.perf_counter()
+            indexed_matches = len(complete(prefix))
+            indexed = time.perf_counter() - start
+            old_text = f'{old * 1000:>10.1f}' if matches is not None else f"{'skipped':>10}"
+            print(f'{prefix:<10} {indexed_matches:>8} {old_text} {indexed * 1000:>13.3f}')
+
+        # nested path completion reuses the same per-directory index
+        os.chdir(os.path.dirname(root))
+        start = time.perf_counter()
+        nested = len(complete(os.path.basename(root) + '/file_99'))
+        print(f'nested "<dir>/file_99": {nested} matches in {(time.perf_counter() - start) * 1000:.3f} ms')
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(root)
+
+
+if __name__ == '__main__':
+    main()
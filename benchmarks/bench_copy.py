@@ -0,0 +1,62 @@
+# cp throughput: shutil.copytree/shutil.copy (the old cp) against the shell's engine, on a tree of
+# many small files and on a few huge files.
+# usage: python benchmarks/bench_copy.py [small_files] [huge_files] [huge_mb]
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from custom_shell import Bash
+
+
+def make_small_tree(root, count):
+    for i in range(count):
+        directory = os.path.join(root, f'd{i // 500}')
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f'f{i}.txt'), 'wb') as f:
+            f.write(os.urandom(4096))
+
+
+def make_huge_files(root, count, megabytes):
+    os.makedirs(root)
+    block = os.urandom(1024 * 1024)
+    for i in range(count):
+        with open(os.path.join(root, f'huge{i}.bin'), 'wb') as f:
+            for _ in range(megabytes):
+                f.write(block)
+
+
+def timed(function):
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+def main():
+    small = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    huge = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    huge_mb = int(sys.argv[3]) if len(sys.argv) > 3 else 256
+    work = tempfile.mkdtemp(prefix='bench_copy_')
+    copy = Bash()._Bash__copy_file
+    stdout = sys.stdout
+    try:
+        make_small_tree(os.path.join(work, 'small'), small)
+        make_huge_files(os.path.join(work, 'huge'), huge, huge_mb)
+        print(f"{'workload':<28} {'shutil (s)':>10} {'cp engine (s)':>14} {'speedup':>8}")
+        for name, size in (('small', f'{small} x 4 KiB files'), ('huge', f'{huge} x {huge_mb} MiB files')):
+            source = os.path.join(work, name)
+            baseline = timed(lambda: shutil.copytree(source, os.path.join(work, f'{name}_shutil')))
+            with open(os.devnull, 'w') as devnull:
+                sys.stdout = devnull
+                engine = timed(lambda: copy(['cp', '-r', source, os.path.join(work, f'{name}_engine')]))
+                sys.stdout = stdout
+            print(f'{size:<28} {baseline:>10.2f} {engine:>14.2f} {baseline / engine:>7.1f}x')
+    finally:
+        sys.stdout = stdout
+        shutil.rmtree(work)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+# du over a generated tree: a full scan, a repeat run served by the mtime-validated cache, and a
+# repeat run after one directory changed. Compared with os.walk + lstat as a baseline.
+# usage: python benchmarks/bench_du.py [files]   (default 200000)
+import os
+import sys
+import time
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import custom_shell  # noqa: E402
+
+FILES_PER_DIR = 100
+DIRS_PER_LEVEL = 50
+
+
+def build_tree(root, files):
+    made = 0
+    for top in range(DIRS_PER_LEVEL):
+        for leaf in range(DIRS_PER_LEVEL):
+            if made >= files:
+                return
+            directory = os.path.join(root, f'd{top}', f'd{leaf}')
+            os.makedirs(directory)
+            for index in range(min(FILES_PER_DIR, files - made)):
+                with open(os.path.join(directory, f'f{index}'), 'wb') as f:
+                    f.write(b'x' * (index * 97 % 8192))
+            made += FILES_PER_DIR
+
+
+def walk_usage(root):
+    total = 0
+    for directory, _, names in os.walk(root):
+        total += sum(os.lstat(os.path.join(directory, name)).st_blocks for name in names)
+    return total * 512
+
+
+def measure(function):
+    start = time.perf_counter()
+    result = function()
+    return time.perf_counter() - start, result
+
+
+def main():
+    files = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    with tempfile.TemporaryDirectory(dir=os.environ.get('BENCH_DIR')) as base:
+        root = os.path.join(base, 'tree')
+        build_tree(root, files)
+        custom_shell.INDEX_DIR = os.path.join(base, 'cache')
+        sizes = custom_shell.Bash()._Bash__du_sizes
+        walk, _ = measure(lambda: walk_usage(root))
+        full, first = measure(lambda: sizes(root, rescan=True))
+        cached, second = measure(lambda: sizes(root))
+        assert first == second
+        with open(os.path.join(root, 'd0', 'd0', 'new'), 'wb') as f:
+            f.write(b'y' * 65536)
+        changed, third = measure(lambda: sizes(root))
+        assert third[root] > first[root]
+        print(f'{files} files in {len(first)} directories, {custom_shell.DU_WORKERS} threads')
+        print(f"{'run':<28} {'time (s)':>9}")
+        for name, elapsed in (('os.walk + lstat', walk), ('du, full scan', full),
+                              ('du, cached', cached), ('du, one directory changed', changed)):
+            print(f'{name:<28} {elapsed:>9.3f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+# grep -r over a generated source tree: a sequential scan, the process-pool scan, and a search
+# through the trigram index (first run builds it, second run only checks mtimes).
+# usage: python benchmarks/bench_grep.py [megabytes]   (default 200)
+import os
+import sys
+import time
+import random
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import custom_shell  # noqa: E402
+
+FILE_SIZE = 64 * 1024
+FILES_PER_DIR = 100
+NEEDLE = b'needle_in_haystack'
+WORDS = [b'alpha', b'beta', b'gamma', b'delta', b'return', b'import', b'self', b'value', b'index', b'print']
+
+
+# files of random word lines; every 50th file holds the needle once
+def build_tree(root, megabytes):
+    rng = random.Random(1)
+    count = megabytes * 1024 * 1024 // FILE_SIZE
+    for number in range(count):
+        directory = os.path.join(root, f'd{number // FILES_PER_DIR}')
+        os.makedirs(directory, exist_ok=True)
+        lines, size = [], 0
+        while size < FILE_SIZE:
+            line = b' '.join(rng.choices(WORDS, k=8)) + b'\n'
+            lines.append(line)
+            size += len(line)
+        if number % 50 == 0:
+            lines[len(lines) // 2] = b'x = "' + NEEDLE + b'"\n'
+        with open(os.path.join(directory, f'f{number}.py'), 'wb') as f:
+            f.writelines(lines)
+    return count
+
+
+def measure(bash, args):
+    start = time.perf_counter()
+    matches = sum(1 for _ in bash._Bash__grep_lines(args))
+    return time.perf_counter() - start, matches
+
+
+def main():
+    megabytes = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    with tempfile.TemporaryDirectory(dir=os.environ.get('BENCH_DIR')) as base:
+        root = os.path.join(base, 'tree')
+        files = build_tree(root, megabytes)
+        custom_shell.INDEX_DIR = os.path.join(base, 'index')
+        bash = custom_shell.Bash()
+        args = ['-rn', NEEDLE.decode(), root]
+        print(f'{files} files, {megabytes} MB, {custom_shell.GREP_WORKERS} workers')
+
+        parallel_bytes = custom_shell.GREP_PARALLEL_BYTES
+        custom_shell.GREP_PARALLEL_BYTES = float('inf')
+        measure(bash, args)  # warm the page cache
+        sequential, expected = measure(bash, args)
+        custom_shell.GREP_PARALLEL_BYTES = parallel_bytes
+        parallel, matches = measure(bash, args)
+        assert matches == expected
+        build, matches = measure(bash, ['--index'] + args)
+        assert matches == expected
+        indexed, matches = measure(bash, ['--index'] + args)
+        assert matches == expected
+        # -v and -c must not be narrowed by the index
+        small = [os.path.join(root, 'd0')]
+        for flags in (['-rv'], ['-rc'], ['-rvc']):
+            plain = list(bash._Bash__grep_lines(flags + [NEEDLE.decode()] + small))
+            assert list(bash._Bash__grep_lines(['--index'] + flags + [NEEDLE.decode()] + small)) == plain, flags
+
+        print(f"{'search':<22} {'time (s)':>9} {'MB/s':>8}")
+        for name, elapsed in (('sequential', sequential), ('parallel', parallel),
+                              ('index (build)', build), ('index (warm)', indexed)):
+            print(f'{name:<22} {elapsed:>9.3f} {megabytes / elapsed:>8.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+# ls on one large directory: the old listdir + isfile + print-per-entry loop against the scandir
+# based ls, in column layout, one name per line (piped) and long format. Output goes to /dev/null.
+# usage: python benchmarks/bench_ls.py [entries ...]   (default 100000)
+import os
+import sys
+import time
+import tempfile
+import contextlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from custom_shell import Bash  # noqa: E402
+
+SUBDIRS = 100
+
+
+def build_directory(root, entries):
+    fd = os.open(root, os.O_RDONLY)
+    try:
+        for index in range(entries - SUBDIRS):
+            os.close(os.open(f'file_{index}.txt', os.O_WRONLY | os.O_CREAT, 0o644, dir_fd=fd))
+        for index in range(SUBDIRS):
+            os.mkdir(f'dir_{index}', dir_fd=fd)
+    finally:
+        os.close(fd)
+
+
+# the ls this shell shipped before: one stat and one print per entry
+def old_ls(bash, root):
+    for item in os.listdir(root):
+        if not os.path.isfile(os.path.join(root, item)):
+            print(bash.color_text(item, 'purple'))
+            continue
+        print(item)
+
+
+def measure(function):
+    with open(os.devnull, 'w') as null, contextlib.redirect_stdout(null):
+        start = time.perf_counter()
+        function()
+        sys.stdout.flush()
+        return time.perf_counter() - start
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [100_000]
+    bash = Bash()
+    write = lambda args, columns=None: bash._Bash__write_lines(bash._Bash__list_lines(args, columns), None)
+    with tempfile.TemporaryDirectory(dir=os.environ.get('BENCH_DIR')) as base:
+        print(f"{'entries':>8} {'old (s)':>8} {'columns (s)':>12} {'piped (s)':>10} {'-l (s)':>7}")
+        for entries in sizes:
+            root = tempfile.mkdtemp(dir=base)
+            build_directory(root, entries)
+            baseline = measure(lambda: old_ls(bash, root))
+            columns = measure(lambda: write([root], 120))
+            piped = measure(lambda: write([root]))
+            long = measure(lambda: write(['-l', root]))
+            print(f'{entries:>8} {baseline:>8.3f} {columns:>12.3f} {piped:>10.3f} {long:>7.3f}')
+
+
+if __name__ == '__main__':
+    main()
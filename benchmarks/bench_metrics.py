@@ -0,0 +1,40 @@
+# CPU cost of the background metrics sampler: the time of one sample, and the share of one CPU
+# the sampler thread uses while the shell is idle. Exits with status 1 if that share reaches 1%.
+# usage: python benchmarks/bench_metrics.py [seconds] [interval]
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import custom_shell  # noqa: E402
+from custom_shell import Bash  # noqa: E402
+
+LIMIT = 1.0  # percent of one CPU
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 10.0
+    custom_shell.METRICS_INTERVAL = float(sys.argv[2]) if len(sys.argv) > 2 else custom_shell.METRICS_INTERVAL
+    bash = Bash()
+
+    sample = bash._Bash__sample_metrics
+    sample()
+    count = 200
+    start = time.perf_counter()
+    for _ in range(count):
+        sample()
+    per_sample = (time.perf_counter() - start) / count
+    print(f'one sample: {per_sample * 1e3:.3f} ms  '
+          f'({per_sample * 100 / custom_shell.METRICS_INTERVAL:.3f}% of a CPU at {custom_shell.METRICS_INTERVAL:g}s)')
+
+    # the main thread only sleeps, so process CPU time here is the sampler thread's
+    before_cpu, before_wall = time.process_time(), time.perf_counter()
+    bash._Bash__start_metrics()
+    time.sleep(seconds)
+    share = (time.process_time() - before_cpu) * 100 / (time.perf_counter() - before_wall)
+    print(f'sampler thread over {seconds:g}s: {share:.3f}% of a CPU (limit {LIMIT}%)')
+    sys.exit(0 if share < LIMIT else 1)
+
+
+if __name__ == '__main__':
+    main()
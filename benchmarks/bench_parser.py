@@ -0,0 +1,64 @@
+# Command line parsing: the old whitespace split + substring scans against a cold
+# parse_command_line() and a cached one, then a random fuzz pass that checks the parser only
+# ever fails with ParseError.
+# usage: python benchmarks/bench_parser.py [iterations] [fuzz cases]
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from custom_shell import ParseError, parse_command_line  # noqa: E402
+
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'parser_corpus.txt')
+ALPHABET = 'ab 12\t"\'\\|&;<>#$`\n-'
+
+
+# what execute() did per line before the parser
+def split_parse(line):
+    if '|' in line:
+        return [part.split() for part in line.split('|')]
+    parts = line.split(' ')
+    redirect = '>' in line or '>>' in line or '<' in line
+    background = line.endswith('&')
+    return [part.replace('"', '') for part in parts], redirect, background
+
+
+def measure(function, lines, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for line in lines:
+            function(line)
+    elapsed = time.perf_counter() - start
+    return elapsed / (iterations * len(lines)) * 1e6
+
+
+def cold_parse(line):
+    parse_command_line.cache_clear()
+    return parse_command_line(line)
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    fuzz_cases = int(sys.argv[2]) if len(sys.argv) > 2 else 50000
+    with open(CORPUS) as f:
+        lines = [line.rstrip('\n') for line in f if line.strip()]
+
+    print(f'{len(lines)} corpus lines x {iterations}')
+    for name, function in (('split (old)', split_parse), ('parse (cold)', cold_parse),
+                           ('parse (cached)', parse_command_line)):
+        print(f'{name:<16} {measure(function, lines, iterations):8.2f} us/line')
+
+    rng = random.Random(12)
+    failures = 0
+    for _ in range(fuzz_cases):
+        line = ''.join(rng.choice(ALPHABET) for _ in range(rng.randint(0, 24)))
+        try:
+            parse_command_line(line)
+        except ParseError:
+            failures += 1
+    print(f'fuzz: {fuzz_cases} random lines, {failures} syntax errors, no other exceptions')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+# Compares spawn-per-stage pipelines (one Popen per stage, the old __run_pipe behaviour)
+# against the shell's in-process builtin stages.
+# usage: python benchmarks/bench_pipeline.py [lines] [repeats]
+import os
+import sys
+import time
+import subprocess
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from custom_shell import Bash
+
+PIPELINES = [
+    'cat {file} | grep ERROR',
+    'cat {file} | sort | uniq',
+    'cat {file} | grep -v INFO | cut -d , -f 2 | head -n 20',
+    'cat {file} | wc -l',
+]
+
+
+# the old approach: every stage is a separate OS process
+def spawn_per_stage(command_line):
+    stages = [part.split() for part in command_line.split('|')]
+    with open(os.devnull, 'wb') as devnull:
+        previous = None
+        processes = []
+        for index, stage in enumerate(stages):
+            last = index == len(stages) - 1
+            process = subprocess.Popen(stage, stdin=previous.stdout if previous else None,
+                                       stdout=devnull if last else subprocess.PIPE)
+            if previous:
+                previous.stdout.close()
+            processes.append(process)
+            previous = process
+        for process in processes:
+            process.wait()
+
+
+def timed(function, command_line, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        function(command_line)
+    return (time.perf_counter() - start) / repeats
+
+
+def main():
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    with tempfile.NamedTemporaryFile('w', suffix='.log', delete=False) as f:
+        for i in range(lines):
+            f.write(f"{'ERROR' if i % 7 == 0 else 'INFO'},{i % 97},message {i}\n")
+        path = f.name
+
+    bash = Bash()
+    run_pipe = bash.execute
+    stdout = sys.stdout
+    try:
+        print(f'{lines} lines, {repeats} runs each')
+        print(f"{'pipeline':<60} {'spawn (ms)':>11} {'in-proc (ms)':>13} {'speedup':>8}")
+        for template in PIPELINES:
+            command_line = template.format(file=path)
+            spawned = timed(spawn_per_stage, command_line, repeats)
+            with open(os.devnull, 'w') as devnull:
+                sys.stdout = devnull
+                in_process = timed(run_pipe, command_line, repeats)
+                sys.stdout = stdout
+            print(f'{template:<60} {spawned * 1000:>11.2f} {in_process * 1000:>13.2f} {spawned / in_process:>7.1f}x')
+    finally:
+        sys.stdout = stdout
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+# Process lookups: a psutil.process_iter pass per command (the old top/kill) against the shell's
+# indexed /proc snapshot. Pass a spawn count to approximate a busy host.
+# usage: python benchmarks/bench_process_table.py [spawn] [lookups]
+import os
+import sys
+import time
+import subprocess
+
+import psutil
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from custom_shell import Bash
+
+
+# the old "kill <name>": scan every process for each lookup
+def scan_for(name):
+    return [proc.info['pid'] for proc in psutil.process_iter(['pid', 'name']) if name in (proc.info['name'] or '')]
+
+
+def main():
+    spawn = int(sys.argv[1]) if len(sys.argv) > 1 else 0
+    lookups = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    children = [subprocess.Popen(['sleep', '600']) for _ in range(spawn)]
+    try:
+        bash = Bash()
+        read_table = bash._Bash__read_process_table
+        match = bash._Bash__match_processes
+
+        start = time.perf_counter()
+        count = sum(1 for _ in psutil.process_iter(['pid', 'name', 'status']))
+        iterate = time.perf_counter() - start
+
+        start = time.perf_counter()
+        table = read_table()
+        snapshot = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(lookups):
+            scan_for('sleep')
+        scanned = (time.perf_counter() - start) / lookups
+
+        bash._Bash__process_table(max_age=0)
+        start = time.perf_counter()
+        for _ in range(lookups):
+            match('sleep')
+        indexed = (time.perf_counter() - start) / lookups
+
+        print(f"{count} processes ({len(table['rows'])} in snapshot), {lookups} name lookups")
+        print(f'full pass:   psutil.process_iter {iterate * 1000:8.1f} ms   /proc snapshot {snapshot * 1000:8.1f} ms')
+        print(f'per lookup:  scan                {scanned * 1000:8.1f} ms   indexed        {indexed * 1000:8.3f} ms')
+    finally:
+        for child in children:
+            child.kill()
+            child.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+# Recursive delete: shutil.rmtree against the shell's parallel rm -r engine on identical trees.
+# usage: python benchmarks/bench_remove.py [files ...]   (default 100000; try 1000000 on a fast disk)
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from custom_shell import Bash  # noqa: E402
+
+FILES_PER_DIR = 200
+DIRS_PER_LEVEL = 50
+
+
+# files spread over two levels of directories, FILES_PER_DIR per leaf
+def build_tree(root, files):
+    made = 0
+    for top in range(DIRS_PER_LEVEL):
+        for leaf in range(DIRS_PER_LEVEL):
+            if made >= files:
+                return
+            directory = os.path.join(root, f'd{top}', f'd{leaf}')
+            os.makedirs(directory)
+            fd = os.open(directory, os.O_RDONLY)
+            try:
+                for index in range(min(FILES_PER_DIR, files - made)):
+                    os.close(os.open(f'f{index}', os.O_WRONLY | os.O_CREAT, 0o644, dir_fd=fd))
+            finally:
+                os.close(fd)
+            made += FILES_PER_DIR
+    raise ValueError(f'at most {DIRS_PER_LEVEL ** 2 * FILES_PER_DIR} files')
+
+
+def measure(remove, files, base):
+    root = tempfile.mkdtemp(dir=base)
+    build_tree(root, files)
+    os.sync()
+    start = time.perf_counter()
+    remove(root)
+    elapsed = time.perf_counter() - start
+    assert not os.path.exists(root)
+    return elapsed
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [100_000]
+    remove_tree = Bash()._Bash__remove_tree
+    with tempfile.TemporaryDirectory(dir=os.environ.get('BENCH_DIR')) as base:
+        print(f"{'files':>9} {'rmtree (s)':>11} {'rm -r (s)':>10} {'speedup':>8}")
+        for files in sizes:
+            baseline = measure(shutil.rmtree, files, base)
+            parallel = measure(remove_tree, files, base)
+            print(f'{files:>9} {baseline:>11.2f} {parallel:>10.2f} {baseline / parallel:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+# Per-command latency: a cold "python -m custom_shell -c" start against shell_client.py talking to
+# a warm "custom_shell.py --serve", and against the client's run() called in-process (the server's
+# own share: connect, fork, run, reply).
+# usage: python benchmarks/bench_server.py [runs]   (default 50)
+import os
+import sys
+import time
+import tempfile
+import subprocess
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+import shell_client  # noqa: E402
+
+COMMAND = 'pwd'
+
+
+def median_ms(function, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return sorted(times)[len(times) // 2] * 1000
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    environment = dict(os.environ, IIUI_NO_BANNER='1')
+    with tempfile.TemporaryDirectory() as base:
+        path = os.path.join(base, 'shell.sock')
+        server = subprocess.Popen([sys.executable, os.path.join(ROOT, 'custom_shell.py'), '--serve', '--socket', path],
+                                  cwd=ROOT, env=environment, stderr=subprocess.DEVNULL)
+        try:
+            while not os.path.exists(path):
+                time.sleep(0.01)
+            quiet = {'cwd': ROOT, 'env': environment, 'stdout': subprocess.DEVNULL}
+            cold = median_ms(lambda: subprocess.run([sys.executable, '-m', 'custom_shell', '-c', COMMAND], **quiet), runs)
+            client = median_ms(lambda: subprocess.run([sys.executable, os.path.join(ROOT, 'shell_client.py'),
+                                                       '--socket', path, COMMAND], **quiet), runs)
+            with open(os.devnull, 'w') as null:
+                saved = os.dup(1)
+                os.dup2(null.fileno(), 1)
+                try:
+                    warm = median_ms(lambda: shell_client.run(COMMAND, path), runs)
+                finally:
+                    os.dup2(saved, 1)
+                    os.close(saved)
+        finally:
+            server.terminate()
+            server.wait()
+    print(f"{'invocation':<32} {'median (ms)':>12}")
+    print(f"{'cold: python -m custom_shell -c':<32} {cold:>12.1f}")
+    print(f"{'warm: shell_client.py':<32} {client:>12.1f}")
+    print(f"{'warm: in-process client':<32} {warm:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
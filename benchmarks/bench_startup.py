@@ -0,0 +1,77 @@
+# Time from launching the interactive shell to its first prompt, against a bare interpreter, plus
+# the slowest imports from -X importtime. "python custom_shell.py" compiles the whole file on
+# every start (a __main__ script never uses __pycache__); "python -m custom_shell" and the
+# iiui_shell.py launcher load the cached bytecode. Exits with status 1 if the launcher's median
+# (the documented entry point) exceeds the target.
+# usage: python benchmarks/bench_startup.py [runs] [--banner]
+import os
+import sys
+import time
+import tempfile
+import statistics
+import subprocess
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+SHELL = os.path.join(ROOT, 'custom_shell.py')
+LAUNCHER = os.path.join(ROOT, 'iiui_shell.py')
+TARGET = 0.050  # seconds to first prompt
+
+
+# seconds until the prompt's "$ " arrives on stdout
+def first_prompt(launch, arguments, env):
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable] + launch + ['-i'] + arguments, stdin=subprocess.PIPE, cwd=ROOT,
+                               stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, env=env)
+    seen = b''
+    while b'$ ' not in seen:
+        chunk = os.read(process.stdout.fileno(), 65536)
+        if not chunk:
+            raise RuntimeError('shell exited before its first prompt')
+        seen += chunk
+    elapsed = time.perf_counter() - start
+    process.communicate(b'exit\n')
+    return elapsed
+
+
+def bare_interpreter(env):
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-c', 'pass'], env=env, check=True)
+    return time.perf_counter() - start
+
+
+# (self microseconds, module) of the ten most expensive imports, whoever made them
+def slowest_imports(env):
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-m', 'custom_shell', '-c', 'exit'],
+                            capture_output=True, text=True, env=env, cwd=ROOT)
+    rows = []
+    for line in result.stderr.splitlines():
+        if line.startswith('import time:') and '|' in line:
+            own, _, name = line[len('import time:'):].split('|')
+            if own.strip().isdigit():
+                rows.append((int(own), name.strip()))
+    return sorted(rows, reverse=True)[:10]
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 and sys.argv[1].isdigit() else 20
+    arguments = [] if '--banner' in sys.argv else ['--no-banner']
+    with tempfile.TemporaryDirectory() as home:
+        env = dict(os.environ, COMPUTERNAME=os.environ.get('COMPUTERNAME', 'bench'),
+                   IIUI_HISTFILE=os.path.join(home, 'history'))
+        subprocess.run([sys.executable, '-m', 'py_compile', SHELL], check=True)  # make sure the bytecode is cached
+        bare = statistics.median(bare_interpreter(env) for _ in range(runs))
+        script = statistics.median(first_prompt([SHELL], arguments, env) for _ in range(runs))
+        module = statistics.median(first_prompt(['-m', 'custom_shell'], arguments, env) for _ in range(runs))
+        prompt = statistics.median(first_prompt([LAUNCHER], arguments, env) for _ in range(runs))
+        print(f'python -c pass            {bare * 1e3:7.1f} ms')
+        print(f'python custom_shell.py    {script * 1e3:7.1f} ms to first prompt')
+        print(f'python -m custom_shell    {module * 1e3:7.1f} ms to first prompt')
+        print(f'python iiui_shell.py      {prompt * 1e3:7.1f} ms to first prompt  (target {TARGET * 1e3:.0f} ms)')
+        print('\nslowest imports (self time):')
+        for microseconds, name in slowest_imports(env):
+            print(f'  {microseconds / 1e3:7.1f} ms  {name}')
+    sys.exit(0 if prompt <= TARGET else 1)
+
+
+if __name__ == '__main__':
+    main()
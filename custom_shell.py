@@ -1,53 +1,615 @@
 import os
+import functools
+import shlex
+import array
+import atexit
+import contextlib
+import io
+import codecs
+import re
+import getopt
+import itertools
+import collections
+import threading
+import errno
+import time
+import bisect
+import mmap
+import stat
 import sys          #for system specification information. used for exit 
 import readline     #for tab completion
-import shutil       #for file operation like move and copy
-import subprocess   #run external commands
+import importlib
 import datetime
 import getpass      #get current user name
-from pathlib import Path
-import psutil       # for disk, processes and ram monitoring
+import signal
+import struct
+import warnings
+
+# Stands in for a module until first use: the first attribute access imports it and rebinds the
+# global name to the real module, so later lookups cost nothing. importlib's per-module import
+# lock makes that first access safe from any thread.
+class LazyModule:
+    def __init__(self, name, alias=None):
+        self._name, self._alias = name, alias or name
+
+    def __getattr__(self, attribute):
+        module = importlib.import_module(self._name)
+        globals()[self._alias] = module
+        return getattr(module, attribute)
+
+
+# imported on first use; together they are most of the shell's startup time
+psutil = LazyModule('psutil')                       # for disk, processes and ram monitoring
+subprocess = LazyModule('subprocess')               # run external commands
+shutil = LazyModule('shutil')                       # for file operation like move and copy
+futures = LazyModule('concurrent.futures', 'futures')
+json = LazyModule('json')
+glob = LazyModule('glob')
+fnmatch = LazyModule('fnmatch')
+pickle = LazyModule('pickle')
+hashlib = LazyModule('hashlib')
+multiprocessing = LazyModule('multiprocessing')
+socket = LazyModule('socket')
+tarfile = LazyModule('tarfile')
+zipfile = LazyModule('zipfile')
+gzip = LazyModule('gzip')
+zlib = LazyModule('zlib')
+
+try:
+    import pwd      # uid -> user name for the process table; not available on Windows
+except ImportError:
+    pwd = None
+try:
+    import grp      # gid -> group name for ls -l; not available on Windows
+except ImportError:
+    grp = None
+try:
+    import resource # per-command max RSS for the time builtin; not available on Windows
+except ImportError:
+    resource = None
+try:
+    import fcntl    # reflink copies; not available on Windows
+except ImportError:
+    fcntl = None
+
+PIPE_CHUNK_SIZE = 64 * 1024  # bytes moved per read/write when streaming pipeline output
+COMPLETION_CACHE_DIRS = 64  # directories whose sorted listings are kept for tab completion
+TREE_WORKERS = min(32, (os.cpu_count() or 1) * 4)  # threads listing directories for tree (I/O bound)
+TREE_PREFETCH = 8  # subdirectory listings fetched ahead of the cursor, per tree level
+CHECKSUM_WORKERS = min(32, (os.cpu_count() or 1) * 2)  # threads hashing files; hashlib releases the GIL
+CHECKSUM_CHUNK_SIZE = 1024 * 1024  # bytes per readinto for files below CHECKSUM_MMAP_SIZE
+CHECKSUM_MMAP_SIZE = 16 * 1024 * 1024  # files this large are hashed straight from an mmap
+CHECKSUM_CACHE_ENTRIES = 200000  # digests kept in the checksum cache, least recently hashed dropped first
+CHECKSUM_RACY_SECONDS = 2  # files modified this recently are not cached: a rewrite may keep their mtime
+CHECKSUM_LENGTHS = {32: 'md5', 40: 'sha1', 56: 'sha224', 64: 'sha256', 96: 'sha384', 128: 'sha512'}  # hex digest length -> algorithm for -c
+ARCHIVE_WORKERS = os.cpu_count() or 1  # threads deflating blocks for archive create (zlib releases the GIL)
+ARCHIVE_BLOCK_SIZE = 1024 * 1024  # bytes of input deflated per block; each block adds a few bytes of output
+ARCHIVE_WINDOW = 32 * 1024  # tail of the previous block given to the next as its deflate dictionary
+ARCHIVE_LEVEL = 6  # default compression level, as gzip
+DU_WORKERS = min(32, (os.cpu_count() or 1) * 4)  # threads scanning directories for du (I/O bound)
+TAIL_BLOCK_SIZE = 64 * 1024  # bytes read per step when tail scans backwards from the end of a file
+TAIL_POLL_INTERVAL = 0.25  # seconds between size checks in tail -f
+COPY_WORKERS = min(32, (os.cpu_count() or 1) * 4)  # threads copying files of a tree (non-rotational disks)
+COPY_CHUNK_SIZE = 8 * 1024 * 1024  # bytes per copy_file_range/sendfile/read call in cp and mv
+COPY_PROGRESS_INTERVAL = 0.5  # seconds between progress line updates for cp and mv
+GREP_WORKERS = os.cpu_count() or 1  # processes scanning files for grep and building the trigram index
+GREP_PARALLEL_BYTES = 16 * 1024 * 1024  # below this much data grep scans in the shell process
+GREP_BATCH_BYTES = 4 * 1024 * 1024  # data handed to one worker task
+GREP_BATCH_FILES = 256  # files handed to one worker task
+GREP_BINARY_PROBE = 8192  # leading bytes checked for NUL; binary files are skipped
+INDEX_DIR = os.path.expanduser(os.environ.get('IIUI_INDEX_DIR', '~/.cache/iiui_shell'))  # grep --index trigram indexes and du caches
+INDEX_MAX_FILE = 32 * 1024 * 1024  # larger files are not indexed (always searched)
+INDEX_COMPACT_RATIO = 0.5  # rewrite the postings once this share of file ids is stale
+SERVER_DIRECTORY = os.environ.get('XDG_RUNTIME_DIR') or f'/tmp/iiui_shell-{os.getuid() if hasattr(os, "getuid") else 0}'  # kept at mode 0700
+SERVER_SOCKET = os.environ.get('IIUI_SOCKET') or os.path.join(SERVER_DIRECTORY, 'iiui_shell.sock')  # --serve default; shell_client.py uses the same
+SERVER_BACKLOG = 64  # pending client connections
+PARALLEL_JOBS = os.cpu_count() or 1  # default job slots for parallel, and for xargs -P 0
+XARGS_MAX_ARGS = 5000  # arguments packed into one xargs command when -n is not given
+LS_STAT_WORKERS = min(32, (os.cpu_count() or 1) * 4)  # threads fetching metadata for ls -l/-S/-t
+LS_PARALLEL_STAT = 1024  # directories with fewer entries are stat'ed in the shell thread
+LS_COLUMN_GAP = 2  # spaces between columns of the ls terminal layout
+REMOVE_WORKERS = min(32, (os.cpu_count() or 1) * 4)  # threads unlinking a tree for rm -r and rmdir
+FICLONE = 0x40049409  # ioctl that asks the filesystem for a reflink (copy-on-write clone)
+PROCESS_SNAPSHOT_TTL = 1.0  # seconds a /proc snapshot is reused by ps, kill, pgrep and pkill
+JOB_USAGE_TTL = 0.5  # seconds the process snapshot may be reused for usage of running jobs
+TOP_INTERVAL = 2.0  # seconds between top refreshes
+TOP_FIRST_SAMPLE = 0.5  # seconds between the two snapshots behind top's first frame
+HISTORY_FILE = os.path.expanduser(os.environ.get('IIUI_HISTFILE', '~/.iiui_shell_history'))
+HISTORY_SIZE = 100_000  # entries kept in memory; older ones are evicted
+HISTORY_FILE_SIZE = 500_000  # entries kept in HISTORY_FILE when it is compacted
+HISTORY_READLINE_SIZE = 5_000  # newest entries also loaded into readline for the arrow keys
+HISTORY_FLUSH_BATCH = 16  # new entries appended to HISTORY_FILE in one write
+HISTORY_FLUSH_INTERVAL = 5.0  # seconds after which pending entries are written even if the batch is not full
+HISTORY_EVENT = re.compile(r'!(!|-?\d+|[^\s!=()\'"|;&<>]+)')  # !!, !n, !-n, !prefix
+PARSE_CACHE_SIZE = 1024  # parsed command lines kept by parse_command_line
+HASH_RECHECK_INTERVAL = 1.0  # seconds between checks of PATH directory mtimes for the command hash
+REDIRECT_BUFFER_SIZE = 256 * 1024  # write buffer for builtin output redirected to a file
+METRICS_INTERVAL = 1.0  # seconds between background samples behind ram, disk and metrics
+METRICS_HISTORY = 3600  # samples kept in the ring buffer (an hour at the default interval)
+METRICS_MOUNT_REFRESH = 60  # samples between re-reads of the mount table
+METRICS_MAGIC = b'IIUIMET1'  # header of the binary export
+METRICS_RECORD = struct.Struct('<dfQQQQQQQ')  # time, cpu%, memory used/available/total, swap used/total, disk read/write bytes
+METRICS_SPARK = '▁▂▃▄▅▆▇█'
+PROMPT_ENVIRONMENT = ('COMPUTERNAME', 'LOGNAME', 'USER', 'LNAME', 'USERNAME')  # variables the prompt is built from
+STATS_BUCKETS = 32  # log2 microsecond latency buckets per command for stats (the last one is open-ended)
+NO_PHASE = contextlib.nullcontext()  # what __phase() returns when --profile is off
+REDIRECT_FLAGS = {
+    '>': os.O_WRONLY | os.O_CREAT | os.O_TRUNC,
+    '>>': os.O_WRONLY | os.O_CREAT | os.O_APPEND,
+    '<': os.O_RDONLY,
+}
+
+# Command line AST. A line is a tuple of AndOr items separated by ";" or "&"; each AndOr is pipelines
+# joined by "&&"/"||" (operators[0] is None); each pipeline is a tuple of Commands joined by "|".
+Command = collections.namedtuple('Command', 'argv redirects')
+Redirect = collections.namedtuple('Redirect', 'fd op target')  # op: '>', '>>', '<' or '>&' (target is an fd)
+AndOr = collections.namedtuple('AndOr', 'pipelines operators background source')
+
+PARSE_OPERATORS = ('&&', '||', '>>', '&>', '>&', ';', '|', '&', '>', '<')  # longest match first
+PARSE_REDIRECTS = {'>': 1, '>>': 1, '>&': 1, '&>': 1, '<': 0}  # default fd of each redirection operator
+PARSE_WORD_BREAK = frozenset(' \t\n;|&<>')
+
+
+class ParseError(ValueError):
+    pass
+
+
+# A word with quoted or escaped characters. It behaves as the plain string everywhere; only glob
+# expansion looks at the type, so rm '*.tmp' names the file "*.tmp" instead of every match.
+class QuotedWord(str):
+    pass
+
+
+# Split a line into (kind, value, start, end) tokens: WORD (quotes and escapes resolved, a QuotedWord
+# if it had any), OP, or REDIRECT with value (fd, operator). Single quotes are literal; in double quotes a backslash only
+# escapes \ " $ and `; outside quotes it escapes any character. "#" at the start of a word ends the line.
+def tokenize(line):
+    tokens, index, length = [], 0, len(line)
+    while index < length:
+        char = line[index]
+        if char in ' \t\n':
+            index += 1
+            continue
+        if char == '#':
+            break
+        start = index
+        while index < length and line[index].isdigit():
+            index += 1
+        if index > start and index < length and line[index] in '<>':
+            operator = next(op for op in ('>>', '>&', '>', '<') if line.startswith(op, index))
+            index += len(operator)
+            tokens.append(('REDIRECT', (int(line[start:index - len(operator)]), operator), start, index))
+            continue
+        index = start
+        operator = next((op for op in PARSE_OPERATORS if line.startswith(op, index)), None)
+        if operator:
+            index += len(operator)
+            if operator in PARSE_REDIRECTS:
+                tokens.append(('REDIRECT', (PARSE_REDIRECTS[operator], operator), start, index))
+            else:
+                tokens.append(('OP', operator, start, index))
+            continue
+
+        chars, quoted = [], False
+        while index < length and line[index] not in PARSE_WORD_BREAK:
+            char = line[index]
+            quoted = quoted or char in '\\\'"'
+            if char == '\\':
+                chars.append(line[index + 1:index + 2])
+                index += 2
+            elif char == "'":
+                end = line.find("'", index + 1)
+                if end == -1:
+                    raise ParseError('unterminated single quote')
+                chars.append(line[index + 1:end])
+                index = end + 1
+            elif char == '"':
+                index += 1
+                while index < length and line[index] != '"':
+                    if line[index] == '\\' and line[index + 1:index + 2] in ('"', '\\', '$', '`'):
+                        index += 1
+                    chars.append(line[index])
+                    index += 1
+                if index >= length:
+                    raise ParseError('unterminated double quote')
+                index += 1
+            else:
+                chars.append(char)
+                index += 1
+        tokens.append(('WORD', QuotedWord(''.join(chars)) if quoted else ''.join(chars), start, index))
+    return tokens
+
+
+# Parse a command line into its AST. Results are immutable and cached, so a line repeated in a
+# loop or script is tokenized once.
+@functools.lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_command_line(line):
+    tokens = tokenize(line)
+    position = 0
+
+    def peek(kind, values):
+        return position < len(tokens) and tokens[position][0] == kind and tokens[position][1] in values
+
+    def unexpected():
+        return ParseError(f"syntax error near '{tokens[position][1]}'" if position < len(tokens)
+                          else 'syntax error: unexpected end of line')
+
+    def parse_command():
+        nonlocal position
+        argv, redirects = [], []
+        while position < len(tokens) and tokens[position][0] in ('WORD', 'REDIRECT'):
+            kind, value = tokens[position][:2]
+            position += 1
+            if kind == 'WORD':
+                argv.append(value)
+                continue
+            fd, operator = value
+            if position >= len(tokens) or tokens[position][0] != 'WORD':
+                raise ParseError(f"expected a file name after '{operator}'")
+            target = tokens[position][1]
+            position += 1
+            if operator == '&>' or (operator == '>&' and not target.isdigit() and target != '-'):
+                redirects += [Redirect(1, '>', target), Redirect(2, '>&', '1')]
+            else:
+                redirects.append(Redirect(fd, operator, target))
+        if not argv:
+            raise unexpected()
+        return Command(tuple(argv), tuple(redirects))
+
+    def parse_pipeline():
+        nonlocal position
+        commands = [parse_command()]
+        while peek('OP', ('|',)):
+            position += 1
+            commands.append(parse_command())
+        return tuple(commands)
+
+    items = []
+    while position < len(tokens):
+        start = tokens[position][2]
+        pipelines, operators = [parse_pipeline()], [None]
+        while peek('OP', ('&&', '||')):
+            operators.append(tokens[position][1])
+            position += 1
+            pipelines.append(parse_pipeline())
+        end = tokens[position - 1][3]
+        background = False
+        if peek('OP', (';', '&')):
+            background = tokens[position][1] == '&'
+            position += 1
+        elif position < len(tokens):
+            raise unexpected()
+        items.append(AndOr(tuple(pipelines), tuple(operators), background, line[start:end].strip()))
+    return tuple(items)
+
+
+
+# grep matching, at module level so pool workers can run it. pattern is the regex source; literal is
+# a substring every match must contain (b'' if none), and is_literal means the pattern is exactly it.
+GrepSpec = collections.namedtuple('GrepSpec', 'pattern literal is_literal ignore_case invert line_numbers mode')
+REGEX_META = frozenset(b'.^$*+?{}[]\\|()')
+
+
+# the literal run a regex starts with, which every match must contain ('' for alternations)
+def required_literal(pattern):
+    if b'|' in pattern:
+        return b''
+    start = end = 1 if pattern.startswith(b'^') else 0
+    while end < len(pattern) and pattern[end] not in REGEX_META:
+        end += 1
+    literal = pattern[start:end]
+    if end < len(pattern) and pattern[end] in b'*?{':
+        literal = literal[:-1]  # the last character is optional
+    return literal
+
+
+# (line number, line) of each matching line in a buffer (bytes or mmap). With a required literal
+# the buffer is scanned with find() and only lines containing it reach the regex.
+def matching_lines(data, spec):
+    search = re.compile(spec.pattern, re.IGNORECASE if spec.ignore_case else 0).search
+    size, number, counted = len(data), 0, 0
+    if spec.literal and not spec.invert:
+        if spec.ignore_case:
+            finder = re.compile(re.escape(spec.literal), re.IGNORECASE).search
+            find = lambda position: (lambda match: match.start() if match else -1)(finder(data, position))
+        else:
+            find = lambda position: data.find(spec.literal, position)
+        position = 0
+        while position < size:
+            found = find(position)
+            if found < 0:
+                return
+            start = data.rfind(b'\n', 0, found) + 1
+            end = data.find(b'\n', found)
+            end = size if end < 0 else end
+            line = data[start:end]
+            if spec.is_literal or search(line):
+                if spec.line_numbers:
+                    number += data[counted:start].count(b'\n') + 1
+                    counted = end + 1
+                yield number, line
+            position = end + 1
+        return
+    position = 0
+    while position < size:
+        end = data.find(b'\n', position)
+        end = size if end < 0 else end
+        line = data[position:end]
+        number += 1
+        if (search(line) is None) == spec.invert:
+            yield number, line
+        position = end + 1
+
+
+# grep one file through mmap; returns its output lines. mode is 'lines', 'count' or 'files'.
+def grep_file(path, spec, label):
+    try:
+        with open(path, 'rb') as f:
+            if not os.fstat(f.fileno()).st_size:
+                return []
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                if b'\0' in data[:GREP_BINARY_PROBE]:
+                    return []
+                matches = matching_lines(data, spec)
+                if spec.mode == 'files':
+                    return [label + b'\n'] if next(matches, None) else []
+                prefix = label + b':' if label else b''
+                if spec.mode == 'count':
+                    return [prefix + b'%d\n' % sum(1 for _ in matches)]
+                if spec.line_numbers:
+                    return [b'%s%d:%s\n' % (prefix, number, line) for number, line in matches]
+                return [prefix + line + b'\n' for _, line in matches]
+    except (OSError, ValueError):
+        return []
+
+
+def grep_batch(batch, spec):
+    return [line for path, label in batch for line in grep_file(path, spec, label)]
+
+
+# the distinct trigrams of a file's lowercased text as a sorted array of 24-bit ints, or None
+# for binary, unreadable or oversized files
+def file_trigrams(path):
+    try:
+        with open(path, 'rb') as f:
+            data = f.read(INDEX_MAX_FILE + 1)
+    except OSError:
+        return None
+    if len(data) > INDEX_MAX_FILE or b'\0' in data[:GREP_BINARY_PROBE]:
+        return None
+    return array.array('I', sorted(trigram_keys(data.lower())))
+
+
+# Trigrams as ints (int.from_bytes(trigram, sys.byteorder)). The data is read as 4-byte words at
+# offsets 0 and 2; each distinct word holds two trigrams, its low and its high three bytes, so the
+# per-position work stays in C. The zero padding adds only trigrams no query contains.
+def trigram_keys(data):
+    data += b'\0\0\0'
+    words = set(array.array('I', data[:len(data) // 4 * 4]))
+    words.update(array.array('I', data[2:2 + (len(data) - 2) // 4 * 4]))
+    return {word & 0xFFFFFF for word in words} | {word >> 8 for word in words}
+
+
+def trigram_batch(paths):
+    return [file_trigrams(path) for path in paths]
+
+
+# find's starting points, with the DirEntry methods its predicates use
+class RootEntry(collections.namedtuple('RootEntry', 'name path')):
+    def stat(self, follow_symlinks=True):
+        return os.stat(self.path, follow_symlinks=follow_symlinks)
+
+    def is_file(self, follow_symlinks=True):
+        return stat.S_ISREG(self.stat(follow_symlinks).st_mode)
+
+    def is_dir(self, follow_symlinks=True):
+        return stat.S_ISDIR(self.stat(follow_symlinks).st_mode)
+
+    def is_symlink(self):
+        return stat.S_ISLNK(self.stat(False).st_mode)
+
+
+# A builtin running as a pipeline stage in a forked copy of the shell, with the part of the
+# Popen interface __run_pipe uses. stdin is the write end of its input pipe when it is fed lines.
+class ForkedStage:
+    def __init__(self, pid, stdin=None):
+        self.pid, self.stdin, self.returncode = pid, stdin, None
+
+    def poll(self):
+        if self.returncode is None:
+            pid, status = os.waitpid(self.pid, os.WNOHANG)
+            if pid:
+                self.returncode = os.waitstatus_to_exitcode(status)
+        return self.returncode
+
+    def wait(self):
+        if self.returncode is None:
+            self.returncode = os.waitstatus_to_exitcode(os.waitpid(self.pid, 0)[1])
+        return self.returncode
+
+    def kill(self):
+        try:
+            os.kill(self.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+
+# One row of the process table. cpu is user+system seconds, start is seconds after boot.
+ProcessInfo = collections.namedtuple('ProcessInfo', 'pid ppid name state user cpu rss vsz start')
+
+# One sample of the metrics ring buffer. read/write are cumulative disk I/O bytes since boot;
+# disks is a tuple of (mount point, used bytes, total bytes).
+MetricSample = collections.namedtuple('MetricSample', 'time cpu used available total swap_used swap_total read write disks')
+
+
+# One block of a ParallelGzip stream: raw deflate primed with the previous block's tail, ended with
+# a sync flush (byte aligned, not final) so blocks concatenate into a single deflate stream.
+def deflate_block(block, dictionary, level, last):
+    if dictionary:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS, zlib.DEF_MEM_LEVEL, zlib.Z_DEFAULT_STRATEGY, dictionary)
+    else:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return compressor.compress(block) + compressor.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+
+
+# A write-only gzip file compressed the way pigz does it: input is cut into ARCHIVE_BLOCK_SIZE
+# blocks that are deflated on a thread pool and written back in order as one gzip member, so any
+# gzip reader accepts it. The CRC-32 and length for the trailer are computed here as data arrives.
+# At most two blocks per worker are in flight, so memory stays bounded for any input size.
+class ParallelGzip:
+    def __init__(self, file, workers=ARCHIVE_WORKERS, level=ARCHIVE_LEVEL):
+        self.file, self.level = file, level
+        self.pool = futures.ThreadPoolExecutor(workers)
+        self.limit = workers * 2
+        self.pending = collections.deque()
+        self.buffer = bytearray()
+        self.previous, self.crc, self.size = b'', 0, 0
+        file.write(struct.pack('<4sIBB', b'\x1f\x8b\x08\x00', int(time.time()), 0, 3))  # deflate, no name, Unix
+
+    def write(self, data):
+        self.buffer += data
+        while len(self.buffer) >= ARCHIVE_BLOCK_SIZE:
+            block = bytes(self.buffer[:ARCHIVE_BLOCK_SIZE])
+            del self.buffer[:ARCHIVE_BLOCK_SIZE]
+            self.submit(block, False)
+        return len(data)
+
+    def submit(self, block, last):
+        self.crc = zlib.crc32(block, self.crc)
+        self.size += len(block)
+        self.pending.append(self.pool.submit(deflate_block, block, self.previous, self.level, last))
+        self.previous = block[-ARCHIVE_WINDOW:]
+        while len(self.pending) > (0 if last else self.limit):
+            self.file.write(self.pending.popleft().result())
+
+    def close(self):
+        if self.pool is None:
+            return
+        try:
+            self.submit(bytes(self.buffer), True)
+            self.file.write(struct.pack('<II', self.crc & 0xFFFFFFFF, self.size & 0xFFFFFFFF))
+        finally:
+            self.pool.shutdown(cancel_futures=True)
+            self.pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, kind, value, traceback):
+        if kind is None:
+            self.close()
+        else:
+            self.pool.shutdown(cancel_futures=True)
+            self.pool = None
+
 
 class Bash:
 
-    # Stores background jobs
-    __background_jobs = []
+    # Names handled by execute()'s match block rather than run as external programs
+    __BUILTINS = frozenset({
+        'nano', 'hostname', 'du', 'checksum', 'archive', 'cp', 'jobs', 'fg', 'bg', 'wait', 'disown', 'tree', 'open', 'ram', 'disk', 'mv',
+        'cd', 'cat', 'head', 'tail', 'less', 'top', 'kill', 'pgrep', 'pkill', 'pwd', 'ls', 'ps', 'echo', 'date', 'metrics', 'time', 'stats', 'find', 'grep', 'xargs', 'parallel',
+        'whoami', 'mkdir', 'rmdir', 'rm', 'touch', 'hash', 'history', 'help', 'clear', 'exit',
+    })
+
+    # Stores background jobs: job id -> {'pid', 'command', 'process', 'state', 'code', 'usage'}.
+    # Finished jobs are reaped by the SIGCHLD handler and dropped once they have been reported.
+    __background_jobs = {}
+    # pids of disowned jobs, still reaped (silently) so they never become zombies
+    __disowned_pids = set()
+
+    # Latest process snapshot (see __process_table) and the uid -> user name cache
+    __process_snapshot = {}
+    __user_names = {}
+    __group_names = {}
+
+    # Command hash table (like bash's "hash"): command name -> [absolute path, hits].
+    # Filled lazily and dropped when PATH or the mtime of any PATH directory changes.
+    __command_hash = {}
+    __hash_state = {'path': None, 'mtimes': {}, 'checked': 0.0}
 
     # Stores help text for each command.
     __HELP_DICT = {
-        'cat': 'Display file content (cat <file>). Supports piping (<cat file.txt | grep keyword>, <cat file.txt | sort | uniq>)',
+        'cat': 'Display file content (cat [file...]; standard input without files). Supports piping (<cat file.txt | grep keyword>, <cat file.txt | sort | uniq>)',
         'cd': 'Change directory (cd <dir>) or go up (cd ..)',
         'clear': 'Clear the terminal screen',
-        'cp': 'Copy a file (cp <source_file> <destination_file>)',
+        'cp': 'Copy files or directories (cp [-r] [-n] [-u] <source>... <destination>). -n never overwrites, -u only copies newer files',
         'date': 'Show current date and time',
-        'disk': 'Check Disk info: disk total | disk used | disk available',
-        'echo': 'Print text or redirect: echo "text" > file (overwrite), echo "text" >> file (append), echo < file (read input)',
+        'disk': 'Check Disk info: disk (all mounts, I/O rates) | disk total|used|available [path] | disk history [n]',
+        'echo': 'Usage: echo <text> Print text. Any command takes > file, >> file, < file, 2> file, 2>&1 and &> file.',
         'exit': 'Exit the shell',
+        'head': 'Show the first lines of a file (head [-n N] [file...]; standard input without files)',
         'help': 'Show help information',
-        'history': 'Show command history',
+        'hash': 'Show remembered command locations (hash), forget them all (hash -r) or look commands up (hash <name>...)',
+        'history': 'Show command history (history [N]), clear it (history -c) or search it (history -s <text>, or type text and press Ctrl-R; again for older). !!, !n, !-n and !prefix re-run entries',
         'hostname': 'Show desktop name',
-        'kill': 'Kill a running process by name (kill <name>)',
-        'ls': 'List files in current directory. Supports piping (<ls | grep <type>>)',
-        'mkdir': 'Create a new directory (mkdir <dir>)',
-        'mv': 'Move a file (mv <source_file> <destination_file>)',
+        'kill': 'Kill a process by PID, or every process named exactly <name>, like killall (kill <pid|name>; pkill for patterns)',
+        'less': 'Page through a file of any size (less <file>). Enter/b move, g/G top/end, N% or @byte jump, /text search, q quit',
+        'ls': 'List directory contents: ls [-l] [-a] [-S] [-t] [-R] [-h] [-1] [path...]. Supports piping (<ls | grep <type>>)',
+        'mkdir': 'Create directories (mkdir [-p] <dir>...). -p creates parents and accepts existing directories',
+        'mv': 'Move or rename files (mv [-n] [-u] <source>... <destination>)',
         'nano': 'Open a file in nano editor (nano <file>)',
         'open': 'Open any file or application using the default program (open <file or app>)',
         'pwd': 'Print current working directory',
-        'ram': 'Check RAM info: ram total | ram used | ram available',
-        'rm': 'Remove a file (rm <file>)',
-        'rmdir': 'Remove a directory (rmdir <dir>)',
-        'top': 'List all running processes',
-        'touch': 'Create an empty file (touch <file>)',
-        'tree': 'Display directory tree structure',
+        'ram': 'Check RAM info: ram (summary with min/avg/max) | ram total | ram used | ram available | ram history [n]',
+        'time': 'Usage: time <command> Run a command or pipeline and report real, user and sys time and max RSS',
+        'stats': 'Latency of the commands run in this shell: stats (all) | stats <command> (histogram) | stats reset',
+        'metrics': 'System metrics dashboard: metrics | metrics watch [-n frames] [-d seconds] | metrics export <file.csv|file.bin>',
+        'rm': 'Remove files (rm [-r] [-f] [-i] [-n|--dry-run] <file>... , globs like *.tmp allowed). -r removes directories in parallel',
+        'rmdir': 'Remove directories and everything in them (rmdir [-f] [-i] [-n|--dry-run] <dir>...)',
+        'tail': 'Show the last lines of a file (tail [-n N] [-f] [file...]; standard input without files). -f keeps following appended data',
+        'top': 'Live process list sorted by CPU usage (top [-n frames] [-d seconds] [-u user]). Ctrl-C to stop',
+        'xargs': 'Run a command on arguments read from input: xargs [-P jobs] [-n args] [-I str] [-a file] [-0] [-k] [--halt now|soon[,fail=N]] [--joblog file] command [args...]',
+        'parallel': 'Run a command once per input line, one job per CPU: parallel [-j jobs] [-n args] [-I str] [-a file] [-0] [-k] [--halt now|soon[,fail=N]] [--joblog file] command [args...] [::: arg...]',
+        'find': 'Find files: find [path...] [-name|-iname glob] [-type f|d|l] [-size [+-]N[ckMG]] [-mtime|-mmin [+-]N] [-maxdepth N]',
+        'grep': 'Search files: grep [-r] [-i] [-v] [-n] [-c] [-l] [-h] [-F] [--include=glob] [--exclude-dir=name] [--index] <pattern> [path...]',
+        'touch': 'Create empty files or update their timestamps (touch <file>...)',
+        'archive': 'Pack and unpack .tar, .tar.gz/.tgz, .zip and .gz: archive create [-j jobs] [-1..-9] <archive> <path>... | archive extract [-C dir] <archive> | archive list [-v] <archive>',
+        'checksum': 'Hash files like sha256sum: checksum [-a algorithm] [--no-cache] [file...] | checksum -c manifest. Unchanged files are not rehashed',
+        'du': 'Disk usage per directory: du [-s] [-h] [-d depth] [--top K] [--rescan] [path...]. Unchanged directories are read from a cache',
+        'tree': 'Display directory tree structure (tree [-L depth] [-d] [--du] [--count] [dir])',
         'whoami': 'Show current user',
-        'jobs': 'Jobs List all background jobs.',
-        'ps': 'Display running processes (<ps aux>). Supports piping.(<ps aux | grep python)',
+        'jobs': 'List background jobs with state, exit status and CPU/memory usage (jobs [-l])',
+        'fg': 'Bring a job to the foreground (fg [%n])',
+        'bg': 'Resume a stopped job in the background (bg [%n])',
+        'wait': 'Wait for background jobs to finish (wait [%n|pid...])',
+        'disown': 'Remove a job from the job table and let it keep running (disown [%n])',
+        'ps': 'Display running processes (<ps>, <ps aux>, <ps -o pid,rss,command>, -u user, -p pid, -C name). Supports piping.(<ps aux | grep python)',
+        'pgrep': 'List PIDs of processes whose name matches a pattern (pgrep [-l] [-x] [-u user] <pattern>)',
+        'pkill': 'Signal every process whose name matches a pattern (pkill [-SIGNAL] [-x] [-u user] <pattern>)',
         'sleep': 'Pause execution for given duration in background (<sleep 5 &>)',
-        '|': 'Usage: <cmd1> | <cmd2> Pipe output of one command as input to another.',
-        '&': 'Usage: <command> & Run a command in the background.'
+        '|': 'Usage: <cmd1> | <cmd2> Pipe output of one command as input to another. grep, sort, uniq, wc, head, tail and cut run inside the shell; other builtins (tree, du, help, ...) in a forked copy of it.',
+        '&': 'Usage: <command> & Run a command in the background. Jobs are referred to as %n, %% (current) or %- (previous).'
     }
 
-    #Displays a welcome banner with ASCII art.
+    def __init__(self):
+        #list to store the commands entered; entry number n is self.__history[n - 1 - self.__history_base]
+        self.__history = []
+        self.__history_base = 0            # entries evicted from the front (keeps numbers stable)
+        self.__history_pending = []        # entries not yet appended to HISTORY_FILE
+        self.__history_flushed = time.monotonic()
+        self.__history_persist = False     # only the interactive shell reads and writes HISTORY_FILE
+        self.__history_last = {}           # command -> number of its latest occurrence
+        self.__history_prefixes = []       # sorted distinct commands, for "!prefix" via bisect
+        self.__history_chunks = []         # entries joined by newlines, for substring search
+        self.__history_offsets = array.array('q')  # start offset of each entry in the joined text
+        self.__history_length = 0
+        self.__history_search = None       # (query, number) of the last Ctrl-R match
+        self.__metrics = collections.deque(maxlen=METRICS_HISTORY)  # MetricSample ring buffer, oldest first
+        self.__metrics_mounts = []         # mount points sampled for disk usage
+        self.__metrics_taken = 0           # samples so far; the deque stops growing at METRICS_HISTORY
+        self.__metrics_thread = None
+        self.__metrics_lock = threading.Lock()  # held for each sample; forks wait for it
+        self.__stats = {}                  # command name -> [count, total, min, max, latency buckets]
+        self.__trace = None                # Chrome trace events when --profile is on
+        self.__trace_start = 0
+        self.__grep_indexes = {}           # tree root -> loaded trigram index
+        self.__du_caches = {}              # du root -> {directory: scan result}
+        self.__checksums = None            # (algorithm, path) -> (size, mtime_ns, inode, digest), loaded on first use
+        self.__checksum_buffers = threading.local()  # one read buffer per hashing thread
+        self.__prompt_cache = (None, '')   # (cwd and environment it was built from, prompt)
+
+    #Displays a welcome banner with ASCII art, in one write.
     def __welcome(self):
         welcome = [
             r"__        _______ _     ____ ___  __  __ _____   _____ ___ ",
@@ -65,19 +627,11 @@ class Bash:
         ] # ASCII CODE
         obj = [welcome, bash]
 
-        # handle printing ascii art line by line
-        def type_out(text_array, ):
-            width = shutil.get_terminal_size((80, 20)).columns #get terminal width
-            for line in text_array:
-                centered_line = line.center(width) #centered the ascii art
-                for char in centered_line:
-                    print(self.color_text(char, 'crimson'), end='')  # Printing ASCII art in color
-                print()
-
-        # display welcome and bash from obj
-        for item in obj:
-            type_out(item)
-            print()
+        width = os.get_terminal_size().columns if sys.stdout.isatty() else 80
+        banner = ''.join(''.join(f"{self.color_text(line.center(width), 'crimson')}\n" for line in item) + '\n'
+                         for item in obj) # centered ascii art
+        sys.stdout.write(banner)
+        sys.stdout.flush()
 
     # apply color to text
     def color_text(self, text, color):
@@ -91,502 +645,3999 @@ class Bash:
         }
         return (f"{colors.get(color, colors['reset'])}{text}{colors['reset']}" if os.name == 'nt' else text)
 
+    # directory -> (mtime_ns, sorted entry names, names that are directories). Rebuilt only when the
+    # directory's mtime changes, so each Tab press is a bisect instead of a full listdir.
+    __completion_index = collections.OrderedDict()
+    __command_index = {'mtimes': None, 'names': []}
+    __completion_matches = []
+
+    def __directory_index(self, directory):
+        try:
+            mtime = os.stat(directory).st_mtime_ns
+        except OSError:
+            return [], frozenset()
+        cached = self.__completion_index.get(directory)
+        if cached and cached[0] == mtime:
+            self.__completion_index.move_to_end(directory)
+            return cached[1], cached[2]
+
+        names, directories = [], set()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    names.append(entry.name)
+                    try:
+                        if entry.is_dir():  # answered from the dirent type, no stat for plain entries
+                            directories.add(entry.name)
+                    except OSError:
+                        pass
+        except OSError:
+            return [], frozenset()
+        names.sort()
+        self.__completion_index[directory] = (mtime, names, directories)
+        if len(self.__completion_index) > COMPLETION_CACHE_DIRS:
+            self.__completion_index.popitem(last=False)
+        return names, directories
+
+    # slice of a sorted list whose entries start with prefix
+    def __prefix_matches(self, names, prefix):
+        start = bisect.bisect_left(names, prefix)
+        end = bisect.bisect_left(names, prefix + '\U0010ffff', start)
+        return names[start:end]
+
+    # builtin names plus every executable on PATH, rebuilt only when a PATH directory changes
+    def __command_names(self):
+        path = os.environ.get('PATH', os.defpath)
+        mtimes = self.__path_mtimes(path)
+        if self.__command_index['mtimes'] != mtimes:
+            names = {name for name in self.__HELP_DICT if name.isalpha()}
+            for directory in path.split(os.pathsep):
+                try:
+                    with os.scandir(directory or '.') as entries:
+                        for entry in entries:
+                            try:
+                                if entry.is_file() and os.access(entry.path, os.X_OK):
+                                    names.add(entry.name)
+                            except OSError:
+                                pass
+                except OSError:
+                    pass
+            self.__command_index.update(mtimes=mtimes, names=sorted(names))
+        return self.__command_index['names']
+
+    # all completions for text: command names in command position, otherwise (nested) paths
+    def __complete_matches(self, text, command_position=False):
+        if command_position and '/' not in text:
+            return self.__prefix_matches(self.__command_names(), text)
+
+        head, separator, prefix = text.rpartition('/')
+        directory = os.path.abspath(os.path.expanduser(head) if head else ('/' if separator else '.'))
+        names, directories = self.__directory_index(directory)
+        matches = self.__prefix_matches(names, prefix)
+        if not prefix.startswith('.'):
+            matches = [name for name in matches if not name.startswith('.')]
+        return [f"{head}{separator}{name}{'/' if name in directories else ''}" for name in matches]
+
     #handle auto completion of files or directory on tab predd
     def __completer(self, text, state):
-        current_dir = os.getcwd()
-        options = [f for f in os.listdir(current_dir) if f.startswith(text)]
-        if state < len(options):
-            return options[state] #return matching file or directory
+        if state == 0:
+            # readline asks once per state; compute the match list only on the first call
+            before = readline.get_line_buffer()[:readline.get_begidx()].rstrip()
+            command_position = not before or before[-1] in '|&;'
+            self.__completion_matches = self.__complete_matches(text, command_position)
+        if state < len(self.__completion_matches):
+            return self.__completion_matches[state] #return matching file or directory
         else:
             return None 
 
-    def __copy_file(self, path, parts):
-        if not path:
-            print(self.color_text(self.__HELP_DICT['cp'], 'red')) # display help for cp command
-        elif os.path.exists(path):
+    # Worker threads for copying a tree: few on a spinning disk (seeks dominate), many on SSDs and
+    # network filesystems where parallel requests hide latency.
+    def __copy_workers(self, path):
+        try:
+            device = os.stat(path).st_dev
+            base = f'/sys/dev/block/{os.major(device)}:{os.minor(device)}'
+            for candidate in (f'{base}/queue/rotational', f'{base}/../queue/rotational'):
+                if os.path.exists(candidate):
+                    with open(candidate) as f:
+                        return 2 if f.read().strip() == '1' else COPY_WORKERS
+        except (OSError, AttributeError):
+            pass
+        return COPY_WORKERS
+
+    # Copy one file's data with the cheapest path the kernel offers: a reflink (shared extents, no
+    # data copied), then copy_file_range and sendfile (kernel-to-kernel), then a plain read/write
+    # loop through one reusable buffer. progress(n) is called as bytes land.
+    def __copy_data(self, source, target, progress):
+        with open(source, 'rb', buffering=0) as src, open(target, 'wb', buffering=0) as dst:
+            src_fd, dst_fd = src.fileno(), dst.fileno()
+            size = os.fstat(src_fd).st_size
+            if size and fcntl is not None:
+                try:
+                    fcntl.ioctl(dst_fd, FICLONE, src_fd)
+                    progress(size)
+                    return
+                except OSError:
+                    pass  # not a reflink-capable filesystem, or different filesystems
+
+            copied = 0
+            for kernel_copy in ('copy_file_range', 'sendfile'):
+                if not hasattr(os, kernel_copy):
+                    continue
+                try:
+                    while True:
+                        if kernel_copy == 'copy_file_range':
+                            count = os.copy_file_range(src_fd, dst_fd, COPY_CHUNK_SIZE)
+                        else:
+                            count = os.sendfile(dst_fd, src_fd, copied, COPY_CHUNK_SIZE)
+                        if not count:
+                            return
+                        copied += count
+                        progress(count)
+                except OSError as e:
+                    if e.errno not in (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTSUP):
+                        raise
+
+            os.lseek(src_fd, copied, os.SEEK_SET)
+            buffer = bytearray(COPY_CHUNK_SIZE)
+            view = memoryview(buffer)
+            while True:
+                count = src.readinto(buffer)
+                if not count:
+                    return
+                dst.write(view[:count])
+                progress(count)
+
+    # Progress line on stderr (bytes, files, throughput, ETA). Only shown on a terminal, and only
+    # once an operation has run long enough for it to be useful.
+    def __copy_progress(self, total_bytes, total_files):
+        state = {'bytes': 0, 'files': 0, 'start': time.monotonic(), 'shown': None}
+        lock = threading.Lock()
+        visible = sys.stderr.isatty()
+
+        def render(now):
+            elapsed = max(now - state['start'], 1e-9)
+            rate = state['bytes'] / elapsed
+            eta = (total_bytes - state['bytes']) / rate if rate else 0
+            sys.stderr.write(f"\r{self.__human_size(state['bytes'])}/{self.__human_size(total_bytes)}"
+                             f" {state['files']}/{total_files} files"
+                             f" {self.__human_size(rate)}/s ETA {eta:.0f}s   ")
+            sys.stderr.flush()
+            state['shown'] = now
+
+        def update(count=0, finished_file=False):
+            with lock:
+                state['bytes'] += count
+                state['files'] += finished_file
+                now = time.monotonic()
+                if visible and now - (state['shown'] or state['start']) >= COPY_PROGRESS_INTERVAL:
+                    render(now)
+
+        def finish():
+            if state['shown'] is not None:
+                render(time.monotonic())
+                sys.stderr.write('\n')
+        return update, finish
+
+    # -n never overwrites; -u only overwrites when the source is newer
+    def __should_copy(self, source_mtime, target, flags):
+        if '-n' in flags or '-u' in flags:
             try:
-                arg_path = parts[2].replace('"', '')
-                if os.path.isabs(arg_path):
-                    des_path = os.path.abspath(arg_path)
-                else:
-                    des_path = os.path.abspath(os.path.join(os.getcwd(), arg_path))
-            except IndexError:
-                print(self.color_text("Enter destination path.", 'red'))
-                return
+                target_mtime = os.stat(target).st_mtime
+            except FileNotFoundError:
+                return True
+            return '-u' in flags and '-n' not in flags and source_mtime > target_mtime
+        return True
 
-            if os.path.isfile(path): #handle files
-                if not os.path.exists(des_path): 
-                    with open(des_path, 'x') as f:
-                        pass 
-                shutil.copy(path, des_path)
-                print(f"File copied to {des_path}")                    
-            elif os.path.isdir(path): #handle directories
-                if os.path.exists(des_path):
-                    shutil.copytree(path, des_path)
-                    print(f"Directory copied to {des_path}")
-                else:
-                    print(self.color_text("Destination path does not exist.", 'red'))
+    # Copy (source, target) pairs. Trees are walked iteratively with scandir: directories and
+    # symlinks are created in order, then file data is copied on a thread pool.
+    def __copy_paths(self, pairs, flags):
+        directories, links, files = [], [], []
+        for source, target in pairs:
+            if not os.path.isdir(source) or os.path.islink(source):
+                info = os.stat(source)
+                if self.__should_copy(info.st_mtime, target, flags):
+                    files.append((source, target, info.st_size))
+                continue
+            stack = [(source, target)]
+            while stack:
+                src_dir, dst_dir = stack.pop()
+                directories.append(dst_dir)
+                with os.scandir(src_dir) as entries:
+                    for entry in entries:
+                        dst = os.path.join(dst_dir, entry.name)
+                        if entry.is_symlink():
+                            links.append((os.readlink(entry.path), dst))
+                        elif entry.is_dir():
+                            stack.append((entry.path, dst))
+                        else:
+                            info = entry.stat()
+                            if self.__should_copy(info.st_mtime, dst, flags):
+                                files.append((entry.path, dst, info.st_size))
+
+        for directory in directories:
+            os.makedirs(directory, exist_ok=True)
+        for link, dst in links:
+            if not os.path.lexists(dst):
+                os.symlink(link, dst)
+
+        update, finish = self.__copy_progress(sum(size for _, _, size in files), len(files))
+
+        def copy_one(source, target):
+            self.__copy_data(source, target, update)
+            shutil.copymode(source, target)
+            update(finished_file=True)
+
+        failures = 0
+        workers = self.__copy_workers(os.path.dirname(pairs[0][1]) or '.') if len(files) > 1 else 1
+        with futures.ThreadPoolExecutor(workers) as pool:
+            pending = {pool.submit(copy_one, source, target): source for source, target, _ in files}
+            for future in futures.as_completed(pending):
+                try:
+                    future.result()
+                except OSError as e:
+                    failures += 1
+                    print(self.color_text(f'cp: {pending[future]}: {e.strerror}', 'red'), file=sys.stderr)
+        finish()
+        return failures
+
+    # shared argument handling for cp/mv: options, sources and the path each source goes to
+    def __transfer_targets(self, command, parts, short_options):
+        options, args = getopt.getopt(parts[1:], short_options)
+        flags = {flag for flag, _ in options}
+        if len(args) < 2:
+            raise getopt.GetoptError(self.__HELP_DICT[command])
+        destination = os.path.abspath(args[-1])
+        sources = [os.path.abspath(arg) for arg in args[:-1]]
+        into_directory = os.path.isdir(destination)
+        if len(sources) > 1 and not into_directory:
+            raise getopt.GetoptError(f"target '{args[-1]}' is not a directory")
+        pairs = [(source, os.path.join(destination, os.path.basename(source)) if into_directory else destination)
+                 for source in sources]
+        return flags, pairs
+
+    def __copy_file(self, parts):
+        try:
+            flags, pairs = self.__transfer_targets('cp', parts, 'rRnu')
+        except getopt.GetoptError as e:
+            print(self.color_text(e.msg, 'red'), file=sys.stderr)  # display help for cp command
+            return 1
+
+        status = 0
+        for source, des_path in pairs:
+            if not os.path.exists(source):
+                print(self.color_text(f'Source path {source} not found.', 'red'), file=sys.stderr)
+                status = 1
+            elif os.path.isdir(source) and not flags & {'-r', '-R'}:
+                print(self.color_text(f'cp: -r not specified; omitting directory {source}', 'red'), file=sys.stderr)
+                status = 1
+            elif des_path.startswith(source + os.sep) or (os.path.exists(des_path) and os.path.samefile(source, des_path)):
+                print(self.color_text(f'cp: cannot copy {source} onto itself', 'red'), file=sys.stderr)
+                status = 1
+            elif os.path.isfile(source) and not self.__should_copy(os.stat(source).st_mtime, des_path, flags):
+                continue  # -n / -u: destination kept
             else:
-                print(self.color_text('Source path not found.', 'red'))
+                try:
+                    if self.__copy_paths([(source, des_path)], flags):
+                        status = 1
+                    else:
+                        print(f"{'Directory' if os.path.isdir(source) else 'File'} copied to {des_path}")
+                except OSError as e:
+                    print(self.color_text(f'cp: {e.filename or source}: {e.strerror}', 'red'), file=sys.stderr)
+                    status = 1
+        return status
 
-    # display file and directory names in hirearchy form
-    def __print_tree(self, path, prefix=''):
-        if not os.path.exists(path):
-            print(f'Path "{path}" does not exist.')
-            return
+    # 1536 -> "1.5K", like the -h flag of ls/du
+    def __human_size(self, size):
+        for unit in ('B', 'K', 'M', 'G', 'T'):
+            if size < 1024 or unit == 'T':
+                return f'{size:.0f}{unit}' if unit == 'B' else f'{size:.1f}{unit}'
+            size /= 1024
+
+    # One directory listing for tree: sorted (name, is_dir, size) tuples, or None if unreadable.
+    # DirEntry answers is_dir from the dirent type, so files are only stat'ed when sizes are needed.
+    def __scan_tree_entries(self, path, dirs_only=False, sizes=False):
+        entries = []
+        try:
+            with os.scandir(path) as listing:
+                for entry in listing:
+                    try:
+                        is_dir = entry.is_dir(follow_symlinks=False)
+                        if dirs_only and not is_dir:
+                            continue
+                        size = entry.stat(follow_symlinks=False).st_size if sizes and not is_dir else 0
+                    except OSError:
+                        is_dir, size = False, 0
+                    entries.append((entry.name, is_dir, size))
+        except OSError:
+            return None
+        entries.sort()
+        return entries
 
-        print(f'{self.color_text(prefix, 'crimson')}{self.color_text(os.path.basename(path), 'purple')}/')
-        prefix += '-------'
+    # Aggregated size of every directory under root for "tree --du". Levels are scanned in
+    # parallel, then sizes are summed bottom-up; only one number per directory is kept.
+    def __tree_sizes(self, root, pool):
+        sizes, children, level = {}, {}, [root]
+        while level:
+            next_level = []
+            for path, entries in zip(level, pool.map(lambda p: self.__scan_tree_entries(p, sizes=True), level)):
+                entries = entries or []
+                sizes[path] = sum(size for _, is_dir, size in entries if not is_dir)
+                children[path] = [os.path.join(path, name) for name, is_dir, _ in entries if is_dir]
+                next_level.extend(children[path])
+            level = next_level
+        for path in sorted(sizes, key=lambda p: p.count(os.sep), reverse=True):
+            sizes[path] += sum(sizes[child] for child in children[path])
+        return sizes
 
+    # display file and directory names in hirearchy form
+    def __print_tree(self, args):
         try:
-            for item in os.listdir(path):
-                item_path = os.path.join(path, item)
-                if os.path.isdir(item_path):
-                    # recursive call for itself (if the item is folder) to print all files and directories with in the folder
-                    self.__print_tree(item_path, prefix) 
-                else:
-                    print(f'{self.color_text(prefix, 'crimson')}{item}')
-        except PermissionError:
-            print(f'{prefix}[Permission Denied]')
-
-    def __move_file(self, path, parts):
-        if not path:
-            print(self.color_text(self.__HELP_DICT['mv'], 'red'))
-        elif os.path.exists(path):
-            try:
-                arg_path = parts[2].replace('"', '')
-                if os.path.isabs(arg_path):
-                    des_path = os.path.abspath(arg_path)
-                else:
-                    des_path = os.path.abspath(os.path.join(os.getcwd(), arg_path))
-            except IndexError:
-                print(self.color_text("Enter destination path.", 'red'))
-                return
+            options, rest = getopt.gnu_getopt(args, 'L:d', ['du', 'count'])
+            options = dict(options)
+            max_depth = int(options['-L']) if '-L' in options else None
+        except (getopt.GetoptError, ValueError):
+            print(self.color_text(self.__HELP_DICT['tree'], 'red'), file=sys.stderr)
+            return 1
+        path = os.path.abspath(rest[0]) if rest else os.getcwd()
+        if not os.path.isdir(path):
+            print(f'Path "{path}" does not exist.', file=sys.stderr)
+            return 1
 
-            try:
-                if os.path.exists(des_path):  
-                    shutil.move(path, des_path)
-                    print(f"File moved to {des_path}")
-                else:
-                    print(self.color_text("Destination path does not exist.", 'red'))
-            except shutil.Error:
-                print(self.color_text("File already exists.",'red'))
-            except PermissionError:
-                print(f"Cannot move directory because its contents are currently in use.")
-            except Exception:
-                print(f"An unexpected error occur.")
-        else:
-            print(self.color_text('Source path not found.', 'red'))
-
-    def __cat_command(self, path, arg):
-        if not path:
-            print(self.color_text(self.__HELP_DICT['cat'], 'red'))
-        elif os.path.exists(path):
-            with open(path, 'r') as f:
-                print(f.read().strip()) # read content from the file
-        else:
-            print(self.color_text(f'{arg} file does not exit.', 'red'))
+        dirs_only, show_sizes = '-d' in options, '--du' in options
+        directory_count = file_count = 0
+        write = sys.stdout.write
+        with futures.ThreadPoolExecutor(TREE_WORKERS) as pool:
+            sizes = self.__tree_sizes(path, pool) if show_sizes else {}
 
-    def __change_directory(self, path, arg):
-        if path:
-            if arg=='..':
-                os.chdir(Path(path))
-            else:
-                if os.path.exists(path):
-                    os.chdir(path)
-                else:
-                    print(self.color_text(f"{path} path does not exist.", 'red'))
-        else:
-            print(self.color_text(self.__HELP_DICT['cd'], 'red'))
+            def label(name, full_path, is_dir, size):
+                text = f'{self.color_text(name, "purple")}/' if is_dir else name
+                if show_sizes:
+                    text = f'[{self.__human_size(sizes.get(full_path, 0) if is_dir else size):>6}] {text}'
+                return text
+
+            # Iterative depth-first walk. Each frame keeps its sorted listing, a cursor, and futures
+            # for the listings of the next few subdirectories, which worker threads fetch ahead of
+            # the cursor. Output order stays deterministic and memory stays bounded by
+            # depth * TREE_PREFETCH listings, however big the tree is.
+            def open_frame(frame_path, entries, depth):
+                frame = {'path': frame_path, 'entries': entries or [], 'index': 0,
+                         'prefetched': 0, 'futures': {}, 'depth': depth,
+                         'prefix': self.color_text('-------' * depth, 'crimson')}
+                prefetch(frame)
+                return frame
+
+            def prefetch(frame):
+                entries = frame['entries']
+                if max_depth is not None and frame['depth'] >= max_depth:
+                    return
+                while len(frame['futures']) < TREE_PREFETCH and frame['prefetched'] < len(entries):
+                    name, is_dir, _ = entries[frame['prefetched']]
+                    if is_dir:
+                        frame['futures'][frame['prefetched']] = pool.submit(
+                            self.__scan_tree_entries, os.path.join(frame['path'], name), dirs_only, show_sizes)
+                    frame['prefetched'] += 1
+
+            write(f'{label(os.path.basename(path) or path, path, True, 0)}\n')
+            root_entries = self.__scan_tree_entries(path, dirs_only, show_sizes)
+            if root_entries is None:
+                write('[Permission Denied]\n')
+            stack = [open_frame(path, root_entries, 1)]
+            while stack:
+                frame = stack[-1]
+                if frame['index'] >= len(frame['entries']):
+                    stack.pop()
+                    continue
+                index = frame['index']
+                name, is_dir, size = frame['entries'][index]
+                frame['index'] += 1
+                full_path = os.path.join(frame['path'], name)
+                write(f"{frame['prefix']}{label(name, full_path, is_dir, size)}\n")
+                if not is_dir:
+                    file_count += 1
+                    continue
+                directory_count += 1
+                future = frame['futures'].pop(index, None)
+                prefetch(frame)
+                if future is not None:
+                    entries = future.result()
+                    if entries is None:
+                        write(f"{frame['prefix']}-------[Permission Denied]\n")
+                    stack.append(open_frame(full_path, entries, frame['depth'] + 1))
+            sys.stdout.flush()
 
-    def __display_running_processes(self):
-        print(f"{'PID':<10} {'Name':<25} {'Status':<15}")
-        for proc in psutil.process_iter(['pid', 'name', 'status']):
+        if '--count' in options:
+            summary = f'{directory_count} directories' + ('' if dirs_only else f', {file_count} files')
+            print(f'\n{summary}')
+        return 0
+
+    # du [-s] [-h] [-d N] [--top K] [path...]: disk usage (allocated blocks) of every directory,
+    # deepest first like GNU du, or the K largest directories with --top
+    def __disk_usage(self, args):
+        try:
+            options, paths = getopt.gnu_getopt(args, 'shd:', ['top=', 'rescan'])
+            options = dict(options)
+            depth = 0 if '-s' in options else int(options['-d']) if '-d' in options else None
+            top = int(options['--top']) if '--top' in options else None
+        except (getopt.GetoptError, ValueError):
+            print(self.color_text(self.__HELP_DICT['du'], 'red'), file=sys.stderr)
+            return 1
+        size = self.__human_size if '-h' in options else lambda usage: str(-(-usage // 1024))
+        status, lines = 0, []
+        for path in map(os.path.normpath, paths or ['.']):
             try:
-                print(f"{proc.info['pid']:<10} {proc.info['name']:<25} {proc.info['status']:<15}")
-            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                info = os.lstat(path)
+            except OSError as e:
+                print(self.color_text(f"du: cannot access '{path}': {e.strerror}", 'red'), file=sys.stderr)
+                status = 1
                 continue
+            if not stat.S_ISDIR(info.st_mode):
+                lines.append((self.__block_usage(info), path))
+                continue
+            try:
+                totals = self.__du_sizes(path, '--rescan' in options)
+            except KeyboardInterrupt:
+                print()
+                return 130
+            # depth below the operand; every key starts with it ("/" included, which ends in a separator)
+            shown = [(usage, directory) for directory, usage in totals.items()
+                     if depth is None or directory == path or directory[len(path):].lstrip(os.sep).count(os.sep) < depth]
+            if top is not None:
+                lines.extend(shown)
+            else:
+                lines.extend(sorted(shown, key=lambda row: row[1].split(os.sep) + ['\U0010ffff']))  # children first
+        if top is not None:
+            lines = sorted(lines, key=lambda row: row[0], reverse=True)[:top]
+        self.__write_lines((f'{size(usage)}\t{directory}\n'.encode(errors='surrogateescape') for usage, directory in lines), None)
+        return status
 
-    def __kill_process(self, pid):
-        try:
-            process = psutil.Process(pid)
-            process.terminate()  # A request for graceful termination. sends SIGTERM (signal 15)
-            process.wait(timeout=3)  # wait up to 3 seconds for it to terminate
-            print(f"Process {pid} terminated successfully.")
-        except psutil.NoSuchProcess:
-            print(self.color_text(f"No process with PID {pid} found.", 'red'))
-        except psutil.AccessDenied:
-            print(self.color_text(f"Access denied to terminate process {pid}.", 'red'))
-        except psutil.TimeoutExpired:
-            print(self.color_text(f"Process {pid} did not terminate in time, trying to kill it forcefully...",'red'))
-            process.kill()   #Forceful termination and send SIGKILL (signal 9)
-            print(f"Process {pid} killed.")
-
-    def __kill_running_process(self,arg):
-        if not arg:
-            print(self.color_text(self.__HELP_DICT['kill'], 'red'))
-            return
-        print(arg)
-        for proc in psutil.process_iter(['pid', 'name', 'status']):
-            if arg.lower() in proc.info['name']:
-                self.__kill_process(proc.info['pid'])
-                return
+    @staticmethod
+    def __block_usage(info):
+        return info.st_blocks * 512 if hasattr(info, 'st_blocks') else info.st_size
 
-    def __display_list(self):
-        items = os.listdir(os.getcwd())
-        for item in items:
-            if not os.path.isfile(item):
-                print(self.color_text(item, 'purple'))
-                continue
-            print(item)
+    # Total usage of every directory under root. Directories are scanned level by level on a thread
+    # pool. A scan of a directory whose mtime matches the cache reuses the cached result instead of
+    # listing it, so an unchanged subtree costs one stat per directory. Files with more than one
+    # link are counted once per (st_dev, st_ino). The cache only covers directories seen in this run.
+    def __du_sizes(self, root, rescan=False):
+        key = os.path.abspath(root)
+        cache_path = os.path.join(INDEX_DIR, 'du-' + hashlib.sha1(os.fsencode(key)).hexdigest() + '.cache')
+        cache = {} if rescan else self.__du_caches.get(key)
+        if cache is None:
+            try:
+                with open(cache_path, 'rb') as f:
+                    cache = pickle.load(f)
+            except (OSError, EOFError, pickle.UnpicklingError):
+                cache = {}
+        scans, children, level, changed = {}, {}, [root], False
+        with futures.ThreadPoolExecutor(DU_WORKERS) as pool:
+            while level:
+                next_level = []
+                for directory, scan in zip(level, pool.map(lambda path: self.__du_scan(path, cache), level)):
+                    changed = changed or cache.get(os.path.abspath(directory)) is not scan
+                    scans[directory] = scan
+                    children[directory] = [os.path.join(directory, name) for name in scan[2]]
+                    next_level.extend(children[directory])
+                level = next_level
+        seen, totals = set(), {}
+        for directory, (_, usage, _, links) in scans.items():
+            for inode, blocks in links:
+                if inode not in seen:
+                    seen.add(inode)
+                    usage += blocks
+            totals[directory] = usage
+        for directory in reversed(list(totals)):  # scanned level by level, so children come first
+            totals[directory] += sum(totals[child] for child in children[directory])
 
-    def __display_echo(self, arg, parts):
-        if arg:
-            for i in parts[1:]:
-                print(bytes(i.replace('"', ''), "utf-8").decode("unicode_escape"), end=" ") # to handle escape sequences 
+        cache = {os.path.abspath(directory): scan for directory, scan in scans.items()}
+        self.__du_caches[key] = cache
+        if changed or len(cache) != len(scans):
+            try:
+                os.makedirs(INDEX_DIR, exist_ok=True)
+                with open(cache_path + '.tmp', 'wb') as f:
+                    pickle.dump(cache, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(cache_path + '.tmp', cache_path)
+            except OSError as e:
+                print(self.color_text(f'du: cannot save cache: {e.strerror}', 'red'), file=sys.stderr)
+        return totals
+
+    # (mtime_ns, usage of the directory and its singly linked files, subdirectory names,
+    # ((st_dev, st_ino), usage) of multiply linked files). Runs on the du pool threads.
+    def __du_scan(self, path, cache):
+        try:
+            info = os.lstat(path)
+        except OSError:
+            return (0, 0, (), ())
+        cached = cache.get(os.path.abspath(path))
+        if cached is not None and cached[0] == info.st_mtime_ns:
+            return cached
+        usage, subdirectories, links = self.__block_usage(info), [], []
+        try:
+            with os.scandir(path) as listing:
+                for entry in listing:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirectories.append(entry.name)
+                            continue
+                        entry_info = entry.stat(follow_symlinks=False)
+                    except OSError:
+                        continue
+                    if entry_info.st_nlink > 1:
+                        links.append(((entry_info.st_dev, entry_info.st_ino), self.__block_usage(entry_info)))
+                    else:
+                        usage += self.__block_usage(entry_info)
+        except OSError as e:
+            print(self.color_text(f"du: cannot read directory '{path}': {e.strerror}", 'red'), file=sys.stderr)
+            return (0, usage, (), ())
+        return (info.st_mtime_ns, usage, tuple(subdirectories), tuple(links))
+
+    # checksum [-a algorithm] [file...]: "digest  path" lines like sha256sum, files hashed in parallel;
+    # checksum -c manifest checks such lines against the files
+    def __checksum_command(self, args):
+        try:
+            options, files = getopt.gnu_getopt(args, 'a:c:', ['no-cache'])
+            options = dict(options)
+        except getopt.GetoptError:
+            print(self.color_text(self.__HELP_DICT['checksum'], 'red'), file=sys.stderr)
+            return 1
+        algorithm = options.get('-a')
+        if algorithm is not None and not self.__checksum_algorithm(algorithm):
+            return 1
+        try:
+            if '-c' in options:
+                return self.__verify_checksums(options['-c'], algorithm)
+            algorithm = algorithm or 'sha256'
+            if not files:
+                digest = hashlib.new(algorithm)
+                for chunk in iter(lambda: sys.stdin.buffer.read(CHECKSUM_CHUNK_SIZE), b''):
+                    digest.update(chunk)
+                print(f'{digest.hexdigest()}  -')
+                return 0
+            status = 0
+            for path, digest in self.__hash_files(files, algorithm, '--no-cache' not in options):
+                if isinstance(digest, OSError):
+                    print(self.color_text(f'checksum: {path}: {digest.strerror}', 'red'), file=sys.stderr)
+                    status = 1
+                else:
+                    sys.stdout.write(f'{digest}  {path}\n')
+            sys.stdout.flush()
+            return status
+        except KeyboardInterrupt:
             print()
-        else:
-            print(self.color_text("Please provide text to echo.", 'red'))
-            print(self.color_text(self.__HELP_DICT['echo'], 'red'))
+            return 130
 
-    def __default_condition(self, command, parts):
-        # fallback: spawn a subprocess to run the command
+    def __checksum_algorithm(self, algorithm):
         try:
-            pid = os.fork() # create a new process
-            if pid == 0:
-                # Child process
-                os.execvp(parts[0], parts) #replace the current process with a new one
-            else:
-                # Parent process waits for child
-                os.wait()
+            hashlib.new(algorithm).hexdigest()
+            return True
+        except (ValueError, TypeError):  # unknown, or a shake_* hash without a fixed length
+            names = ', '.join(sorted(name for name in hashlib.algorithms_guaranteed if not name.startswith('shake')))
+            print(self.color_text(f"checksum: unsupported algorithm '{algorithm}' (try {names})", 'red'), file=sys.stderr)
+            return False
 
-        except AttributeError:
-            # If os.fork() is not available on the OS (e.g., Windows), fallback to subprocess
+    # (path, hex digest or OSError) for each path, in order, hashed on CHECKSUM_WORKERS threads.
+    # With the cache, a file whose size, mtime and inode match its cached entry is not read.
+    def __hash_files(self, paths, algorithm, use_cache=True):
+        cache = self.__checksum_cache() if use_cache else None
+        fresh = False
+        # several files per task when there are many, so small files do not pay a future each
+        size = max(1, min(64, len(paths) // (CHECKSUM_WORKERS * 4)))
+        batches = [paths[start:start + size] for start in range(0, len(paths), size)]
+        with futures.ThreadPoolExecutor(CHECKSUM_WORKERS) as pool:
+            results = pool.map(lambda batch: [self.__hash_file(path, algorithm, cache) for path in batch], batches)
+            for path, (digest, computed) in zip(paths, itertools.chain.from_iterable(results)):
+                fresh = fresh or computed
+                yield path, digest
+        if cache is not None and fresh:
+            for key in list(itertools.islice(cache, max(len(cache) - CHECKSUM_CACHE_ENTRIES, 0))):
+                del cache[key]
             try:
-                result = subprocess.run(command, shell=True, capture_output=True, text=True)
-                if result.stdout: # if normal output
-                    print(result.stdout)
-                if result.stderr: # if error
-                    print(self.color_text(f'IIUI-Shell: {command}: command not found.', 'red'))
-                    print(self.color_text("Type 'help' to check valid commands.", 'purple'))
-                    print(self.color_text(result.stderr, 'purple'))
+                os.makedirs(INDEX_DIR, exist_ok=True)
+                path = os.path.join(INDEX_DIR, 'checksum.cache')
+                with open(path + '.tmp', 'wb') as f:
+                    pickle.dump(cache, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(path + '.tmp', path)
+            except OSError as e:
+                print(self.color_text(f'checksum: cannot save cache: {e.strerror}', 'red'), file=sys.stderr)
 
-            except Exception as e:
-                print(self.color_text(f"Error executing command: {e}", 'red'))
-                print(f'IIUI-Shell: {command}: command not found.')
-                print("Type 'help' to check valid commands.")
+    def __checksum_cache(self):
+        if self.__checksums is None:
+            try:
+                with open(os.path.join(INDEX_DIR, 'checksum.cache'), 'rb') as f:
+                    self.__checksums = pickle.load(f)
+            except (OSError, EOFError, pickle.UnpicklingError):
+                self.__checksums = {}
+        return self.__checksums
 
-        except Exception as e:
-            print(self.color_text(f"Error executing command: {e}", 'red'))
-            print(f'IIUI-Shell: {command}: command not found.')
-            print("Type 'help' to check valid commands.")
+    # One file, on a pool thread: (hex digest or OSError, whether it was computed). A cache hit
+    # costs one stat. Large files are hashed from an mmap in one update; others through a
+    # per-thread buffer with readinto.
+    def __hash_file(self, path, algorithm, cache):
+        try:
+            if cache is not None:
+                key = (algorithm, os.path.abspath(path))
+                entry = cache.get(key)
+                if entry is not None:
+                    info = os.stat(path)
+                    if entry[:3] == (info.st_size, info.st_mtime_ns, info.st_ino):
+                        return entry[3], False
+            with open(path, 'rb', buffering=0) as f:
+                info = os.fstat(f.fileno())
+                digest = hashlib.new(algorithm)
+                if info.st_size >= CHECKSUM_MMAP_SIZE and stat.S_ISREG(info.st_mode):
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                        digest.update(data)
+                else:
+                    buffers = self.__checksum_buffers
+                    if not hasattr(buffers, 'view'):
+                        buffers.view = memoryview(bytearray(CHECKSUM_CHUNK_SIZE))
+                    while count := f.readinto(buffers.view):
+                        digest.update(buffers.view[:count])
+                hexdigest = digest.hexdigest()
+                if cache is not None and time.time() - info.st_mtime > CHECKSUM_RACY_SECONDS:
+                    cache.pop(key, None)  # re-insert at the end: the cache drops its oldest keys
+                    cache[key] = (info.st_size, info.st_mtime_ns, info.st_ino, hexdigest)
+                return hexdigest, True
+        except OSError as e:
+            return e, False
 
-    def __display_help(self):
-        print(self.color_text('Available Commands:', 'crimson'))
-        for cmd, desc in self.__HELP_DICT.items():
-            current_cmd = f'{cmd:<10}'
-            print(f"- {self.color_text((current_cmd),'yellow')} : {self.color_text(desc, 'purple')}")
+    # checksum -c: lines of "digest  path" (or "digest *path"), checked in parallel. The files are
+    # always read, never taken from the cache. The algorithm follows from the digest length unless -a.
+    def __verify_checksums(self, manifest, algorithm=None):
+        try:
+            with (open(sys.stdin.fileno(), closefd=False) if manifest == '-' else open(manifest)) as f:
+                lines = f.read().splitlines()
+        except OSError as e:
+            print(self.color_text(f'checksum: {manifest}: {e.strerror}', 'red'), file=sys.stderr)
+            return 1
+        entries, malformed = [], 0
+        for line in lines:
+            match = re.fullmatch(r'([0-9a-fA-F]+) [ *](.+)', line)
+            if match and (algorithm or CHECKSUM_LENGTHS.get(len(match.group(1)))):
+                entries.append((match.group(2), match.group(1).lower(), algorithm or CHECKSUM_LENGTHS[len(match.group(1))]))
+            elif line.strip():
+                malformed += 1
+        failed = unreadable = 0
+        for algorithm_name in dict.fromkeys(name for _, _, name in entries):
+            group = [(path, expected) for path, expected, name in entries if name == algorithm_name]
+            results = self.__hash_files([path for path, _ in group], algorithm_name, use_cache=False)
+            for (path, expected), (_, digest) in zip(group, results):
+                if isinstance(digest, OSError):
+                    print(self.color_text(f'{path}: FAILED open or read', 'red'))
+                    unreadable += 1
+                elif digest != expected:
+                    print(self.color_text(f'{path}: FAILED', 'red'))
+                    failed += 1
+                else:
+                    print(f'{path}: OK')
+        for count, message in ((malformed, 'line(s) are improperly formatted'), (unreadable, 'listed file(s) could not be read'),
+                               (failed, 'computed checksum(s) did NOT match')):
+            if count:
+                print(self.color_text(f'checksum: WARNING: {count} {message}', 'red'), file=sys.stderr)
+        return 1 if failed or unreadable or not entries else 0
 
-    def __create_file(self, path, arg):
-        if path:
-            if not os.path.exists(path):
-                open(path, 'a').close()
-                print(f'File {arg} created successfully.')
-            else:
-                print(self.color_text(f'File {arg} already exists.', 'red'))
-        else:
-            print(self.color_text(self.__HELP_DICT['touch'], 'red'))
+    # archive create|extract|list. The format follows the archive name: .tar, .tar.gz/.tgz, .zip, or
+    # .gz for a single file. Entries stream through tarfile/zipfile in chunks; gzip output is
+    # compressed on ARCHIVE_WORKERS threads by ParallelGzip.
+    def __archive_command(self, args):
+        action, args = (args[0], args[1:]) if args else (None, [])
+        try:
+            options, paths = getopt.gnu_getopt(args, {'create': 'j:123456789', 'extract': 'C:', 'list': 'v'}.get(action, ''))
+        except getopt.GetoptError as e:
+            print(self.color_text(f'archive: {e.msg}', 'red'), file=sys.stderr)
+            return 2
+        options = dict(options)
+        kind = self.__archive_kind(paths[0]) if paths else None
+        if action not in ('create', 'extract', 'list') or not paths or (action == 'create') != (len(paths) > 1):
+            print(self.color_text(self.__HELP_DICT['archive'], 'red'), file=sys.stderr)
+            return 2
+        if kind is None:
+            print(self.color_text(f'archive: {paths[0]}: unknown format (use .tar, .tar.gz, .tgz, .zip or .gz)', 'red'), file=sys.stderr)
+            return 2
+        try:
+            if action == 'create':
+                jobs = options.get('-j', str(ARCHIVE_WORKERS))
+                if not jobs.isdigit() or not int(jobs):
+                    raise getopt.GetoptError(f"invalid number of jobs '{jobs}'")
+                level = max([int(flag[1]) for flag in options if flag[1:].isdigit()], default=ARCHIVE_LEVEL)
+                return self.__archive_create(kind, paths[0], paths[1:], int(jobs), level)
+            if action == 'extract':
+                return self.__archive_extract(kind, paths[0], options.get('-C', '.'))
+            return self.__archive_list(kind, paths[0], '-v' in options)
+        except getopt.GetoptError as e:
+            print(self.color_text(f'archive: {e.msg}', 'red'), file=sys.stderr)
+            return 2
+        except (OSError, EOFError, tarfile.TarError, zipfile.BadZipFile, zlib.error) as e:
+            print(self.color_text(f'archive: {getattr(e, "filename", None) or paths[0]}: {getattr(e, "strerror", None) or e}', 'red'), file=sys.stderr)
+            return 1
+        except KeyboardInterrupt:
+            print()
+            return 130
 
-    def __remove_file(self, path, arg):
-        if path:
-            if os.path.exists(path):
-                os.remove(path)
-                print(f'File {arg} removed successfully.')
-            else:
-                print(self.color_text(f'File {arg} does not exist.', 'red'))
-        else:
-            print(self.color_text(self.__HELP_DICT['rm'], 'red'))
+    @staticmethod
+    def __archive_kind(path):
+        name = path.lower()
+        for suffix, kind in (('.tar.gz', 'tgz'), ('.tgz', 'tgz'), ('.tar', 'tar'), ('.zip', 'zip'), ('.gz', 'gz')):
+            if name.endswith(suffix):
+                return kind
+        return None
 
-    def __remove_directory(self, path, arg):
-        if path:
-            if os.path.exists(path):
-                shutil.rmtree(path)
-                print(f'Directory {arg} removed successfully.')
-            else:
-                print(self.color_text(f'Directory {arg} does not exist.', 'red'))
-        else:
-            print(self.color_text(self.__HELP_DICT['rmdir'], 'red'))
+    def __archive_create(self, kind, archive, paths, jobs, level):
+        for path in paths:
+            if not os.path.lexists(path):
+                raise FileNotFoundError(errno.ENOENT, 'No such file or directory', path)
+        temporary = archive + '.part'
+        excluded = {os.path.abspath(archive), os.path.abspath(temporary)}  # when packing the directory they are in
 
-    def __create_directory(self, path, arg):
-        if path:
-            if not os.path.exists(path):
-                os.mkdir(path)
-                print(f'Directory {arg} created successfully.')
-            else:
-                print(self.color_text(f'Directory {arg} already exists.', 'red'))
-        else:
-            print(self.color_text(self.__HELP_DICT['mkdir'], 'red'))
-
-    # Run the given command in the background.
-    def __run_background(self, command_line):
-        # Remove the ampersand, split into command components
-        cmd = command_line.replace('&', '').strip().split()
-        if cmd[0] == "sleep":
-            if len(cmd) < 2 or not cmd[1].isdigit():
-                print(self.color_text(self.__HELP_DICT['sleep'], 'red'))
-                return
-            
+        def add(bundle):
+            for path in paths:
+                root = os.sep if os.path.isabs(path) else ''  # tarfile strips the leading "/" of names
+                bundle.add(path, filter=lambda info: None if os.path.abspath(root + info.name) in excluded else info)
         try:
-            process = subprocess.Popen(cmd) #launches the process asynchronously (in the background).
-            self.__background_jobs.append((process.pid, ' '.join(cmd)))
-            print(f"[{process.pid}] Running in background: {' '.join(cmd)}")
-        except FileNotFoundError:
-            print(self.color_text(self.__HELP_DICT['&'], 'red'))
-
-    def __list_jobs(self):
-        # List all background jobs stored so far.
-        for pid, cmd in self.__background_jobs:
-            print(f"[{pid}] {cmd}")
-
-    def __handle_io_redirection(self, command):
-        if '>>' in command:
-            parts = command.split('>>')  
-        elif '>' in command:
-            parts = command.split('>')
-        elif '<' in command:
-            parts = command.split('<')  
-
-        left = parts[0].strip()  # Command and argument
-        right = parts[1].strip()  # Redirection file
-
-        left_parts = left.split(' ', 1)
-        cmd = left_parts[0]
-        arg = left_parts[1] if len(left_parts) > 1 else ''
-        redirection_file = right
-
-        path = os.path.join(os.getcwd(), redirection_file)
-        if not redirection_file:
-            print(self.color_text(self.__HELP_DICT['mv'], 'red'))
-            return
+            with open(temporary, 'wb') as output:
+                if kind == 'zip':
+                    with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED, compresslevel=level) as bundle:
+                        for path in paths:
+                            for name in [path] + sorted(self.__archive_walk(path)):
+                                if os.path.abspath(name) not in excluded:
+                                    bundle.write(name)
+                elif kind == 'gz':
+                    if len(paths) != 1 or not os.path.isfile(paths[0]):
+                        raise getopt.GetoptError('a .gz archive holds exactly one file (use .tar.gz for more)')
+                    with ParallelGzip(output, jobs, level) as compressed, open(paths[0], 'rb') as source:
+                        shutil.copyfileobj(source, compressed, ARCHIVE_BLOCK_SIZE)
+                elif kind == 'tgz':
+                    with ParallelGzip(output, jobs, level) as compressed:
+                        with tarfile.open(fileobj=compressed, mode='w|', format=tarfile.PAX_FORMAT) as bundle:
+                            add(bundle)
+                else:
+                    with tarfile.open(fileobj=output, mode='w|', format=tarfile.PAX_FORMAT) as bundle:
+                        add(bundle)
+            os.replace(temporary, archive)
+        finally:
+            if os.path.exists(temporary):
+                os.unlink(temporary)
+        return 0
 
-        output = bytes(arg.replace('"', ''), "utf-8").decode("unicode_escape")
-                    
-        if '>>' in command: # write in the file
-            with open(path, 'a') as f:
-                f.write(output + '\n')
-
-        elif '>' in command: # append in file
-            with open(path, 'w') as f:
-                f.write(output + '\n')
-
-        elif '<' in command: # read content from file
-            if os.path.exists(path):
-                with open(path, 'r') as f:
-                    content = f.read().strip()
-                    print(content)
-            else:
-                print(self.color_text(f"Input file '{right}' does not exist.", 'red')) 
-        else:
-            print(self.color_text(f'Redirection with >, >>, or < is supported for echo only.', 'red'))
-            print(self.color_text(self.__HELP_DICT['echo'], 'red'))
+    # every path below a directory (files, symlinks and directories), for zip
+    def __archive_walk(self, path):
+        for directory, names, files in os.walk(path):
+            for name in names + files:
+                yield os.path.join(directory, name)
 
-    def __run_pipe(self, command_line):
-        try:
-            # Parse piped commands
-            parts = [cmd.strip().split() for cmd in command_line.strip().split('|')]
-            
-            # First process. The output of this process will be connected so it can be fed into another process.
-            prev = subprocess.Popen(parts[0], stdout=subprocess.PIPE) 
-            
-            # Intermediate processes
-            for part in parts[1:-1]:
-                proc = subprocess.Popen(part, stdin=prev.stdout, stdout=subprocess.PIPE)
-                prev.stdout.close()
-                prev = proc
-
-            # Final process
-            final = subprocess.Popen(parts[-1], stdin=prev.stdout, stdout=subprocess.PIPE)
-            prev.stdout.close()
-
-            # Wait for completion
-            output, _ = final.communicate()
-
-            # Clean output
-            return output.decode().strip()
-        except Exception:
-            print(self.color_text(self.__HELP_DICT['|'], 'red'))
-
-    def __handle_running_process(self, parts ):
-        if len(parts) > 1 and parts[1] == 'aux':
-            try:
-                # runs the command, waits for it to complete, and returns its output as bytes.
-                output = subprocess.check_output(['ps', 'aux'], stderr=subprocess.STDOUT)
-                print(output.decode())
-            except subprocess.CalledProcessError as e:
-                print(f"Error: {e.output.decode()}")
+    # Extraction streams the archive front to back. Tar members go through the 'data' filter,
+    # which refuses absolute paths, ".." escapes and special files; zipfile sanitizes names itself.
+    def __archive_extract(self, kind, archive, destination):
+        os.makedirs(destination, exist_ok=True)
+        if kind == 'zip':
+            with zipfile.ZipFile(archive) as bundle:
+                bundle.extractall(destination)
+        elif kind == 'gz':
+            name = os.path.join(destination, os.path.basename(archive)[:-3])
+            with gzip.open(archive, 'rb') as source, open(name, 'wb') as output:
+                shutil.copyfileobj(source, output, ARCHIVE_BLOCK_SIZE)
         else:
-            print(self.color_text(self.__HELP_DICT['ps'], 'red'))
+            with tarfile.open(archive, 'r|*') as bundle:
+                bundle.extractall(destination, **({'filter': 'data'} if hasattr(tarfile, 'data_filter') else {}))
+        return 0
 
-    def run_shell(self):
-        self.__welcome()
-        # handle auto cmpletion on tab press
-        readline.set_completer(self.__completer)
-        readline.parse_and_bind('tab: complete')
-
-        #list to store the commands entered
-        history = []
+    # Listing reads headers only: the zip central directory, or tar headers with the member data
+    # seeked over (a compressed tar still has to be decompressed to find them).
+    def __archive_list(self, kind, archive, verbose):
+        lines = []
+        if kind == 'zip':
+            with zipfile.ZipFile(archive) as bundle:
+                for info in bundle.infolist():
+                    mode = stat.filemode(info.external_attr >> 16) if info.external_attr >> 16 else '?' * 10
+                    lines.append((mode, info.file_size, time.mktime(info.date_time + (0, 0, -1)), info.filename))
+        elif kind == 'gz':
+            with open(archive, 'rb') as f:
+                f.seek(-4, os.SEEK_END)
+                size = struct.unpack('<I', f.read(4))[0]  # modulo 4 GiB, as gzip -l reports it
+            lines.append(('-rw-r--r--', size, os.stat(archive).st_mtime, os.path.basename(archive)[:-3]))
+        else:
+            with tarfile.open(archive, 'r:' if kind == 'tar' else 'r|gz') as bundle:
+                for info in bundle:
+                    name = info.name + ('/' if info.isdir() else f' -> {info.linkname}' if info.issym() else '')
+                    lines.append((stat.filemode(info.mode | {tarfile.DIRTYPE: stat.S_IFDIR, tarfile.SYMTYPE: stat.S_IFLNK}.get(info.type, stat.S_IFREG)),
+                                  info.size, info.mtime, name))
+        if verbose:
+            width = max((len(str(size)) for _, size, _, _ in lines), default=1)
+            output = (f"{mode} {size:>{width}} {time.strftime('%Y-%m-%d %H:%M', time.localtime(mtime))} {name}\n"
+                      for mode, size, mtime, name in lines)
+        else:
+            output = (f'{name}\n' for _, _, _, name in lines)
+        self.__write_lines((line.encode(errors='surrogateescape') for line in output), None)
+        return 0
 
-        while True:
-            # Prompt: "user@host IIUI-Shell ~/path $ "
-            print(self.color_text(f"\n{getpass.getuser()}@{os.environ['COMPUTERNAME']} ", 'green'),
-                  self.color_text("IIUI-Shell ", 'purple'),
-                  self.color_text(f"~/{'/'.join(os.getcwd().split('\\')[3:])} ", 'yellow'))
-            
-            command = input("$ ").strip()
+    def __move_file(self, parts):
+        try:
+            flags, pairs = self.__transfer_targets('mv', parts, 'nu')
+        except getopt.GetoptError as e:
+            print(self.color_text(e.msg, 'red'), file=sys.stderr)
+            return 1
 
-            if not command.strip():
+        status = 0
+        for path, des_path in pairs:
+            if not os.path.lexists(path):
+                print(self.color_text('Source path not found.', 'red'), file=sys.stderr)
+                status = 1
+                continue
+            if not self.__should_copy(os.lstat(path).st_mtime, des_path, flags):
                 continue
+            try:
+                try:
+                    # same filesystem: a rename moves any amount of data without copying it
+                    os.rename(path, des_path) if os.path.isdir(path) else os.replace(path, des_path)
+                except OSError as e:
+                    if e.errno != errno.EXDEV:
+                        raise
+                    # another filesystem: copy through the cp engine, then drop the source
+                    if self.__copy_paths([(path, des_path)], set()):
+                        status = 1
+                        continue
+                    shutil.rmtree(path) if os.path.isdir(path) and not os.path.islink(path) else os.remove(path)
+                print(f"File moved to {des_path}")
+            except (FileExistsError, IsADirectoryError, NotADirectoryError):
+                print(self.color_text("File already exists.",'red'), file=sys.stderr)
+                status = 1
+            except PermissionError:
+                print("Cannot move directory because its contents are currently in use.", file=sys.stderr)
+                status = 1
+            except OSError as e:
+                if e.errno == errno.ENOTEMPTY:
+                    print(self.color_text("File already exists.",'red'), file=sys.stderr)
+                else:
+                    print(f"An unexpected error occur: {e.strerror}", file=sys.stderr)
+                status = 1
+        return status
 
-            if command == 'exit':
-                print(self.color_text("Exiting IIUI-Shell. Goodbye!", 'crimson'))
+    # Write a whole file to stdout in constant memory: regular files are mmap'ed and written in
+    # PIPE_CHUNK_SIZE slices (no copies, binary safe); pipes and devices go through one reusable buffer.
+    def __stream_file(self, path):
+        sys.stdout.flush()
+        target = getattr(sys.stdout, 'buffer', None)
+        with open(path, 'rb', buffering=0) as f:
+            info = os.fstat(f.fileno())
+            if target is None or not stat.S_ISREG(info.st_mode) or not info.st_size:
+                self.__pump_output(f)
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                view = memoryview(mapped)
+                try:
+                    for offset in range(0, len(view), PIPE_CHUNK_SIZE):
+                        target.write(view[offset:offset + PIPE_CHUNK_SIZE])
+                finally:
+                    view.release()
+        target.flush()
+
+    def __cat_command(self, args):
+        if not args:
+            # no file operands: copy standard input ("cat < file", the end of a pipe)
+            try:
+                self.__pump_output(sys.stdin.buffer)
+            except BrokenPipeError:
+                pass
+            except KeyboardInterrupt:
+                print()
+                return 130
+            return 0
+        status = 0
+        for arg in args:
+            path = os.path.abspath(arg)
+            try:
+                self.__stream_file(path) # stream content from the file
+            except FileNotFoundError:
+                print(self.color_text(f'{arg} file does not exit.', 'red'), file=sys.stderr)
+                status = 1
+            except IsADirectoryError:
+                print(self.color_text(f'cat: {arg}: Is a directory', 'red'), file=sys.stderr)
+                status = 1
+            except BrokenPipeError:
                 break
+        return status
 
-            history.append(command)
-
-            #split command into parts
-            parts = command.split(" ")
-            cmd = parts[0]
-            arg = parts[1].replace('"','') if len(parts) > 1 else None
-            path = os.path.abspath(arg) if arg else None
-            match cmd:
-                case 'nano':
-                    subprocess.run(f"nano {arg}", shell=True)
-
-                case 'hostname':
-                    print(os.environ['COMPUTERNAME'])
-
-                case 'cp':
-                    self.__copy_file(path, parts)
-                
-                case 'jobs':
-                    self.__list_jobs()
-                
-                case 'tree':
-                    self.__print_tree(fr'{os.getcwd()}')
-
-                case 'open':
-                    if not parts[1:]:
-                        print(self.color_text(self.__HELP_DICT['open'], 'red'))
-                    else:
-                        os.system(f'start {(" ".join((parts[1:])))}')
-                
-                case 'ram':
-                    memory = psutil.virtual_memory()
-                    if arg == 'used':
-                        print(f"{memory.used / (1024**3):.2f} GB")
-                        print(f"{memory.percent}%") 
-                    elif arg == 'total': 
-                        print(f"{memory.total / (1024**3):.2f} GB")
-                    elif arg == 'available':
-                        print(f"{memory.available / (1024**3):.2f} GB")
-                    else:
-                        print(self.color_text(self.__HELP_DICT['ram'], 'red'))
-
-                case 'disk':
-                    disk = psutil.disk_usage('/')
-                    if arg == 'used':
-                        print(f"{disk.used / (1024**3):.2f} GB")
-                        print(f"{disk.percent}%") 
-                    elif arg == 'total': 
-                        print(f"{disk.total / (1024**3):.2f} GB")
-                    elif arg == 'available':
-                        print(f"{disk.free / (1024**3):.2f} GB")
-                    else:
-                        print(self.color_text(self.__HELP_DICT['disk'], 'red'))
+    # The last count lines of an open binary file, read backwards from the end in blocks so the
+    # cost depends on the size of those lines, not of the file.
+    def __last_lines(self, f, count):
+        position = f.seek(0, os.SEEK_END)
+        blocks, newlines = [], 0
+        while position > 0 and newlines <= count:
+            step = min(TAIL_BLOCK_SIZE, position)
+            position -= step
+            f.seek(position)
+            blocks.append(f.read(step))
+            newlines += blocks[-1].count(b'\n')
+        f.seek(0, os.SEEK_END)
+        data = b''.join(reversed(blocks))
+        return data.splitlines(keepends=True)[-count:] if count > 0 else []
 
-                case 'mv':
-                    self.__move_file(path, parts)
+    # tail -f: keep writing whatever is appended, reopening on rotation and rewinding on truncation
+    def __follow_file(self, f, path):
+        target = getattr(sys.stdout, 'buffer', None)
+        try:
+            while True:
+                chunk = f.read(PIPE_CHUNK_SIZE)
+                if chunk:
+                    target.write(chunk) if target else sys.stdout.write(chunk.decode(errors='replace'))
+                    sys.stdout.flush() if not target else target.flush()
+                    continue
+                time.sleep(TAIL_POLL_INTERVAL)
+                try:
+                    info = os.stat(path)
+                except FileNotFoundError:
+                    continue  # mid-rotation; wait for the new file
+                if info.st_ino != os.fstat(f.fileno()).st_ino:
+                    f.close()
+                    f = open(path, 'rb')
+                elif info.st_size < f.tell():
+                    f.seek(0)
+        except KeyboardInterrupt:
+            print()
+        finally:
+            f.close()
 
-                case 'cd':
-                    self.__change_directory(path, arg)
+    # head/tail on files: head reads only as far as it needs, tail seeks from the end
+    def __head_tail(self, command, args):
+        try:
+            count, files, options = self.__line_count(args, 'n:f' if command == 'tail' else 'n:')
+        except getopt.GetoptError:
+            print(self.color_text(self.__HELP_DICT[command], 'red'), file=sys.stderr)
+            return 1
+        if not files:
+            # no file operands: standard input, which can only be read forwards
+            if command == 'head':
+                return self.__write_lines(itertools.islice(sys.stdin.buffer, max(count, 0)), None)
+            return self.__write_lines(iter(collections.deque(sys.stdin.buffer, maxlen=max(count, 0))), None)
+        sys.stdout.flush()
+        status = 0
+        for name in files:
+            path = os.path.abspath(name)
+            if len(files) > 1:
+                print(f'==> {name} <==')
+                sys.stdout.flush()
+            try:
+                f = open(path, 'rb')
+            except OSError as e:
+                print(self.color_text(f'{command}: {name}: {e.strerror}', 'red'), file=sys.stderr)
+                status = 1
+                continue
+            if command == 'head':
+                with f:
+                    self.__write_lines(itertools.islice(f, max(count, 0)), None)
+            elif '-f' in options:
+                self.__write_lines(self.__last_lines(f, count), None)
+                self.__follow_file(f, path)
+            else:
+                with f:
+                    self.__write_lines(self.__last_lines(f, count), None)
+        return status
 
-                case 'cat':
-                    if '|' in command:
-                        output = self.__run_pipe(command)
-                        print(output, end='' if output.endswith('\n') else '\n')
-                        continue
-                    else:
-                        self.__cat_command(path, arg)
+    # A less-like pager over an mmap of the file: every move is a find/rfind for newlines around
+    # the current byte offset, so any position is reachable without reading the whole file.
+    def __page_file(self, args):
+        if not args:
+            print(self.color_text(self.__HELP_DICT['less'], 'red'), file=sys.stderr)
+            return 1
+        path = os.path.abspath(args[0])
+        try:
+            f = open(path, 'rb')
+        except OSError as e:
+            print(self.color_text(f'less: {args[0]}: {e.strerror}', 'red'), file=sys.stderr)
+            return 1
+        with f:
+            size = os.fstat(f.fileno()).st_size
+            if not size:
+                return 0
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                rows = max(shutil.get_terminal_size((80, 24)).lines - 2, 1)
 
-                case 'top':
-                    self.__display_running_processes()
-                
-                case 'kill':
-                    self.__kill_running_process(arg)
+                def line_start(position):
+                    return mapped.rfind(b'\n', 0, max(position, 0)) + 1 if position > 0 else 0
 
-                case 'pwd':
-                    print(os.getcwd())
+                def back(position, lines):
+                    for _ in range(lines):
+                        if position <= 0:
+                            break
+                        position = line_start(position - 1)
+                    return position
 
-                case 'ls':
-                    if '|' in command:
-                        output = self.__run_pipe(command)
-                        print(output, end='' if output.endswith('\n') else '\n')
-                        continue
-                    else:
-                        self.__display_list()
+                offset = 0
+                while True:
+                    position = offset
+                    page = []
+                    for _ in range(rows):
+                        if position >= size:
+                            break
+                        end = mapped.find(b'\n', position)
+                        end = size if end == -1 else end
+                        page.append(mapped[position:end].decode(errors='replace'))
+                        position = end + 1
+                    print('\n'.join(page))
+                    percent = min(position, size) * 100 // size
+                    try:
+                        action = input(self.color_text(f'{args[0]} {percent}% (byte {offset}) '
+                                                       f'[Enter: down, b: up, g/G: top/end, N%, @byte, /text, q] ', 'yellow')).strip()
+                    except (EOFError, KeyboardInterrupt):
+                        print()
+                        break
+                    if action == 'q':
+                        break
+                    elif action in ('', 'f', ' '):
+                        offset = position if position < size else offset
+                    elif action == 'b':
+                        offset = back(offset, rows)
+                    elif action == 'g':
+                        offset = 0
+                    elif action == 'G':
+                        offset = back(size, rows)
+                    elif action.endswith('%') and action[:-1].isdigit():
+                        offset = line_start(size * min(int(action[:-1]), 100) // 100)
+                    elif action.startswith('@') and action[1:].isdigit():
+                        offset = line_start(min(int(action[1:]), size))
+                    elif action.startswith('/') and len(action) > 1:
+                        found = mapped.find(action[1:].encode(), position if position < size else offset)
+                        if found == -1:
+                            print(self.color_text('Pattern not found', 'red'))
+                        else:
+                            offset = line_start(found)
+        return 0
 
-                case 'ps':
-                    if '|' in command:
-                        output = self.__run_pipe(command)
-                        print(output, end='' if output.endswith('\n') else '\n')
-                        continue
-                    else:
-                        self.__handle_running_process(parts)
+    def __change_directory(self, path, arg):
+        if path:
+            if arg=='..':
+                os.chdir(path)
+            else:
+                if os.path.exists(path):
+                    os.chdir(path)
+                else:
+                    print(self.color_text(f"{path} path does not exist.", 'red'), file=sys.stderr)
+        else:
+            print(self.color_text(self.__HELP_DICT['cd'], 'red'), file=sys.stderr)
 
-                case 'echo':
-                    if '>' in command or '>>' in command or '<' in command:
-                        self.__handle_io_redirection(command)
-                        continue
-                    self.__display_echo(arg, parts)
-
-                case 'date':
-                    print(datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
-
-                case 'whoami':
-                    print(getpass.getuser())
-
-                case 'mkdir':
-                    self.__create_directory(path, arg)
-
-                case 'rmdir':
-                    self.__remove_directory(path, arg)
-                
-                case 'rm':
-                    self.__remove_file(path, arg)
-
-                case 'touch':
-                    self.__create_file(path, arg)
-                
-                case 'history':
-                    for cmd in history:
-                        print(cmd)
-
-                case 'help':
-                    self.__display_help()
-
-                case 'clear':
-                    os.system('cls' if os.name == 'nt' else 'clear')
-                        
-                case _:
-                    if command.endswith('&'):
-                        self.__run_background(command)
+    # gid -> group name, resolved once per gid
+    def __group_name(self, gid):
+        name = self.__group_names.get(gid)
+        if name is None:
+            try:
+                name = grp.getgrgid(gid).gr_name if grp else str(gid)
+            except KeyError:
+                name = str(gid)
+            self.__group_names[gid] = name
+        return name
+
+    # uid -> user name, resolved once per uid
+    def __user_name(self, uid):
+        name = self.__user_names.get(uid)
+        if name is None:
+            try:
+                name = pwd.getpwuid(uid).pw_name if pwd else str(uid)
+            except KeyError:
+                name = str(uid)
+            self.__user_names[uid] = name
+        return name
+
+    # One pass over /proc: a single read of /proc/<pid>/stat plus one stat() for the owner per
+    # process. Other platforms fall back to one psutil.process_iter pass with the same fields.
+    def __read_process_table(self):
+        rows = {}
+        if os.path.isdir('/proc/self'):
+            ticks, page = os.sysconf('SC_CLK_TCK'), os.sysconf('SC_PAGE_SIZE')
+            with os.scandir('/proc') as entries:
+                for entry in entries:
+                    if not entry.name.isdigit():
+                        continue
+                    try:
+                        with open(f'/proc/{entry.name}/stat', 'rb') as f:
+                            data = f.read()
+                        uid = entry.stat().st_uid
+                    except OSError:
+                        continue  # exited between the listing and the read
+                    head, _, tail = data.rpartition(b')')
+                    fields = tail.split()
+                    pid = int(entry.name)
+                    rows[pid] = ProcessInfo(
+                        pid, int(fields[1]), head.partition(b'(')[2].decode(errors='replace'),
+                        fields[0].decode(), self.__user_name(uid),
+                        (int(fields[11]) + int(fields[12])) / ticks, int(fields[21]) * page,
+                        int(fields[20]), int(fields[19]) / ticks)
+            with open('/proc/uptime') as f:
+                uptime = float(f.read().split()[0])
+            memory = os.sysconf('SC_PHYS_PAGES') * page
+        else:
+            boot = psutil.boot_time()
+            for proc in psutil.process_iter(['pid', 'ppid', 'name', 'status', 'username', 'cpu_times',
+                                             'memory_info', 'create_time']):
+                info = proc.info
+                if info['cpu_times'] is None or info['memory_info'] is None:
+                    continue  # access denied
+                rows[info['pid']] = ProcessInfo(
+                    info['pid'], info['ppid'] or 0, info['name'] or '', (info['status'] or '?')[0].upper(),
+                    info['username'] or '?', info['cpu_times'].user + info['cpu_times'].system,
+                    info['memory_info'].rss, info['memory_info'].vms, (info['create_time'] or boot) - boot)
+            uptime = time.time() - boot
+            memory = psutil.virtual_memory().total
+
+        by_name, by_user = collections.defaultdict(list), collections.defaultdict(list)
+        for process in rows.values():
+            by_name[process.name].append(process.pid)
+            by_user[process.user].append(process.pid)
+        return {'time': time.monotonic(), 'rows': rows, 'by_name': by_name, 'by_user': by_user,
+                'uptime': uptime, 'memory': memory}
+
+    # The shared process snapshot, reused by top/ps/kill/pgrep/pkill while it is younger than max_age
+    def __process_table(self, max_age=PROCESS_SNAPSHOT_TTL):
+        snapshot = self.__process_snapshot
+        if not snapshot or time.monotonic() - snapshot['time'] > max_age:
+            snapshot = self.__read_process_table()
+            self.__process_snapshot.clear()
+            self.__process_snapshot.update(snapshot)
+        return snapshot
+
+    # processes whose name matches pattern (regex), optionally limited to one user; the shell
+    # itself is never matched. Only the distinct names are scanned, not every process.
+    def __match_processes(self, pattern, user=None, exact=False, ignore_case=False):
+        table = self.__process_table()
+        regex = re.compile(f'^(?:{pattern})$' if exact else pattern, re.IGNORECASE if ignore_case else 0)
+        pids = {pid for name, pids in table['by_name'].items() if regex.search(name) for pid in pids}
+        if user is not None:
+            pids &= set(table['by_user'].get(user, ()))
+        pids.discard(os.getpid())
+        return [table['rows'][pid] for pid in sorted(pids)]
+
+    # ps/top columns: name -> (header, width, value(process, table))
+    def __process_columns(self):
+        def percent_cpu(process, table):
+            alive = table['uptime'] - process.start
+            return f'{process.cpu * 100 / alive:.1f}' if alive > 0 else '0.0'
+
+        def cpu_time(process, table):
+            minutes, seconds = divmod(int(process.cpu), 60)
+            return f'{minutes}:{seconds:02d}'
+
+        def command(process, table):
+            try:
+                with open(f'/proc/{process.pid}/cmdline', 'rb') as f:
+                    return f.read().replace(b'\0', b' ').decode(errors='replace').strip() or f'[{process.name}]'
+            except OSError:
+                try:
+                    return ' '.join(psutil.Process(process.pid).cmdline()) or f'[{process.name}]'
+                except (psutil.Error, OSError):
+                    return f'[{process.name}]'
+
+        return {
+            'user': ('USER', -10, lambda p, t: p.user[:10]),
+            'pid': ('PID', 7, lambda p, t: p.pid),
+            'ppid': ('PPID', 7, lambda p, t: p.ppid),
+            '%cpu': ('%CPU', 5, percent_cpu),
+            '%mem': ('%MEM', 5, lambda p, t: f'{p.rss * 100 / t["memory"]:.1f}'),
+            'vsz': ('VSZ', 9, lambda p, t: p.vsz // 1024),
+            'rss': ('RSS', 8, lambda p, t: p.rss // 1024),
+            'stat': ('STAT', -4, lambda p, t: p.state),
+            'time': ('TIME', 8, cpu_time),
+            'name': ('NAME', -16, lambda p, t: p.name),
+            'command': ('COMMAND', 0, command),
+        }
+
+    def __format_row(self, values, widths):
+        return ' '.join(f'{value:<{-width}}' if width < 0 else (f'{value:>{width}}' if width else f'{value}')
+                        for value, width in zip(values, widths)).rstrip()
+
+    # ps as lines of text: "ps", "ps aux", "ps -o pid,rss,command", "-u user", "-p pid", "-C name"
+    def __ps_lines(self, args):
+        columns = self.__process_columns()
+        if args[:1] == ['aux']:
+            selected, args = ['user', 'pid', '%cpu', '%mem', 'vsz', 'rss', 'stat', 'time', 'command'], args[1:]
+        else:
+            selected = ['pid', 'ppid', 'user', 'stat', 'time', 'name']
+        options, _ = getopt.getopt(args, 'o:u:p:C:e')
+        options = dict(options)
+        if '-o' in options:
+            selected = [name.strip().lower() for name in options['-o'].split(',') if name.strip()]
+            unknown = [name for name in selected if name not in columns]
+            if unknown:
+                raise getopt.GetoptError(f"unknown column '{unknown[0]}' (choose from {', '.join(columns)})")
+
+        table = self.__process_table()
+        if '-C' in options:
+            processes = [table['rows'][pid] for pid in table['by_name'].get(options['-C'], ())]
+        elif '-u' in options:
+            processes = [table['rows'][pid] for pid in table['by_user'].get(options['-u'], ())]
+        elif '-p' in options:
+            processes = [table['rows'][int(pid)] for pid in options['-p'].split(',')
+                         if pid.isdigit() and int(pid) in table['rows']]
+        else:
+            processes = list(table['rows'].values())
+        processes.sort(key=lambda process: process.pid)
+
+        widths = [columns[name][1] for name in selected]
+        yield self.__format_row([columns[name][0] for name in selected], widths)
+        for process in processes:
+            yield self.__format_row([columns[name][2](process, table) for name in selected], widths)
+
+    def __handle_running_process(self, parts):
+        try:
+            sys.stdout.write(''.join(f'{line}\n' for line in self.__ps_lines(parts[1:])))
+        except getopt.GetoptError as e:
+            print(self.color_text(e.msg, 'red'), file=sys.stderr)
+            print(self.color_text(self.__HELP_DICT['ps'], 'red'), file=sys.stderr)
+            return 1
+        return 0
+
+    # ps as a pipeline source (ps aux | grep python)
+    def __ps_pipe_lines(self, args):
+        for line in self.__ps_lines(args):
+            yield line.encode() + b'\n'
+
+    # Refreshing top: CPU% comes from the CPU-time delta of each process between two snapshots.
+    # -n N stops after N frames (default: until Ctrl-C on a terminal, one frame otherwise), -d sets the delay.
+    def __display_running_processes(self, args):
+        try:
+            options = dict(getopt.getopt(args, 'n:d:u:')[0])
+            frames = int(options.get('-n', 0 if sys.stdout.isatty() else 1))
+            delay = float(options.get('-d', TOP_INTERVAL))
+        except (getopt.GetoptError, ValueError):
+            print(self.color_text(self.__HELP_DICT['top'], 'red'), file=sys.stderr)
+            return 1
+
+        interactive = sys.stdout.isatty()
+        previous = self.__process_table(max_age=0)
+        time.sleep(min(delay, TOP_FIRST_SAMPLE))
+        shown = 0
+        try:
+            while True:
+                table = self.__process_table(max_age=0)
+                elapsed = max(table['time'] - previous['time'], 1e-9)
+                usage = []
+                for process in table['rows'].values():
+                    if '-u' in options and process.user != options['-u']:
+                        continue
+                    before = previous['rows'].get(process.pid)
+                    used = process.cpu - before.cpu if before and before.start == process.start else 0.0
+                    usage.append((used * 100 / elapsed, process))
+                usage.sort(key=lambda item: item[0], reverse=True)
+
+                limit = shutil.get_terminal_size((80, 24)).lines - 4 if interactive else len(usage)
+                load = ' '.join(f'{value:.2f}' for value in os.getloadavg()) if hasattr(os, 'getloadavg') else '-'
+                lines = [f"{datetime.datetime.now():%H:%M:%S}  {len(table['rows'])} processes  load average: {load}",
+                         '',
+                         f"{'PID':>7} {'USER':<10} {'%CPU':>5} {'%MEM':>5} {'RSS':>8} S {'NAME'}"]
+                for cpu, process in usage[:limit]:
+                    lines.append(f"{process.pid:>7} {process.user[:10]:<10} {cpu:>5.1f} "
+                                 f"{process.rss * 100 / table['memory']:>5.1f} {process.rss // 1024:>8} "
+                                 f"{process.state} {process.name}")
+                sys.stdout.write(('\033[H\033[J' if interactive else '') + '\n'.join(lines) + '\n')
+                sys.stdout.flush()
+
+                shown += 1
+                if frames and shown >= frames:
+                    break
+                previous = table
+                time.sleep(delay)
+        except KeyboardInterrupt:
+            print()
+        return 0
+
+    # Start the background metrics sampler once per shell: one sample every METRICS_INTERVAL
+    # seconds, the first one an interval in, so psutil is not imported while the prompt is drawn.
+    def __start_metrics(self):
+        if self.__metrics_thread is not None:
+            return
+
+        def run():
+            while True:
+                time.sleep(METRICS_INTERVAL)
+                try:
+                    with self.__metrics_lock:
+                        self.__sample_metrics()
+                except Exception:
+                    pass  # a failing source (e.g. a vanished mount) must not kill the sampler
+
+        # Children that keep running Python (pipeline builtins, grep pool workers) must not inherit a
+        # psutil or import lock the sampler held mid-sample, so every fork waits for the sample to end.
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(before=self.__metrics_lock.acquire, after_in_parent=self.__metrics_lock.release,
+                                after_in_child=self.__metrics_lock.release)
+        self.__metrics_thread = threading.Thread(target=run, name='metrics', daemon=True)
+        self.__metrics_thread.start()
+
+    # Take one sample: a few /proc reads and one statvfs per mount, so it costs about a millisecond.
+    def __sample_metrics(self):
+        if self.__metrics_taken % METRICS_MOUNT_REFRESH == 0 or not self.__metrics_mounts:
+            mounts = []
+            for partition in psutil.disk_partitions(all=False):
+                if partition.mountpoint not in mounts:
+                    mounts.append(partition.mountpoint)
+            self.__metrics_mounts = mounts or [os.path.abspath(os.sep)]
+        disks = []
+        for mount in self.__metrics_mounts:
+            try:
+                usage = psutil.disk_usage(mount)
+            except OSError:
+                continue
+            disks.append((mount, usage.used, usage.total))
+        memory, swap = psutil.virtual_memory(), psutil.swap_memory()
+        io_counters = psutil.disk_io_counters()
+        self.__metrics.append(MetricSample(
+            time.time(), psutil.cpu_percent(), memory.used, memory.available, memory.total,
+            swap.used, swap.total, io_counters.read_bytes if io_counters else 0,
+            io_counters.write_bytes if io_counters else 0, tuple(disks)))
+        self.__metrics_taken += 1
+
+    # the buffered samples, oldest first (list() copies the deque without releasing the GIL)
+    def __metric_samples(self):
+        self.__start_metrics()
+        if not self.__metrics:
+            with self.__metrics_lock:
+                self.__sample_metrics()  # asked for before the sampler's first sample
+        return list(self.__metrics)
+
+    # (read, write) bytes per second between consecutive samples
+    def __io_rates(self, samples):
+        rates = []
+        for before, after in zip(samples, samples[1:]):
+            elapsed = max(after.time - before.time, 1e-9)
+            rates.append((max(after.read - before.read, 0) / elapsed, max(after.write - before.write, 0) / elapsed))
+        return rates
+
+    def __min_avg_max(self, values, format_value):
+        if not values:
+            return '-'
+        return '/'.join(format_value(value) for value in (min(values), sum(values) / len(values), max(values)))
+
+    # one character per value for the last width values, scaled from 0 to high (default: the largest)
+    def __sparkline(self, values, high=None, width=40):
+        values = values[-width:]
+        if not values:
+            return ''
+        high = high or max(values)
+        scale = (len(METRICS_SPARK) - 1) / high if high > 0 else 0
+        return ''.join(METRICS_SPARK[min(int(value * scale), len(METRICS_SPARK) - 1)] for value in values)
+
+    def __ram_command(self, args):
+        samples = self.__metric_samples()
+        latest = samples[-1]
+        match args[0] if args else None:
+            case 'used':
+                print(f"{latest.used / (1024**3):.2f} GB")
+                print(f"{latest.used * 100 / latest.total:.1f}%")
+            case 'total':
+                print(f"{latest.total / (1024**3):.2f} GB")
+            case 'available':
+                print(f"{latest.available / (1024**3):.2f} GB")
+            case 'history':
+                count = int(args[1]) if len(args) > 1 and args[1].isdigit() else 20
+                sys.stdout.write(f"{'TIME':<9} {'USED':>8} {'%':>5} {'AVAIL':>8} {'SWAP':>8} {'CPU%':>5}\n")
+                sys.stdout.write(''.join(
+                    f"{datetime.datetime.fromtimestamp(sample.time):%H:%M:%S}  {self.__human_size(sample.used):>8} "
+                    f"{sample.used * 100 / sample.total:>5.1f} {self.__human_size(sample.available):>8} "
+                    f"{self.__human_size(sample.swap_used):>8} {sample.cpu:>5.1f}\n" for sample in samples[-count:]))
+            case None:
+                used = [sample.used * 100 / sample.total for sample in samples]
+                percent = lambda value: f'{value:.1f}%'
+                print(f"Memory: {self.__human_size(latest.used)} used of {self.__human_size(latest.total)} "
+                      f"({used[-1]:.1f}%), {self.__human_size(latest.available)} available")
+                print(f"Swap:   {self.__human_size(latest.swap_used)} used of {self.__human_size(latest.swap_total)}")
+                print(f"Last {len(samples)} samples ({samples[-1].time - samples[0].time:.0f}s) min/avg/max: "
+                      f"memory {self.__min_avg_max(used, percent)}  "
+                      f"cpu {self.__min_avg_max([sample.cpu for sample in samples], percent)}")
+                print(f"memory {self.__sparkline(used, 100)}")
+            case _:
+                print(self.color_text(self.__HELP_DICT['ram'], 'red'), file=sys.stderr)
+                return 1
+        return 0
+
+    def __disk_command(self, args):
+        samples = self.__metric_samples()
+        latest = samples[-1]
+        match args[0] if args else None:
+            case 'used' | 'total' | 'available':
+                try:
+                    disk = psutil.disk_usage(os.path.abspath(args[1]) if len(args) > 1 else os.path.abspath(os.sep))
+                except OSError as e:
+                    print(self.color_text(f'disk: {args[1]}: {e.strerror}', 'red'), file=sys.stderr)
+                    return 1
+                value = {'used': disk.used, 'total': disk.total, 'available': disk.free}[args[0]]
+                print(f"{value / (1024**3):.2f} GB")
+                if args[0] == 'used':
+                    print(f"{disk.percent}%")
+            case 'history':
+                count = int(args[1]) if len(args) > 1 and args[1].isdigit() else 20
+                samples = samples[-count - 1:]
+                sys.stdout.write(f"{'TIME':<9} {'READ/s':>8} {'WRITE/s':>8}\n")
+                sys.stdout.write(''.join(
+                    f"{datetime.datetime.fromtimestamp(sample.time):%H:%M:%S}  {self.__human_size(read):>8} "
+                    f"{self.__human_size(write):>8}\n"
+                    for sample, (read, write) in zip(samples[1:], self.__io_rates(samples))))
+            case None:
+                sys.stdout.write(f"{'MOUNT':<24} {'USED':>8} {'TOTAL':>8} {'USE%':>5}\n")
+                sys.stdout.write(''.join(f"{mount[:24]:<24} {self.__human_size(used):>8} {self.__human_size(total):>8} "
+                                         f"{used * 100 / total if total else 0:>5.1f}\n" for mount, used, total in latest.disks))
+                rates = self.__io_rates(samples)
+                size = lambda value: f'{self.__human_size(value)}/s'
+                print(f"I/O now: read {size(rates[-1][0]) if rates else '-'}  write {size(rates[-1][1]) if rates else '-'}")
+                print(f"I/O min/avg/max: read {self.__min_avg_max([read for read, _ in rates], size)}  "
+                      f"write {self.__min_avg_max([write for _, write in rates], size)}")
+            case _:
+                print(self.color_text(self.__HELP_DICT['disk'], 'red'), file=sys.stderr)
+                return 1
+        return 0
+
+    # One dashboard frame: current values and a sparkline of the buffered history for each series.
+    def __metrics_frame(self, samples):
+        latest = samples[-1]
+        rates = self.__io_rates(samples)
+        memory = [sample.used * 100 / sample.total for sample in samples]
+        swap = [sample.swap_used * 100 / sample.swap_total if sample.swap_total else 0 for sample in samples]
+        lines = [f"{datetime.datetime.fromtimestamp(latest.time):%H:%M:%S}  {len(samples)} samples every {METRICS_INTERVAL:g}s",
+                 '',
+                 f"cpu    {latest.cpu:>6.1f}%  {self.__sparkline([sample.cpu for sample in samples], 100)}",
+                 f"memory {memory[-1]:>6.1f}%  {self.__sparkline(memory, 100)}",
+                 f"swap   {swap[-1]:>6.1f}%  {self.__sparkline(swap, 100)}",
+                 f"read   {self.__human_size(rates[-1][0]) if rates else '-':>6}/s {self.__sparkline([read for read, _ in rates])}",
+                 f"write  {self.__human_size(rates[-1][1]) if rates else '-':>6}/s {self.__sparkline([write for _, write in rates])}",
+                 '']
+        lines += [f"{mount[:24]:<24} {used * 100 / total if total else 0:>5.1f}% of {self.__human_size(total)}"
+                  for mount, used, total in latest.disks]
+        return lines
+
+    # Write the buffered samples as CSV (one column per mount) or as the binary format: METRICS_MAGIC,
+    # the mount count and names, then per sample one METRICS_RECORD followed by used/total per mount.
+    def __export_metrics(self, samples, path):
+        mounts = [mount for mount, _, _ in samples[-1].disks]
+        binary = path.endswith('.bin')
+        with open(path, 'wb') if binary else open(path, 'w', newline='') as f:
+            if binary:
+                f.write(METRICS_MAGIC + struct.pack('<H', len(mounts)))
+                for mount in mounts:
+                    name = mount.encode()
+                    f.write(struct.pack('<H', len(name)) + name)
+                disk_record = struct.Struct(f'<{2 * len(mounts)}Q')
+                for sample in samples:
+                    disks = {mount: (used, total) for mount, used, total in sample.disks}
+                    f.write(METRICS_RECORD.pack(*sample[:9]))
+                    f.write(disk_record.pack(*itertools.chain.from_iterable(disks.get(mount, (0, 0)) for mount in mounts)))
+                return
+            f.write(','.join(MetricSample._fields[:9] + tuple(f'{mount}:{field}' for mount in mounts
+                                                               for field in ('used', 'total'))) + '\n')
+            for sample in samples:
+                disks = {mount: (used, total) for mount, used, total in sample.disks}
+                row = [f'{sample.time:.3f}', f'{sample.cpu:.1f}'] + [str(value) for value in sample[2:9]]
+                row += [str(value) for mount in mounts for value in disks.get(mount, (0, 0))]
+                f.write(','.join(row) + '\n')
+
+    def __metrics_command(self, args):
+        samples = self.__metric_samples()
+        match args[0] if args else None:
+            case None:
+                sys.stdout.write('\n'.join(self.__metrics_frame(samples)) + '\n')
+            case 'watch':
+                try:
+                    options = dict(getopt.getopt(args[1:], 'n:d:')[0])
+                    frames = int(options.get('-n', 0))
+                    delay = float(options.get('-d', METRICS_INTERVAL))
+                except (getopt.GetoptError, ValueError):
+                    print(self.color_text(self.__HELP_DICT['metrics'], 'red'), file=sys.stderr)
+                    return 1
+                interactive = sys.stdout.isatty()
+                shown = 0
+                try:
+                    while True:
+                        frame = self.__metrics_frame(self.__metric_samples())
+                        sys.stdout.write(('\033[H\033[J' if interactive else '') + '\n'.join(frame) + '\n')
+                        sys.stdout.flush()
+                        shown += 1
+                        if frames and shown >= frames:
+                            break
+                        time.sleep(delay)
+                except KeyboardInterrupt:
+                    print()
+            case 'export' if len(args) == 2:
+                try:
+                    self.__export_metrics(samples, os.path.abspath(args[1]))
+                except OSError as e:
+                    print(self.color_text(f'metrics: {args[1]}: {e.strerror}', 'red'), file=sys.stderr)
+                    return 1
+                print(f'{len(samples)} samples written to {args[1]}')
+            case _:
+                print(self.color_text(self.__HELP_DICT['metrics'], 'red'), file=sys.stderr)
+                return 1
+        return 0
+
+    # terminate all given processes at once, then force-kill whatever is still alive after 3 seconds
+    def __kill_process(self, pids):
+        processes = []
+        for pid in pids:
+            try:
+                process = psutil.Process(pid)
+                process.terminate()  # A request for graceful termination. sends SIGTERM (signal 15)
+                processes.append(process)
+            except psutil.NoSuchProcess:
+                print(self.color_text(f"No process with PID {pid} found.", 'red'), file=sys.stderr)
+            except psutil.AccessDenied:
+                print(self.color_text(f"Access denied to terminate process {pid}.", 'red'), file=sys.stderr)
+        gone, alive = psutil.wait_procs(processes, timeout=3)  # wait up to 3 seconds for them to terminate
+        for process in gone:
+            print(f"Process {process.pid} terminated successfully.")
+        for process in alive:
+            print(self.color_text(f"Process {process.pid} did not terminate in time, trying to kill it forcefully...",'red'), file=sys.stderr)
+            try:
+                process.kill()   #Forceful termination and send SIGKILL (signal 9)
+                print(f"Process {process.pid} killed.")
+            except psutil.NoSuchProcess:
+                pass
+        return 0 if processes else 1
+
+    # kill <pid|name>: a name kills every process with exactly that name (substrings and regexes are pkill's)
+    def __kill_running_process(self, arg):
+        if not arg:
+            print(self.color_text(self.__HELP_DICT['kill'], 'red'), file=sys.stderr)
+            return 1
+        if arg.isdigit():
+            return self.__kill_process([int(arg)])
+        matches = self.__match_processes(re.escape(arg), exact=True)
+        if not matches:
+            print(self.color_text(f"No process named '{arg}' found.", 'red'), file=sys.stderr)
+            return 1
+        return self.__kill_process([process.pid for process in matches])
+
+    # pgrep [-l] [-x] [-u user] <pattern> / pkill [-SIGNAL] [-x] [-u user] <pattern>
+    def __signal_processes(self, command, args):
+        signal_number = None
+        if command == 'pkill' and args and args[0].startswith('-') and args[0][1:] and args[0][1:] not in ('x', 'u', 'l'):
+            name = args[0][1:].upper()
+            try:
+                signal_number = int(name) if name.isdigit() else signal.Signals[name if name.startswith('SIG') else f'SIG{name}']
+            except (KeyError, ValueError):
+                print(self.color_text(f'{command}: unknown signal {args[0]}', 'red'), file=sys.stderr)
+                return 2
+            args = args[1:]
+        try:
+            options, rest = getopt.getopt(args, 'lxu:')
+            options = dict(options)
+            if len(rest) != 1:
+                raise getopt.GetoptError(self.__HELP_DICT[command])
+            matches = self.__match_processes(rest[0], options.get('-u'), '-x' in options)
+        except (getopt.GetoptError, re.error) as e:
+            print(self.color_text(str(e), 'red'), file=sys.stderr)
+            return 2
+
+        if command == 'pgrep':
+            sys.stdout.write(''.join(f"{process.pid} {process.name}\n" if '-l' in options else f'{process.pid}\n'
+                                     for process in matches))
+            return 0 if matches else 1
+        if signal_number is None:
+            return self.__kill_process([process.pid for process in matches]) if matches else 1
+        for process in matches:
+            try:
+                os.kill(process.pid, signal_number)
+            except ProcessLookupError:
+                pass
+            except PermissionError:
+                print(self.color_text(f"Access denied to signal process {process.pid}.", 'red'), file=sys.stderr)
+        return 0 if matches else 1
+
+    # xargs / parallel as a command: arguments come from standard input, -a file or ::: and the
+    # status says whether every job succeeded (xargs: 123 if any failed; parallel: failed jobs)
+    def __parallel_command(self, command, args):
+        try:
+            return self.__write_lines(self.__parallel_lines(command, sys.stdin.buffer, args), None)
+        except getopt.GetoptError as e:
+            print(self.color_text(e.msg, 'red'), file=sys.stderr)
+            return 2
+        except OSError as e:
+            print(self.color_text(f'{command}: {e.filename}: {e.strerror}', 'red'), file=sys.stderr)
+            return 1
+        except ValueError as e:
+            print(self.color_text(str(e), 'red'), file=sys.stderr)  # unbalanced quote in the input
+            return 1
+        except KeyboardInterrupt:
+            print()
+            return 130
+
+    # Build one command per input item (or per -n items) and run them on a pool of worker threads,
+    # each driving one child process, so at most -P/-j jobs run at once. Input is read as jobs run.
+    # A job's stdout is yielded in one piece (stderr written alongside), in input order with -k,
+    # else as jobs finish. External commands start directly; builtins run as "custom_shell.py -c".
+    # The generator returns the status: xargs 123 if any job failed, parallel the failed job count.
+    def __parallel_lines(self, command, lines, args):
+        slots = 'P:' if command == 'xargs' else 'j:'
+        options, template = getopt.getopt(args, slots + 'n:I:a:0k', ['halt=', 'joblog=', 'keep-order'])
+        options = dict(options)
+        arguments = None
+        if ':::' in template:
+            arguments = [os.fsencode(arg) for arg in template[template.index(':::') + 1:]]
+            template = template[:template.index(':::')]
+        jobs = options.get('-P', options.get('-j', '1' if command == 'xargs' else str(PARALLEL_JOBS)))
+        per_job = options.get('-n', '1' if command == 'parallel' or '-I' in options else str(XARGS_MAX_ARGS))
+        if not (jobs.isdigit() and per_job.isdigit() and int(per_job)):
+            raise getopt.GetoptError(self.__HELP_DICT[command])
+        jobs = int(jobs) or PARALLEL_JOBS
+        when, limit = self.__halt_policy(command, options.get('--halt', 'never'))
+        replace = options.get('-I', '{}' if command == 'parallel' else None)
+        template = template or ['echo']
+        state = {'failed': 0, 'halted': False, 'policy': (when, limit), 'lock': threading.Lock(), 'halted_by': None}
+        source = open(options['-a'], 'rb') if '-a' in options else None
+
+        def items():
+            stream = arguments if arguments is not None else source or lines
+            if '-0' in options:
+                yield from (os.fsdecode(item) for item in b''.join(stream).split(b'\0') if item)
+            elif replace is not None:
+                yield from (os.fsdecode(line.rstrip(b'\r\n')) for line in stream if line.strip())
+            else:
+                for line in stream:
+                    try:
+                        yield from shlex.split(os.fsdecode(line))
+                    except ValueError as e:
+                        raise ValueError(f'{command}: {e.args[0].lower()} in input: {os.fsdecode(line).strip()}')
+
+        def commands():
+            batch = []
+            for item in itertools.chain(items(), [None]):
+                if item is not None:
+                    batch.append(item)
+                if batch and (item is None or len(batch) == int(per_job)):
+                    if replace is not None and any(replace in arg for arg in template):
+                        yield [arg.replace(replace, ' '.join(batch)) for arg in template]
+                    else:
+                        yield template + batch
+                    batch = []
+
+        def run():
+            pool = futures.ThreadPoolExecutor(jobs)
+            running = set()  # Popen objects, for --halt now and Ctrl-C
+            active = collections.deque()
+            joblog = open(options['--joblog'], 'w', buffering=1) if '--joblog' in options else None
+            if joblog:
+                joblog.write('Seq\tHost\tStarttime\tJobRuntime\tSend\tReceive\tExitval\tSignal\tCommand\n')
+
+            def finish(future):
+                sequence, argv, started, runtime, code, output, errors = future.result()
+                if code is None:
+                    return b''  # never started: the run was halted
+                if joblog:
+                    joblog.write(f'{sequence}\t:\t{started:.3f}\t{runtime:.3f}\t0\t{len(output)}\t'
+                                 f'{max(code, 0)}\t{max(-code, 0)}\t{shlex.join(argv)}\n')
+                if errors:
+                    sys.stdout.flush()
+                    if hasattr(sys.stderr, 'buffer'):
+                        sys.stderr.buffer.write(errors)
+                    else:
+                        sys.stderr.write(errors.decode(errors='replace'))
+                    sys.stderr.flush()
+                if state['halted_by'] == sequence:
+                    print(self.color_text(f'{command}: halting ({when}) after {limit} failed job(s); last: {shlex.join(argv)}', 'red'),
+                          file=sys.stderr)
+                return output
+
+            def drain(block):
+                if '-k' in options or '--keep-order' in options:
+                    while active and (block or active[0].done()):
+                        yield finish(active.popleft())
+                        block = False
+                elif active:
+                    done, _ = futures.wait(active, return_when=futures.FIRST_COMPLETED if block else futures.ALL_COMPLETED,
+                                           timeout=None if block else 0)
+                    for future in [future for future in active if future in done]:
+                        active.remove(future)
+                        yield finish(future)
+
+            try:
+                for sequence, argv in enumerate(commands(), 1):
+                    if state['halted']:
+                        break
+                    while len(active) >= jobs * 2:
+                        yield from drain(True)
+                    if argv[0] in self.__BUILTINS:
+                        executable = sys.executable
+                        argv = (argv, [sys.executable, os.path.abspath(__file__), '-c', shlex.join(argv)])
+                    else:
+                        executable = self.__resolve_command(argv[0])
+                        argv = (argv, argv)
+                    active.append(pool.submit(self.__parallel_job, sequence, argv, executable, running, state))
+                    yield from drain(False)
+                while active:
+                    yield from drain(True)
+                if command == 'xargs':
+                    return 123 if state['failed'] else 0
+                return min(state['failed'], 101)
+            finally:
+                state['halted'] = state['halted'] or bool(active)
+                for process in list(running):
+                    process.terminate()
+                pool.shutdown(cancel_futures=True)
+                if joblog:
+                    joblog.close()
+                if source:
+                    source.close()
+        return run()
+
+    # "--halt never|now|soon[,fail=N]": soon stops starting jobs after N failures, now also kills
+    # the running ones
+    def __halt_policy(self, command, value):
+        when, _, limit = value.partition(',')
+        if when not in ('never', 'now', 'soon') or (limit and not re.fullmatch(r'fail=[1-9]\d*', limit)):
+            raise getopt.GetoptError(f"{command}: invalid --halt '{value}'")
+        return when, int(limit[5:]) if limit else 1
+
+    # one xargs/parallel job, run on a pool thread. argv is (command as given, command to run).
+    # Returns (sequence, argv, start time, runtime, exit code, stdout, stderr). The exit code is negative for a signal and None if never started.
+    def __parallel_job(self, sequence, argv, executable, running, state):
+        started = time.time()
+        argv, argv_run = argv
+        if state['halted']:
+            return sequence, argv, started, 0.0, None, b'', b''
+        if not executable:
+            self.__parallel_failed(sequence, running, state)
+            return sequence, argv, started, 0.0, 127, b'', f'{argv[0]}: command not found\n'.encode()
+        try:
+            process = subprocess.Popen(argv_run, executable=executable, stdin=subprocess.DEVNULL,
+                                       stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        except OSError as e:
+            self.__parallel_failed(sequence, running, state)
+            return sequence, argv, started, 0.0, 126, b'', f'{argv[0]}: {e.strerror}\n'.encode()
+        running.add(process)
+        try:
+            output, errors = process.communicate()
+        finally:
+            running.discard(process)
+        if process.returncode:
+            self.__parallel_failed(sequence, running, state)
+        return sequence, argv, started, time.time() - started, process.returncode, output, errors
+
+    # count a failed job; the job that reaches the --halt limit stops new jobs from starting and,
+    # for "now", terminates the running ones. Called from the pool threads as jobs end.
+    def __parallel_failed(self, sequence, running, state):
+        when, limit = state['policy']
+        with state['lock']:
+            state['failed'] += 1
+            if when == 'never' or state['failed'] < limit or state['halted']:
+                return
+            state['halted'], state['halted_by'] = True, sequence
+        if when == 'now':
+            for process in list(running):
+                process.terminate()
+
+    # find [path...] [predicates]: a depth-first scandir walk; stat is only called when a
+    # -size/-mtime/-mmin predicate needs it. Yields output lines, so it also feeds pipelines.
+    def __find_lines(self, args):
+        roots = list(itertools.takewhile(lambda arg: not arg.startswith('-'), args)) or ['.']
+        predicates, max_depth, needs_stat = [], None, False
+        rest = args[len(roots) if roots != ['.'] or (args and args[0] == '.') else 0:]
+        if len(rest) % 2:
+            raise getopt.GetoptError(f"find: missing argument to '{rest[-1]}'")
+        for option, value in zip(rest[::2], rest[1::2]):
+            if option in ('-name', '-iname'):
+                pattern = re.compile(fnmatch.translate(value), re.IGNORECASE if option == '-iname' else 0).match
+                predicates.append(lambda entry, info, pattern=pattern: pattern(entry.name))
+            elif option == '-type' and value in ('f', 'd', 'l'):
+                kind = {'f': lambda entry: entry.is_file(follow_symlinks=False),
+                        'd': lambda entry: entry.is_dir(follow_symlinks=False),
+                        'l': lambda entry: entry.is_symlink()}[value]
+                predicates.append(lambda entry, info, kind=kind: kind(entry))
+            elif option == '-size':
+                units = {'c': 1, 'k': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+                unit = units.get(value[-1], 512)
+                number = value.rstrip('ckMG')
+                predicates.append(self.__compare_predicate(number, lambda info, unit=unit: -(-info.st_size // unit)))
+                needs_stat = True
+            elif option in ('-mtime', '-mmin'):
+                unit = 86400 if option == '-mtime' else 60
+                now = time.time()
+                predicates.append(self.__compare_predicate(value, lambda info, unit=unit: int((now - info.st_mtime) // unit)))
+                needs_stat = True
+            elif option == '-maxdepth' and value.isdigit():
+                max_depth = int(value)
+            else:
+                raise getopt.GetoptError(f"find: unknown predicate or bad value '{option} {value}'")
+
+        def matches(entry):
+            try:
+                info = entry.stat(follow_symlinks=False) if needs_stat else None
+                return all(predicate(entry, info) for predicate in predicates)
+            except OSError:
+                return False
+
+        def walk():
+            status = 0
+            for root in roots:
+                if not os.path.lexists(root):
+                    print(self.color_text(f"find: '{root}': No such file or directory", 'red'), file=sys.stderr)
+                    status = 1
+                    continue
+                if matches(RootEntry(os.path.basename(root.rstrip('/')) or root, root)):
+                    yield os.fsencode(root) + b'\n'
+                stack = [(root, 1)] if os.path.isdir(root) and max_depth != 0 else []
+                while stack:
+                    directory, depth = stack.pop()
+                    try:
+                        with os.scandir(directory) as listing:
+                            entries = sorted(listing, key=lambda entry: entry.name, reverse=True)
+                    except OSError as e:
+                        print(self.color_text(f"find: '{directory}': {e.strerror}", 'red'), file=sys.stderr)
+                        status = 1
+                        continue
+                    for entry in reversed(entries):
+                        if matches(entry):
+                            yield os.fsencode(entry.path) + b'\n'
+                    if max_depth is None or depth < max_depth:
+                        stack.extend((entry.path, depth + 1) for entry in entries if entry.is_dir(follow_symlinks=False))
+            return status
+        return walk()
+
+    # "+N" (more than N), "-N" (less than N) or "N" (exactly N) against measure(stat result)
+    def __compare_predicate(self, value, measure):
+        sign, number = (value[0], value[1:]) if value[:1] in ('+', '-') else ('', value)
+        if not number.isdigit():
+            raise getopt.GetoptError(f"find: invalid number '{value}'")
+        number = int(number)
+        compare = {'+': int.__gt__, '-': int.__lt__, '': int.__eq__}[sign]
+        return lambda entry, info: compare(measure(info), number)
+
+    # grep as a command: files or directory trees (-r) are scanned by grep_file, in a process pool
+    # once there is enough data; without files it filters standard input like the pipeline stage.
+    def __grep_lines(self, args):
+        options, rest = getopt.gnu_getopt(args, 'rRivnclhFE', ['include=', 'exclude-dir=', 'index'])
+        flags = {flag for flag, _ in options}
+        if not rest:
+            raise getopt.GetoptError(self.__HELP_DICT['grep'])
+        recursive = '-r' in flags or '-R' in flags
+        if not recursive and len(rest) == 1:
+            return self.__stage_grep(sys.stdin.buffer, [flag for flag in flags if flag in ('-i', '-v', '-c', '-n', '-F', '-E')] + rest)
+
+        pattern = rest[0].encode()
+        literal = pattern if '-F' in flags else required_literal(pattern)
+        spec = GrepSpec(re.escape(pattern) if '-F' in flags else pattern, literal,
+                        '-F' in flags or literal == pattern, '-i' in flags, '-v' in flags, '-n' in flags,
+                        'files' if '-l' in flags else 'count' if '-c' in flags else 'lines')
+        try:
+            re.compile(spec.pattern, re.IGNORECASE if spec.ignore_case else 0)  # fail here, not in a worker
+        except re.error as e:
+            raise getopt.GetoptError(f'grep: invalid regex {rest[0]!r}: {e}')
+        includes = [value for flag, value in options if flag == '--include']
+        excluded = {value for flag, value in options if flag == '--exclude-dir'}
+        files = []  # (path, size, mtime_ns)
+        for root in rest[1:] or ['.']:
+            if os.path.isdir(root) and recursive:
+                self.__grep_walk(root, files, includes, excluded)
+            elif os.path.isdir(root):
+                print(self.color_text(f'grep: {root}: Is a directory', 'red'), file=sys.stderr)
+            else:
+                try:
+                    info = os.stat(root)
+                    files.append((root, info.st_size, info.st_mtime_ns))
+                except OSError as e:
+                    print(self.color_text(f'grep: {root}: {e.strerror}', 'red'), file=sys.stderr)
+        # -v and -c report files without the literal too, so the index cannot narrow them
+        if ('--index' in flags and recursive and len(rest) == 2 and os.path.isdir(rest[1])
+                and not spec.invert and spec.mode != 'count'):
+            files = self.__index_candidates(rest[1], files, spec)
+        show_names = (recursive or len(files) > 1) and '-h' not in flags
+        strip = 2 if not rest[1:] else 0  # "./" of the default root
+        batch = [(path, os.fsencode(path[strip:]) if show_names or spec.mode == 'files' else b'') for path, _, _ in files]
+        return self.__grep_status(self.__grep_run(batch, sum(size for _, size, _ in files), spec), spec)
+
+    # pass grep's output through and return its status: 0 if anything matched, else 1
+    def __grep_status(self, lines, spec):
+        matched = False
+        for line in lines:
+            matched = matched or spec.mode != 'count' or line.rstrip(b'\n').rpartition(b':')[2] != b'0'
+            yield line
+        return 0 if matched else 1
+
+    # collect (path, size, mtime_ns) of the regular files below root, without following symlinks
+    def __grep_walk(self, root, files, includes, excluded):
+        stack = [root]
+        while stack:
+            try:
+                with os.scandir(stack.pop()) as listing:
+                    entries = sorted(listing, key=lambda entry: entry.name)
+            except OSError as e:
+                print(self.color_text(f'grep: {e.filename}: {e.strerror}', 'red'), file=sys.stderr)
+                continue
+            for entry in reversed(entries):
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name not in excluded:
+                        stack.append(entry.path)
+            for entry in entries:
+                if entry.is_file(follow_symlinks=False) and (not includes or any(fnmatch.fnmatch(entry.name, glob) for glob in includes)):
+                    try:
+                        info = entry.stat(follow_symlinks=False)
+                    except OSError:
+                        continue
+                    files.append((entry.path, info.st_size, info.st_mtime_ns))
+
+    # scan the files in order: in the shell for small jobs, else batches over a fork process pool
+    def __grep_run(self, batch, total, spec):
+        if total < GREP_PARALLEL_BYTES or GREP_WORKERS < 2:
+            return (line for path, label in batch for line in grep_file(path, spec, label))
+        return self.__pool_map(grep_batch, self.__grep_batches(batch, spec), spec)
+
+    def __grep_batches(self, batch, spec):
+        current, size = [], 0
+        for path, label in batch:
+            current.append((path, label))
+            try:
+                size += os.path.getsize(path)
+            except OSError:
+                pass
+            if size >= GREP_BATCH_BYTES or len(current) >= GREP_BATCH_FILES:
+                yield current
+                current, size = [], 0
+        if current:
+            yield current
+
+    # run function(batch, *extra) for every batch on GREP_WORKERS forked processes, yielding the
+    # results in order. Workers ignore Ctrl-C; the shell cancels what is left instead.
+    def __pool_map(self, function, batches, *extra):
+        pool = futures.ProcessPoolExecutor(GREP_WORKERS, mp_context=multiprocessing.get_context('fork'),
+                                           initializer=signal.signal, initargs=(signal.SIGINT, signal.SIG_IGN))
+
+        def results():
+            try:
+                pending = collections.deque()
+                for batch in batches:
+                    pending.append(pool.submit(function, batch, *extra))
+                    while len(pending) > GREP_WORKERS * 2:
+                        yield from pending.popleft().result()
+                while pending:
+                    yield from pending.popleft().result()
+            finally:
+                pool.shutdown(cancel_futures=True)
+        return results()
+
+    # Narrow files to those that can contain the pattern's literal, using the trigram index of root.
+    # The index is brought up to date first: files whose mtime or size changed are re-indexed.
+    def __index_candidates(self, root, files, spec):
+        index = self.__update_index(os.path.abspath(root), files)
+        needle = spec.literal.lower()
+        if len(needle) < 3:
+            return files  # nothing to look up; every file is a candidate
+        keys = {int.from_bytes(needle[start:start + 3], sys.byteorder) for start in range(len(needle) - 2)}
+        postings = sorted((index['postings'].get(key, ()) for key in keys), key=len)
+        candidates = set(postings[0]).intersection(*postings[1:]) - index['dead']
+        candidates |= index['unindexed']
+        base = os.path.abspath(root)
+        return [entry for entry in files
+                if index['files'].get(os.path.relpath(os.path.abspath(entry[0]), base), (None,))[0] in candidates]
+
+    # Load (once per shell) and refresh the index of a tree. The index file keeps, per relative path,
+    # [file id, mtime_ns, size], and per trigram an array of file ids. A changed file gets a new id
+    # and its old one is marked dead; dead ids are dropped from the postings once they pile up.
+    def __update_index(self, root, files):
+        path = os.path.join(INDEX_DIR, hashlib.sha1(os.fsencode(root)).hexdigest() + '.index')
+        index = self.__grep_indexes.get(root)
+        if index is None:
+            try:
+                with open(path, 'rb') as f:
+                    index = pickle.load(f)
+            except (OSError, EOFError, pickle.UnpicklingError):
+                index = {'files': {}, 'postings': {}, 'dead': set(), 'unindexed': set(), 'next': 0}
+            self.__grep_indexes[root] = index
+
+        known, seen, changed = index['files'], set(), []
+        for file_path, size, mtime in files:
+            relative = os.path.relpath(os.path.abspath(file_path), root)
+            seen.add(relative)
+            entry = known.get(relative)
+            if entry is None or entry[1] != mtime or entry[2] != size:
+                if entry is not None:
+                    index['dead'].add(entry[0])
+                    index['unindexed'].discard(entry[0])
+                changed.append((relative, file_path, size, mtime))
+        for relative in set(known) - seen:
+            file_id = known.pop(relative)[0]
+            index['dead'].add(file_id)
+            index['unindexed'].discard(file_id)
+        if not changed and len(seen) == len(known):
+            return index
+
+        paths = [file_path for _, file_path, _, _ in changed]
+        if sum(size for _, _, size, _ in changed) < GREP_PARALLEL_BYTES or GREP_WORKERS < 2:
+            trigrams = [file_trigrams(file_path) for file_path in paths]
+        else:
+            batches = (paths[start:start + GREP_BATCH_FILES] for start in range(0, len(paths), GREP_BATCH_FILES))
+            trigrams = list(self.__pool_map(trigram_batch, batches))
+        postings = index['postings']
+        for (relative, _, size, mtime), keys in zip(changed, trigrams):
+            file_id = index['next']
+            index['next'] += 1
+            known[relative] = [file_id, mtime, size]
+            if keys is None:
+                index['unindexed'].add(file_id)
+                continue
+            for key in keys:
+                posting = postings.get(key)
+                if posting is None:
+                    postings[key] = array.array('I', (file_id,))
+                else:
+                    posting.append(file_id)
+        if len(index['dead']) > INDEX_COMPACT_RATIO * max(index['next'], 1):
+            dead = index['dead']
+            for key in list(postings):
+                kept = array.array('I', (file_id for file_id in postings[key] if file_id not in dead))
+                if kept:
+                    postings[key] = kept
+                else:
+                    del postings[key]
+            dead.clear()
+        try:
+            os.makedirs(INDEX_DIR, exist_ok=True)
+            with open(path + '.tmp', 'wb') as f:
+                pickle.dump(index, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(path + '.tmp', path)
+        except OSError as e:
+            print(self.color_text(f'grep: cannot save index: {e.strerror}', 'red'), file=sys.stderr)
+        return index
+
+    # run a find/grep line source as a command; grep's status is 1 when nothing matched
+    def __search_command(self, command, args):
+        try:
+            lines = self.__find_lines(args) if command == 'find' else self.__grep_lines(args)
+        except getopt.GetoptError as e:
+            print(self.color_text(e.msg, 'red'), file=sys.stderr)
+            return 2
+        try:
+            return self.__write_lines(lines, None)
+        except KeyboardInterrupt:
+            print()
+            return 130
+
+    # ls: on a terminal each directory is laid out in columns and written at once; otherwise
+    # (pipes, files, -1, -l) the lines stream out directory by directory
+    def __ls_command(self, args):
+        try:
+            flags, _ = self.__ls_options(args)
+            columns = None
+            if sys.stdout.isatty() and not flags & {'-l', '-1'}:
+                columns = shutil.get_terminal_size((80, 24)).columns
+            return self.__write_lines(self.__list_lines(args, columns), None)
+        except getopt.GetoptError as e:
+            print(self.color_text(e.msg, 'red'), file=sys.stderr)
+            return 2
+        except KeyboardInterrupt:
+            print()
+            return 130
+
+    def __ls_options(self, args):
+        options, paths = getopt.gnu_getopt(args, 'laStRh1')
+        return {flag for flag, _ in options}, paths or ['.']
+
+    # ls output as lines (one per entry) or, given a terminal width, one column block per directory.
+    # Also the ls pipeline source. File operands come first, then each directory under a header.
+    def __list_lines(self, args, columns=None):
+        flags, paths = self.__ls_options(args)
+
+        def run():
+            status = 0
+            files, directories = [], []
+            for path in paths:
+                try:
+                    info = os.lstat(path)
+                except OSError as e:
+                    print(self.color_text(f"ls: cannot access '{path}': {e.strerror}", 'red'), file=sys.stderr)
+                    status = 2
+                    continue
+                if stat.S_ISDIR(info.st_mode) or (stat.S_ISLNK(info.st_mode) and os.path.isdir(path) and '-l' not in flags):
+                    directories.append(path)
+                else:
+                    files.append((path, path, False, info))
+            if files:
+                yield from self.__ls_format(self.__ls_sort(files, flags), flags, columns, total=False)
+            headers = '-R' in flags or len(paths) > 1
+            stack = list(reversed(directories))
+            first = not files
+            while stack:
+                path = stack.pop()
+                try:
+                    entries = self.__ls_scan(path, flags)
+                except OSError as e:
+                    print(self.color_text(f"ls: cannot open directory '{path}': {e.strerror}", 'red'), file=sys.stderr)
+                    status = 2
+                    continue
+                if headers:
+                    yield os.fsencode(('' if first else '\n') + path + ':\n')
+                first = False
+                yield from self.__ls_format(entries, flags, columns)
+                if '-R' in flags:
+                    stack.extend(reversed([entry_path for name, entry_path, is_dir, _ in entries
+                                           if is_dir and name not in ('.', '..')]))
+            return status
+        return run()
+
+    # sorted (name, path, is_dir, lstat or None) for a directory. is_dir comes from the dirent type;
+    # lstat is only fetched for -l, -S and -t, on a thread pool for large directories.
+    def __ls_scan(self, path, flags):
+        with os.scandir(path) as listing:
+            entries = [entry for entry in listing if '-a' in flags or not entry.name.startswith('.')]
+        needs_stat = bool(flags & {'-l', '-S', '-t'})
+        infos = self.__ls_stats(entries) if needs_stat else itertools.repeat(None)
+        rows = [(entry.name, entry.path, self.__is_directory(entry), info) for entry, info in zip(entries, infos)]
+        if '-a' in flags:
+            for name in ('.', '..'):
+                rows.append((name, os.path.join(path, name), True, os.lstat(os.path.join(path, name)) if needs_stat else None))
+        return self.__ls_sort(rows, flags)
+
+    @staticmethod
+    def __is_directory(entry):
+        try:
+            return entry.is_dir(follow_symlinks=False)
+        except OSError:
+            return False
+
+    def __ls_stats(self, entries):
+        def lstat(entry):
+            try:
+                return entry.stat(follow_symlinks=False)
+            except OSError:
+                return None
+        if len(entries) < LS_PARALLEL_STAT:
+            return [lstat(entry) for entry in entries]
+        size = -(-len(entries) // LS_STAT_WORKERS)
+        chunks = [entries[start:start + size] for start in range(0, len(entries), size)]
+        with futures.ThreadPoolExecutor(LS_STAT_WORKERS) as pool:
+            return [info for chunk in pool.map(lambda chunk: [lstat(entry) for entry in chunk], chunks) for info in chunk]
+
+    def __ls_sort(self, rows, flags):
+        rows.sort(key=lambda row: row[0])
+        if '-S' in flags:
+            rows.sort(key=lambda row: row[3].st_size if row[3] else 0, reverse=True)
+        elif '-t' in flags:
+            rows.sort(key=lambda row: row[3].st_mtime_ns if row[3] else 0, reverse=True)
+        return rows
+
+    # one directory's rows as output lines (pipeline stages filter line by line): long format or one
+    # name per line, or else a single block of terminal columns
+    def __ls_format(self, rows, flags, columns, total=True):
+        if '-l' in flags:
+            yield from self.__ls_long(rows, '-h' in flags, total)
+        elif columns:
+            if rows:
+                yield self.__ls_columns(rows, columns).encode(errors='surrogateescape')
+        else:
+            yield from [name.encode(errors='surrogateescape') + b'\n' for name, _, _, _ in rows]
+
+    # GNU-style vertical columns: the most columns whose widths fit the terminal, one string
+    def __ls_columns(self, rows, columns):
+        names = [name for name, _, _, _ in rows]
+        widths = [len(name) for name in names]
+        count = len(names)
+        layout = (count, [max(widths)])
+        for cols in range(min(count, columns // (min(widths) + LS_COLUMN_GAP) or 1), 1, -1):
+            height = -(-count // cols)
+            if -(-count // height) < cols:
+                continue  # the same height with fewer columns fills the layout
+            col_widths = [max(widths[start:start + height]) + LS_COLUMN_GAP for start in range(0, count, height)]
+            if sum(col_widths) - LS_COLUMN_GAP <= columns:
+                layout = (height, col_widths)
+                break
+        height, col_widths = layout
+        colored = [self.color_text(name, 'purple') if is_dir else name for name, _, is_dir, _ in rows]
+        lines = []
+        for row in range(height):
+            cells = range(row, count, height)
+            line = [colored[index] + ' ' * (col_widths[index // height] - widths[index]) for index in cells]
+            lines.append(''.join(line).rstrip() + '\n')
+        return ''.join(lines)
+
+    # ls -l rows, every column padded to its widest value in the directory. Mode strings and dates
+    # are formatted once per distinct st_mode / mtime second, which most entries share.
+    def __ls_long(self, rows, human, total):
+        table, blocks, modes, stamps = [], 0, {}, {}
+        six_months_ago = time.time() - 182 * 86400
+        for name, path, is_dir, info in rows:
+            if info is None:
+                table.append(('?' * 10, '?', '?', '?', '?', ' ' * 12, name))
+                continue
+            blocks += getattr(info, 'st_blocks', 0)
+            mode = modes.get(info.st_mode)
+            if mode is None:
+                mode = modes[info.st_mode] = stat.filemode(info.st_mode)
+            second = int(info.st_mtime)
+            stamp = stamps.get(second)
+            if stamp is None:
+                when = time.localtime(second)
+                recent = time.strftime('%H:%M' if second > six_months_ago else ' %Y', when)
+                stamp = stamps[second] = f"{time.strftime('%b', when)} {when.tm_mday:>2} {recent:>5}"
+            if mode[0] == 'l':
+                try:
+                    name = f'{name} -> {os.readlink(path)}'
+                except OSError:
+                    pass
+            elif is_dir:
+                name = self.color_text(name, 'purple')
+            size = self.__human_size(info.st_size) if human else str(info.st_size)
+            table.append((mode, str(info.st_nlink), self.__user_name(info.st_uid),
+                          self.__group_name(info.st_gid), size, stamp, name))
+        if total:
+            yield f'total {self.__human_size(blocks * 512) if human else blocks // 2}\n'.encode()
+        if not table:
+            return
+        _, links, users, groups, sizes, _, _ = (max(map(len, column)) for column in zip(*table))
+        yield from [f'{mode} {link:>{links}} {user:<{users}} {group:<{groups}} {size:>{sizes}} {stamp} {name}\n'.encode(errors='surrogateescape')
+                    for mode, link, user, group, size, stamp, name in table]
+
+    # cat as a pipeline source: stream the lines of each file, or pass the input through
+    def __cat_lines(self, lines, args):
+        status = 0
+        if not args:
+            yield from lines
+        for arg in args:
+            try:
+                with open(arg, 'rb') as f:
+                    yield from f
+            except OSError as e:
+                print(self.color_text(f'cat: {arg}: {e.strerror}', 'red'), file=sys.stderr)
+                status = 1
+        return status
+
+    def __display_echo(self, arg, parts):
+        if arg:
+            print(bytes(' '.join(parts[1:]), "utf-8").decode("unicode_escape")) # to handle escape sequences
+        else:
+            print(self.color_text("Please provide text to echo.", 'red'), file=sys.stderr)
+            print(self.color_text(self.__HELP_DICT['echo'], 'red'), file=sys.stderr)
+
+    def __default_condition(self, command, parts, table=None):
+        # fallback: spawn a subprocess to run the command
+        with self.__phase('resolve', parts[0]):
+            executable = self.__resolve_command(parts[0])
+        if not executable:
+            print(self.color_text(f'IIUI-Shell: {parts[0]}: command not found.', 'red'), file=sys.stderr)
+            print(self.color_text("Type 'help' to check valid commands.", 'purple'), file=sys.stderr)
+            return 127
+        try:
+            sys.stdout.flush()
+            with self.__phase('fork'):
+                pid = self.__fork() # create a new process
+                if pid == 0:
+                    # Child process: own process group, default signal handling
+                    try:
+                        os.setpgid(0, 0)
+                        self.__reset_job_signals()
+                        if table:
+                            self.__apply_redirects(table)
+                        os.execv(executable, parts) #replace the current process with a new one
+                    except OSError as e:
+                        print(f'IIUI-Shell: {parts[0]}: {e.strerror}', file=sys.stderr)
+                        os._exit(126)
+                try:
+                    os.setpgid(pid, pid)
+                except OSError:
+                    pass  # the child already did it, or already exec'ed
+            # Parent process waits for this child only (os.wait() could reap a background job)
+            with self.__phase('wait'):
+                status, usage = self.__wait_foreground(pid, pid)
+            if status is not None and os.WIFSTOPPED(status):
+                # Ctrl-Z: keep it as a stopped job that fg/bg can resume
+                job = self.__add_job(pid, command, None)
+                job['state'] = 'Stopped'
+                print(f"\n[{job['id']}]+  Stopped                 {command}")
+                return 128 + signal.SIGTSTP
+            return os.waitstatus_to_exitcode(status) if status is not None else 0
+
+        except AttributeError:
+            # If os.fork() is not available on the OS (e.g., Windows), fallback to subprocess
+            try:
+                result = subprocess.run(command, shell=True, capture_output=True, text=True)
+                status = result.returncode
+                if result.stdout: # if normal output
+                    print(result.stdout)
+                if result.stderr: # if error
+                    print(self.color_text(f'IIUI-Shell: {command}: command not found.', 'red'), file=sys.stderr)
+                    print(self.color_text("Type 'help' to check valid commands.", 'purple'), file=sys.stderr)
+                    print(self.color_text(result.stderr, 'purple'), file=sys.stderr)
+
+            except Exception as e:
+                print(self.color_text(f"Error executing command: {e}", 'red'), file=sys.stderr)
+                print(f'IIUI-Shell: {command}: command not found.', file=sys.stderr)
+                print("Type 'help' to check valid commands.", file=sys.stderr)
+
+        except Exception as e:
+            print(self.color_text(f"Error executing command: {e}", 'red'), file=sys.stderr)
+            print(f'IIUI-Shell: {command}: command not found.', file=sys.stderr)
+            print("Type 'help' to check valid commands.")
+
+    # mtime of every PATH directory, used to notice newly installed or removed commands
+    def __path_mtimes(self, path):
+        mtimes = {}
+        for directory in path.split(os.pathsep):
+            try:
+                mtimes[directory] = os.stat(directory or '.').st_mtime_ns
+            except OSError:
+                mtimes[directory] = None
+        return mtimes
+
+    # drop the hash table when PATH changed, and at most once per HASH_RECHECK_INTERVAL when a
+    # PATH directory changed, so a lookup normally costs one dict access and no syscalls
+    def __validate_hash(self):
+        state = self.__hash_state
+        path = os.environ.get('PATH', os.defpath)
+        now = time.monotonic()
+        if path != state['path']:
+            self.__command_hash.clear()
+            state.update(path=path, mtimes=self.__path_mtimes(path), checked=now)
+        elif now - state['checked'] >= HASH_RECHECK_INTERVAL:
+            mtimes = self.__path_mtimes(path)
+            if mtimes != state['mtimes']:
+                self.__command_hash.clear()
+                state['mtimes'] = mtimes
+            state['checked'] = now
+
+    # resolve a command name to an absolute path through the hash table, walking PATH only on a miss
+    def __resolve_command(self, name):
+        if os.sep in name or (os.altsep and os.altsep in name):
+            return name
+        self.__validate_hash()
+        entry = self.__command_hash.get(name)
+        if entry:
+            entry[1] += 1
+            return entry[0]
+        found = shutil.which(name, path=self.__hash_state['path'])
+        if found and os.path.isabs(found):  # results from relative PATH entries depend on the cwd
+            self.__command_hash[name] = [found, 1]
+        return found
+
+    def __hash_command(self, args):
+        if args and args[0] == '-r':
+            self.__command_hash.clear()
+            return 0
+        if args:
+            status = 0
+            for name in args:
+                if name in self.__command_hash:
+                    del self.__command_hash[name]  # "hash <name>" re-resolves, like bash
+                if not self.__resolve_command(name):
+                    print(self.color_text(f'hash: {name}: not found', 'red'), file=sys.stderr)
+                    status = 1
+                elif name in self.__command_hash:
+                    self.__command_hash[name][1] = 0
+            return status
+        self.__validate_hash()
+        if not self.__command_hash:
+            print('hash: hash table empty')
+            return 0
+        print(f"{'hits':>4}    command")
+        for name, (location, hits) in sorted(self.__command_hash.items()):
+            print(f'{hits:>4}    {location}')
+        return 0
+
+    def __display_help(self):
+        print(self.color_text('Available Commands:', 'crimson'))
+        for cmd, desc in self.__HELP_DICT.items():
+            current_cmd = f'{cmd:<10}'
+            print(f"- {self.color_text((current_cmd),'yellow')} : {self.color_text(desc, 'purple')}")
+
+    # expand shell wildcards; a pattern that matches nothing is kept as typed, like sh, and a
+    # quoted word is never a pattern
+    def __expand_globs(self, args):
+        expanded = []
+        for arg in args:
+            matches = sorted(glob.glob(arg)) if not isinstance(arg, QuotedWord) and any(char in arg for char in '*?[') else None
+            expanded.extend(matches or [arg])
+        return expanded
+
+    # one message for a single operand (as before), a count for many
+    def __report_bulk(self, done, single, plural):
+        if len(done) == 1:
+            print(single.format(done[0]))
+        elif done:
+            print(plural.format(len(done)))
+
+    def __create_file(self, args):
+        paths = self.__expand_globs(args)
+        if not paths:
+            print(self.color_text(self.__HELP_DICT['touch'], 'red'), file=sys.stderr)
+            return 1
+        status, created = 0, []
+        for arg in paths:
+            try:
+                try:
+                    os.close(os.open(arg, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666))
+                    created.append(arg)
+                except FileExistsError:
+                    os.utime(arg)  # an existing file only gets new timestamps
+            except OSError as e:
+                print(self.color_text(f'touch: {arg}: {e.strerror}', 'red'), file=sys.stderr)
+                status = 1
+        self.__report_bulk(created, 'File {} created successfully.', '{} files created.')
+        return status
+
+    # Remove a directory tree in parallel. Each directory is scanned once through an fd: files are
+    # unlinked relative to it (unlinkat, no path lookup per file) and subdirectories go to the pool.
+    # A directory is rmdir'ed when its last subdirectory finishes. Returns (files, directories, errors).
+    def __remove_tree(self, root):
+        lock = threading.Lock()
+        finished = threading.Event()
+        pending = {root: [1, None]}  # directory -> [scans and subdirectories still running, parent]
+        counts = [0, 0]
+        errors = []
+
+        def finish(path):
+            while True:
+                try:
+                    os.rmdir(path)
+                except OSError as e:
+                    errors.append(e)
+                with lock:
+                    counts[1] += 1
+                    parent = pending.pop(path)[1]
+                    if parent is None:
+                        finished.set()
+                        return
+                    pending[parent][0] -= 1
+                    if pending[parent][0]:
+                        return
+                path = parent
+
+        def scan(path):
+            subdirectories, removed = [], 0
+            try:
+                fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY | os.O_NOFOLLOW)
+                try:
+                    with os.scandir(fd) as listing:
+                        entries = [(entry.name, entry.is_dir(follow_symlinks=False)) for entry in listing]
+                    for name, is_dir in entries:
+                        if is_dir:
+                            subdirectories.append(os.path.join(path, name))
+                            continue
+                        try:
+                            os.unlink(name, dir_fd=fd)
+                            removed += 1
+                        except OSError as e:
+                            errors.append(e)
+                finally:
+                    os.close(fd)
+            except OSError as e:
+                errors.append(e)
+            with lock:
+                counts[0] += removed
+                pending[path][0] += len(subdirectories) - 1
+                for child in subdirectories:
+                    pending[child] = [1, path]
+                remaining = pending[path][0]
+            for child in subdirectories:
+                pool.submit(scan, child)
+            if not remaining:
+                finish(path)
+
+        pool = futures.ThreadPoolExecutor(REMOVE_WORKERS)
+        try:
+            pool.submit(scan, root)
+            finished.wait()
+        finally:
+            pool.shutdown(cancel_futures=True)
+        return counts[0], counts[1], errors
+
+    # files and directories below (and including) a directory, for dry runs
+    def __count_tree(self, root):
+        files, directories, stack = 0, 1, [root]
+        while stack:
+            try:
+                with os.scandir(stack.pop()) as listing:
+                    for entry in listing:
+                        if entry.is_dir(follow_symlinks=False):
+                            directories += 1
+                            stack.append(entry.path)
+                        else:
+                            files += 1
+            except OSError:
+                pass
+        return files, directories
+
+    # rm and rmdir. rm needs -r for directories; rmdir always removes a directory with its contents.
+    def __remove_paths(self, command, args):
+        try:
+            options, operands = getopt.gnu_getopt(args, 'rRfivn', ['recursive', 'force', 'interactive', 'verbose', 'dry-run'])
+        except getopt.GetoptError as e:
+            print(self.color_text(f'{command}: {e.msg}', 'red'), file=sys.stderr)
+            print(self.color_text(self.__HELP_DICT[command], 'red'), file=sys.stderr)
+            return 1
+        flags = {option.lstrip('-')[0].lower() for option, _ in options}
+        recursive = command == 'rmdir' or 'r' in flags
+        force, interactive, dry_run = 'f' in flags, 'i' in flags and 'f' not in flags, 'n' in flags or 'd' in flags
+        paths = self.__expand_globs(operands)
+        if not paths:
+            print(self.color_text(self.__HELP_DICT[command], 'red'), file=sys.stderr)
+            return 1
+        if interactive:
+            try:
+                os.close(os.open('/dev/tty', os.O_RDWR))
+            except OSError:
+                print(self.color_text(f'{command}: -i needs a terminal to ask on', 'red'), file=sys.stderr)
+                return 1
+
+        status, removed, removed_dirs = 0, [], 0
+        for arg in paths:
+            path = os.path.abspath(arg)
+            is_dir = os.path.isdir(path) and not os.path.islink(path)
+            if not os.path.lexists(path):
+                if not force:
+                    print(self.color_text(f"{'Directory' if command == 'rmdir' else 'File'} {arg} does not exist.", 'red'), file=sys.stderr)
+                    status = 1
+                continue
+            refusal = self.__removal_refusal(arg, path) if is_dir else None
+            if refusal:
+                print(self.color_text(f'{command}: {refusal}', 'red'), file=sys.stderr)
+                status = 1
+                continue
+            if is_dir and not recursive:
+                print(self.color_text(f"rm: cannot remove '{arg}': Is a directory (use rm -r)", 'red'), file=sys.stderr)
+                status = 1
+                continue
+            if command == 'rmdir' and not is_dir:
+                print(self.color_text(f"rmdir: failed to remove '{arg}': Not a directory", 'red'), file=sys.stderr)
+                status = 1
+                continue
+            if interactive and not self.__confirm(f"{command}: remove {'directory' if is_dir else 'file'} '{arg}'? "):
+                continue
+            if dry_run:
+                if is_dir:
+                    files, directories = self.__count_tree(path)
+                    print(f'would remove {arg} ({files} files, {directories} directories)')
+                else:
+                    print(f'would remove {arg}')
+                continue
+            if not is_dir:
+                try:
+                    os.unlink(path)
+                    removed.append(arg)
+                except OSError as e:
+                    print(self.color_text(f'{command}: {arg}: {e.strerror}', 'red'), file=sys.stderr)
+                    status = 1
+                continue
+            files, directories, errors = self.__remove_tree(path)
+            if 'v' in flags:
+                print(f'{arg}: {files} files, {directories} directories removed')
+            if errors:
+                for e in errors[:5]:
+                    print(self.color_text(f'{command}: {e.filename}: {e.strerror}', 'red'), file=sys.stderr)
+                if len(errors) > 5:
+                    print(self.color_text(f'{command}: ... {len(errors) - 5} more errors', 'red'), file=sys.stderr)
+                status = 1
+            else:
+                removed.append(arg)
+                removed_dirs += 1
+        self.__report_bulk(removed, f"{'Directory' if removed_dirs else 'File'} {{}} removed successfully.", '{} paths removed.')
+        return status
+
+    # why a directory operand must never be removed (None if it may): ".", "..", "/" and any directory
+    # holding the current one, like GNU rm's --preserve-root and its "." / ".." rule
+    def __removal_refusal(self, arg, path):
+        if os.path.basename(arg.rstrip(os.sep)) in ('.', '..'):
+            return f"refusing to remove '.' or '..' directory: skipping '{arg}'"
+        real = os.path.realpath(path)
+        if real == os.path.realpath(os.sep):
+            return "it is dangerous to operate recursively on '/'"
+        cwd = os.path.realpath(os.getcwd())
+        if cwd == real or cwd.startswith(real.rstrip(os.sep) + os.sep):
+            return f"refusing to remove '{arg}': it contains the current directory"
+        return None
+
+    # ask on the terminal itself: stdin may be the rest of a script or a pipe
+    @staticmethod
+    def __confirm(prompt):
+        with open('/dev/tty', 'r+') as tty:
+            tty.write(prompt)
+            tty.flush()
+            return tty.readline().strip().lower().startswith('y')
+
+    def __create_directory(self, args):
+        try:
+            options, operands = getopt.gnu_getopt(args, 'pv', ['parents', 'verbose'])
+        except getopt.GetoptError as e:
+            print(self.color_text(f'mkdir: {e.msg}', 'red'), file=sys.stderr)
+            return 1
+        parents = any(option in ('-p', '--parents') for option, _ in options)
+        if not operands:
+            print(self.color_text(self.__HELP_DICT['mkdir'], 'red'), file=sys.stderr)
+            return 1
+        status, created = 0, []
+        for arg in operands:
+            try:
+                if parents:
+                    os.makedirs(arg, exist_ok=True)
+                else:
+                    os.mkdir(arg)
+                created.append(arg)
+            except FileExistsError:
+                print(self.color_text(f'Directory {arg} already exists.', 'red'), file=sys.stderr)
+                status = 1
+            except OSError as e:
+                print(self.color_text(f'mkdir: {arg}: {e.strerror}', 'red'), file=sys.stderr)
+                status = 1
+        self.__report_bulk(created, 'Directory {} created successfully.', '{} directories created.')
+        return status
+
+    # Job control needs the shell to survive Ctrl-Z and to hand the terminal to jobs, so it ignores
+    # the job-control signals and reaps background children from a SIGCHLD handler.
+    def __init_job_control(self):
+        if os.name != 'posix':
+            return
+        signal.signal(signal.SIGCHLD, lambda signum, frame: self.__reap_jobs())
+        if sys.stdin.isatty():
+            for sig in (signal.SIGTSTP, signal.SIGTTOU, signal.SIGTTIN):
+                signal.signal(sig, signal.SIG_IGN)
+
+    # run in a child before exec: undo the shell's ignored job-control signals
+    def __reset_job_signals(self):
+        if os.name == 'posix':
+            for sig in (signal.SIGTSTP, signal.SIGTTOU, signal.SIGTTIN, signal.SIGCHLD, signal.SIGINT):
+                signal.signal(sig, signal.SIG_DFL)
+
+    def __add_job(self, pid, command, process):
+        job_id = max(self.__background_jobs, default=0) + 1
+        job = {'id': job_id, 'pid': pid, 'command': command, 'process': process,
+               'state': 'Running', 'code': None, 'usage': None}
+        self.__background_jobs[job_id] = job
+        return job
+
+    # store a wait status; rusage from wait4 gives the job's CPU time and peak RSS
+    def __record_job_status(self, job, status, usage):
+        if os.WIFSTOPPED(status):
+            job['state'] = 'Stopped'
+        elif os.WIFCONTINUED(status):
+            job['state'] = 'Running'
+        else:
+            code = os.waitstatus_to_exitcode(status)
+            job['code'], job['usage'] = code, usage
+            if code >= 0:
+                job['state'] = 'Done' if code == 0 else f'Exit {code}'
+            else:
+                try:
+                    job['state'] = signal.Signals(-code).name
+                except ValueError:
+                    job['state'] = f'Signal {-code}'
+            if job['process'] is not None:
+                job['process'].returncode = code  # already reaped; subprocess must not wait for it again
+
+    # Non-blocking reap of job pids only (never waitpid(-1), which would steal children that other
+    # code is waiting for). Called from the SIGCHLD handler and before listing jobs.
+    def __reap_jobs(self):
+        for job in list(self.__background_jobs.values()):
+            if job['state'] not in ('Running', 'Stopped'):
+                continue
+            try:
+                pid, status, usage = os.wait4(job['pid'], os.WNOHANG | os.WUNTRACED | os.WCONTINUED)
+            except ChildProcessError:
+                job['state'] = 'Done'  # reaped elsewhere; exit status unknown
+                continue
+            if pid:
+                self.__record_job_status(job, status, usage)
+        for pid in list(self.__disowned_pids):
+            try:
+                if os.wait4(pid, os.WNOHANG)[0]:
+                    self.__disowned_pids.discard(pid)
+            except ChildProcessError:
+                self.__disowned_pids.discard(pid)
+
+    # Wait for a foreground process (group) while it owns the terminal. SIGCHLD is blocked so the
+    # reaper cannot take the status first. Returns (status, rusage), or (None, None) if gone.
+    def __wait_foreground(self, pid, pgid):
+        terminal = sys.stdin.fileno() if sys.stdin.isatty() else None
+        masked = hasattr(signal, 'pthread_sigmask')
+        if masked:
+            signal.pthread_sigmask(signal.SIG_BLOCK, {signal.SIGCHLD})
+        try:
+            if terminal is not None:
+                try:
+                    os.tcsetpgrp(terminal, pgid)
+                except OSError:
+                    terminal = None
+            _, status, usage = os.wait4(pid, os.WUNTRACED)
+            return status, usage
+        except ChildProcessError:
+            return None, None
+        finally:
+            if terminal is not None:
+                os.tcsetpgrp(terminal, os.getpgrp())
+            if masked:
+                signal.pthread_sigmask(signal.SIG_UNBLOCK, {signal.SIGCHLD})
+
+    # %n, %% / %+ (current), %- (previous), %prefix, %?text, or a plain pid
+    def __find_job(self, spec=None):
+        jobs = self.__background_jobs
+        ids = sorted(jobs)
+        if not ids:
+            return None
+        if spec in (None, '%', '%%', '%+'):
+            return jobs[ids[-1]]
+        if spec == '%-':
+            return jobs[ids[-2]] if len(ids) > 1 else None
+        if spec.startswith('%'):
+            text = spec[1:]
+            if text.isdigit():
+                return jobs.get(int(text))
+            matches = [jobs[i] for i in ids if (text[1:] in jobs[i]['command'] if text.startswith('?')
+                                                else jobs[i]['command'].startswith(text))]
+            return matches[-1] if matches else None
+        if spec.isdigit():
+            return next((job for job in jobs.values() if job['pid'] == int(spec)), None)
+        return None
+
+    def __job_marker(self, job):
+        ids = sorted(self.__background_jobs)
+        return '+' if job['id'] == ids[-1] else ('-' if len(ids) > 1 and job['id'] == ids[-2] else ' ')
+
+    # CPU seconds and peak RSS: from wait4's rusage once finished, from the process table while running
+    def __job_usage(self, job):
+        if job['usage'] is not None:
+            usage = job['usage']
+            rss = usage.ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+            return f"cpu {usage.ru_utime + usage.ru_stime:.2f}s  maxrss {self.__human_size(rss)}"
+        process = self.__process_table(max_age=JOB_USAGE_TTL)['rows'].get(job['pid'])
+        return f"cpu {process.cpu:.2f}s  rss {self.__human_size(process.rss)}" if process else ''
+
+    # Run the given command in the background. A single external command is started directly;
+    # anything else (pipelines, &&/||, builtins, redirections) runs as "custom_shell.py -c <line>".
+    def __run_background(self, item):
+        commands = item.pipelines[0]
+        cmd = list(commands[0].argv)
+        simple = len(item.pipelines) == 1 and len(commands) == 1 and not commands[0].redirects and cmd[0] not in self.__BUILTINS
+        if simple and cmd[0] == "sleep":
+            if len(cmd) < 2 or not cmd[1].replace(".", "", 1).isdigit():
+                print(self.color_text(self.__HELP_DICT['sleep'], 'red'), file=sys.stderr)
+                return 2
+            
+        try:
+            if simple:
+                executable = self.__resolve_command(cmd[0])
+            else:
+                cmd = [sys.executable, os.path.abspath(__file__), '-c', item.source]
+                executable = sys.executable
+            if not executable:
+                raise FileNotFoundError(cmd[0])
+            #launches the process asynchronously (in the background), in its own process group
+            process = subprocess.Popen(cmd, executable=executable,
+                                       **({'process_group': 0, 'preexec_fn': self.__reset_job_signals}
+                                          if os.name == 'posix' else {}))
+            job = self.__add_job(process.pid, item.source, process)
+            self.__reap_jobs()  # in case it exited before it was in the table
+            print(f"[{job['id']}] {process.pid} Running in background: {item.source}")
+            return 0
+        except FileNotFoundError:
+            print(self.color_text(self.__HELP_DICT['&'], 'red'), file=sys.stderr)
+            return 127
+
+    # report finished jobs (bash does this before each prompt) and forget them
+    def __notify_jobs(self):
+        self.__reap_jobs()
+        for job in [job for job in self.__background_jobs.values() if job['state'] not in ('Running', 'Stopped')]:
+            print(f"[{job['id']}]{self.__job_marker(job)}  {job['state']:<22}  {job['command']}  {self.__job_usage(job)}")
+            del self.__background_jobs[job['id']]
+
+    def __list_jobs(self, args=()):
+        # List all background jobs with their state and resource usage; finished ones are then dropped.
+        self.__reap_jobs()
+        for job in list(self.__background_jobs.values()):
+            pid = f"{job['pid']} " if '-l' in args else ''
+            print(f"[{job['id']}]{self.__job_marker(job)}  {pid}{job['state']:<22}  {job['command']}  {self.__job_usage(job)}")
+        for job_id in [i for i, job in self.__background_jobs.items() if job['state'] not in ('Running', 'Stopped')]:
+            del self.__background_jobs[job_id]
+
+    # fg / bg / wait / disown [jobspec...]
+    def __job_command(self, command, args):
+        if os.name != 'posix':
+            print(self.color_text(f'{command}: job control is not available on this platform', 'red'), file=sys.stderr)
+            return 1
+        self.__reap_jobs()
+        if command == 'wait' and not args:
+            targets = [job for job in self.__background_jobs.values() if job['state'] == 'Running']
+        else:
+            targets = [self.__find_job(spec) for spec in (args or [None])]
+        if any(job is None for job in targets):
+            print(self.color_text(f'{command}: no such job', 'red'), file=sys.stderr)
+            return 1
+
+        status = 0
+        for job in targets:
+            if command == 'disown':
+                del self.__background_jobs[job['id']]
+                if job['state'] in ('Running', 'Stopped'):
+                    self.__disowned_pids.add(job['pid'])
+            elif command == 'bg':
+                try:
+                    if job['state'] not in ('Running', 'Stopped'):
+                        raise ProcessLookupError
+                    os.killpg(job['pid'], signal.SIGCONT)
+                except ProcessLookupError:
+                    print(self.color_text(f"bg: job {job['id']} has terminated", 'red'), file=sys.stderr)
+                    status = 1
+                    continue
+                job['state'] = 'Running'
+                print(f"[{job['id']}]{self.__job_marker(job)} {job['command']} &")
+            elif command == 'fg':
+                print(job['command'])
+                if job['state'] == 'Stopped':
+                    try:
+                        os.killpg(job['pid'], signal.SIGCONT)
+                    except ProcessLookupError:
+                        pass  # it exited meanwhile; waiting below collects its status
+                    job['state'] = 'Running'
+                if job['state'] == 'Running':
+                    result, usage = self.__wait_foreground(job['pid'], job['pid'])
+                    if result is None:
+                        job['state'] = 'Done'
                     else:
-                        self.__default_condition(command, parts)
+                        self.__record_job_status(job, result, usage)
+                if job['state'] == 'Stopped':
+                    print(f"\n[{job['id']}]{self.__job_marker(job)}  Stopped                 {job['command']}")
+                else:
+                    status = job['code'] or 0
+                    del self.__background_jobs[job['id']]
+            else:  # wait
+                try:
+                    while job['state'] == 'Running':
+                        result, usage = self.__wait_foreground(job['pid'], os.getpgrp())
+                        if result is None:
+                            job['state'] = 'Done'
+                        else:
+                            self.__record_job_status(job, result, usage)
+                except KeyboardInterrupt:
+                    print()
+                    return 130
+                status = job['code'] or 0
+        return status
+
+    # Open a command's redirections left to right as sh does. Returns ({fd: source fd}, opened fds),
+    # where a source of 0, 1 or 2 means the shell's own descriptor, so "2>&1 > f" and "> f 2>&1" differ.
+    def __open_redirects(self, redirects):
+        table, opened = {0: 0, 1: 1, 2: 2}, []
+        try:
+            for redirect in redirects:
+                if redirect.op != '>&':
+                    source = os.open(os.path.abspath(redirect.target), REDIRECT_FLAGS[redirect.op], 0o666)
+                    opened.append(source)
+                elif redirect.target == '-':
+                    source = os.open(os.devnull, os.O_WRONLY)  # closed fd: writes are discarded
+                    opened.append(source)
+                else:
+                    source = table.get(int(redirect.target), int(redirect.target))
+                    try:
+                        os.fstat(source)
+                    except OSError:  # "n>&7" with fd 7 not open, reported as sh does: "7: Bad file descriptor"
+                        raise OSError(errno.EBADF, os.strerror(errno.EBADF), redirect.target) from None
+                table[redirect.fd] = source
+        except OSError:
+            for fd in opened:
+                os.close(fd)
+            raise
+        return table, opened
+
+    # In a forked child: install the fd table. Shell descriptors used as sources are copied first
+    # so an earlier dup2 cannot clobber one that a later entry still needs.
+    @staticmethod
+    def __apply_redirects(table):
+        sources = {fd: os.dup(source) if source in (0, 1, 2) and source != fd else source
+                   for fd, source in table.items()}
+        for fd, source in sources.items():
+            if source != fd:
+                os.dup2(source, fd)
+
+    # Point sys.stdin/stdout/stderr at the fd table for the duration of a builtin. Files get one
+    # REDIRECT_BUFFER_SIZE writer each (shared when 2>&1), flushed before the fds are closed.
+    @contextlib.contextmanager
+    def __redirect_builtin(self, table):
+        saved = sys.stdin, sys.stdout, sys.stderr
+        streams = {0: saved[0], 1: saved[1], 2: saved[2]}
+        opened = []
+        sys.stdout.flush()
+        try:
+            for fd in (0, 1, 2):
+                source = table[fd]
+                if source not in streams:
+                    mode = 'r' if fd == 0 else 'w'
+                    streams[source] = open(source, mode, buffering=REDIRECT_BUFFER_SIZE, closefd=False)
+                    opened.append(streams[source])
+            sys.stdin, sys.stdout, sys.stderr = streams[table[0]], streams[table[1]], streams[table[2]]
+            yield
+        finally:
+            sys.stdin, sys.stdout, sys.stderr = saved
+            for stream in opened:
+                try:
+                    stream.close()
+                except OSError as e:
+                    print(self.color_text(f'IIUI-Shell: {e.strerror}', 'red'), file=sys.stderr)
+
+    # returns the fd that sys.stdout writes to, or None when stdout is not backed by a real file
+    def __stdout_fileno(self):
+        try:
+            return sys.stdout.fileno()
+        except (AttributeError, ValueError, io.UnsupportedOperation):
+            return None
+
+    # copy a pipe into sys.stdout in fixed-size chunks through one reusable buffer
+    def __pump_output(self, source):
+        buffer = bytearray(PIPE_CHUNK_SIZE)
+        view = memoryview(buffer)
+        target = getattr(sys.stdout, 'buffer', None)
+        decoder = None if target else codecs.getincrementaldecoder('utf-8')(errors='replace')
+        while True:
+            count = source.readinto(buffer)
+            if not count:
+                break
+            if target:
+                target.write(view[:count])
+            else:
+                sys.stdout.write(decoder.decode(view[:count]))
+        if target:
+            target.flush()
+        else:
+            sys.stdout.write(decoder.decode(b'', final=True))
+
+    # Builtin pipeline stages. Each one takes an iterator of byte lines plus its arguments and
+    # returns a lazy iterator of byte lines, so "ls | grep txt | sort" runs without any fork/exec.
+    def __pipe_builtin(self, name):
+        return {
+            'cat': self.__cat_lines,
+            'grep': self.__stage_grep,
+            'sort': self.__stage_sort,
+            'uniq': self.__stage_uniq,
+            'wc': self.__stage_wc,
+            'head': self.__stage_head,
+            'tail': self.__stage_tail,
+            'cut': self.__stage_cut,
+            'xargs': lambda lines, args: self.__parallel_lines('xargs', lines, args),
+            'parallel': lambda lines, args: self.__parallel_lines('parallel', lines, args),
+        }.get(name)
+
+    # file arguments replace the piped input, like the real tools
+    def __stage_input(self, lines, files):
+        return self.__cat_lines(lines, files) if files else lines
+
+    # accepts both "-n 5" and the old "-5" form for head/tail
+    def __line_count(self, args, short_options='n:'):
+        if args and args[0][1:].isdigit() and args[0].startswith('-'):
+            args = ['-n', args[0][1:]] + args[1:]
+        options, files = getopt.getopt(args, short_options)
+        options = dict(options)
+        if not options.get('-n', '10').isdigit():
+            raise getopt.GetoptError(f"invalid number of lines: '{options['-n']}'")
+        return int(options.get('-n', 10)), files, options
+
+    def __stage_grep(self, lines, args):
+        options, rest = getopt.getopt(args, 'ivcnFE')
+        flags = {flag for flag, _ in options}
+        if not rest:
+            raise getopt.GetoptError('usage: grep [-ivcnF] <pattern> [file...]')
+        pattern = rest[0].encode()
+        if '-F' in flags:
+            pattern = re.escape(pattern)
+        try:
+            search = re.compile(pattern, re.IGNORECASE if '-i' in flags else 0).search
+        except re.error as e:
+            raise getopt.GetoptError(f'grep: invalid regex {rest[0]!r}: {e}')
+        invert = '-v' in flags
+
+        def run():
+            count = 0
+            for number, line in enumerate(self.__stage_input(lines, rest[1:]), 1):
+                if (search(line) is None) == invert:
+                    count += 1
+                    if '-c' not in flags:
+                        yield f'{number}:'.encode() + line if '-n' in flags else line
+            if '-c' in flags:
+                yield f'{count}\n'.encode()
+            return 0 if count else 1
+        return run()
+
+    def __stage_sort(self, lines, args):
+        options, files = getopt.getopt(args, 'rnuf')
+        flags = {flag for flag, _ in options}
+
+        def numeric(line):
+            match = re.match(rb'\s*(-?\d+(?:\.\d*)?)', line)
+            return (float(match.group(1)) if match else 0.0, line)
+
+        def run():
+            # sorting needs every line, so this is the one stage that materializes its input
+            data = [line if line.endswith(b'\n') else line + b'\n' for line in self.__stage_input(lines, files)]
+            key = numeric if '-n' in flags else (bytes.lower if '-f' in flags else None)
+            data.sort(key=key, reverse='-r' in flags)
+            if '-u' in flags:
+                yield from (line for line, _ in itertools.groupby(data))
+            else:
+                yield from data
+        return run()
+
+    def __stage_uniq(self, lines, args):
+        options, files = getopt.getopt(args, 'cdui')
+        flags = {flag for flag, _ in options}
+        key = bytes.lower if '-i' in flags else None
+
+        def run():
+            for _, group in itertools.groupby(self.__stage_input(lines, files), key=key):
+                first = next(group)
+                count = 1 + sum(1 for _ in group)
+                if ('-d' in flags and count == 1) or ('-u' in flags and count > 1):
+                    continue
+                yield f'{count:>7} '.encode() + first if '-c' in flags else first
+        return run()
+
+    def __stage_wc(self, lines, args):
+        options, files = getopt.getopt(args, 'lwc')
+        flags = [flag for flag, _ in options] or ['-l', '-w', '-c']
+
+        def run():
+            counts = {'-l': 0, '-w': 0, '-c': 0}
+            for line in self.__stage_input(lines, files):
+                counts['-l'] += line.endswith(b'\n')
+                counts['-w'] += len(line.split())
+                counts['-c'] += len(line)
+            yield (' '.join(f'{counts[flag]:>7}' for flag in ('-l', '-w', '-c') if flag in flags) + '\n').encode()
+        return run()
+
+    def __stage_head(self, lines, args):
+        count, files, _ = self.__line_count(args)
+        return itertools.islice(self.__stage_input(lines, files), max(count, 0))
+
+    def __stage_tail(self, lines, args):
+        count, files, _ = self.__line_count(args)
+
+        def run():
+            if len(files) == 1 and os.path.isfile(files[0]):
+                with open(files[0], 'rb') as f:
+                    yield from self.__last_lines(f, count)
+                return
+            yield from collections.deque(self.__stage_input(lines, files), maxlen=max(count, 0))
+        return run()
+
+    def __stage_cut(self, lines, args):
+        options, files = getopt.getopt(args, 'd:f:c:')
+        options = dict(options)
+        spec = options.get('-f') or options.get('-c')
+        if not spec:
+            raise getopt.GetoptError('usage: cut -d <delim> -f <list> | cut -c <list>')
+        # "1,3-5" -> zero-based indices; an open range like "3-" runs to the end of the line
+        ranges = []
+        for item in spec.split(','):
+            start, _, end = item.partition('-')
+            if not (start or end) or not (start or '1').isdigit() or not (end or '1').isdigit() or start == '0':
+                raise getopt.GetoptError(f"cut: invalid field or character list '{spec}'")
+            ranges.append((int(start or 1) - 1, int(end) if end else (None if _ else int(start))))
+        delimiter = options.get('-d', '\t').encode() or b'\t'
+
+        def pick(items):
+            return [piece for start, end in ranges for piece in items[start:end]]
+
+        def run():
+            for line in self.__stage_input(lines, files):
+                line = line.rstrip(b'\n')
+                if '-c' in options:
+                    yield bytes(pick(line)) + b'\n'
+                elif delimiter not in line:
+                    yield line + b'\n'
+                else:
+                    yield delimiter.join(pick(line.split(delimiter))) + b'\n'
+        return run()
+
+    # feed an in-process stage's output into an external process's stdin
+    def __feed_process(self, lines, process):
+        def run():
+            try:
+                process.stdin.writelines(lines)
+            except (BrokenPipeError, OSError):
+                pass  # the reader exited early (e.g. "| head")
+            except ValueError as e:
+                print(self.color_text(str(e), 'red'), file=sys.stderr)  # xargs/parallel input it cannot split
+            finally:
+                try:
+                    process.stdin.close()
+                except OSError:
+                    pass
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        return thread
+
+    # os.fork() for the shell's own children. Python 3.12 warns on every fork while other threads
+    # run, since a child that goes on running Python can block on a lock one of them held. The shell's
+    # threads are the metrics sampler, which forks wait out (see __start_metrics), and pipe feeder or
+    # job threads, whose only objects a child uses are the std streams __fork_builtin reopens. The
+    # other children exec at once, and the server forks sessions before any thread is started.
+    @staticmethod
+    def __fork():
+        with warnings.catch_warnings():
+            warnings.filterwarnings('ignore', r'This process .* is multi-threaded', DeprecationWarning)
+            return os.fork()
+
+    # Run a builtin that has no line-stage form (tree, du, help, history, ...) as a pipeline stage
+    # in a forked copy of the shell, like bash: it sees the shell's state but cannot change it.
+    # stdin_fd (None: the shell's stdin) and stdout_fd become fds 0 and 1 before the stage's own
+    # redirections; private lists the shell's other pipe ends, which the child must not hold open.
+    def __fork_builtin(self, stage, table, stdin_fd, stdout_fd, private, feed=False):
+        if feed:
+            read_end, write_end = os.pipe()
+            stdin_fd = read_end
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = self.__fork()
+        if pid:
+            if not feed:
+                return ForkedStage(pid)
+            os.close(read_end)
+            return ForkedStage(pid, open(write_end, 'wb'))
+        status = 1
+        try:
+            signal.signal(signal.SIGPIPE, signal.SIG_DFL)  # die quietly when the reader goes away
+            if stdin_fd is not None:
+                os.dup2(stdin_fd, 0)
+            os.dup2(stdout_fd, 1)
+            for pipe in private:
+                if not pipe.closed:
+                    os.close(pipe.fileno())
+            if feed:
+                os.close(read_end)
+                os.close(write_end)
+            self.__apply_redirects(table)
+            # fresh streams on the new fds: the shell's own may hold input it read ahead, or the
+            # lock of a feeder thread that was writing to stderr when the fork happened
+            sys.stdin = open(0, 'r', closefd=False)
+            sys.stdout = open(1, 'w', closefd=False)
+            sys.stderr = open(2, 'w', buffering=1, closefd=False)
+            status = self.__dispatch(stage) or 0
+        except SystemExit as e:
+            status = e.code if isinstance(e.code, int) else 1
+        except KeyboardInterrupt:
+            status = 130
+        finally:
+            try:
+                sys.stdout.flush()
+                sys.stderr.flush()
+            finally:
+                os._exit(status & 0xFF)
+
+    # write the byte lines of a final in-process stage to the redirect target or stdout. Returns the
+    # stage's exit status: what its generator returned (grep: 1 when nothing matched), else 0.
+    def __write_lines(self, lines, output):
+        target = output or getattr(sys.stdout, 'buffer', None)
+        status = []
+
+        def tracked():
+            status.append((yield from lines) or 0)
+        try:
+            if target:
+                target.writelines(tracked())
+                target.flush()
+            else:
+                for line in tracked():
+                    sys.stdout.write(line.decode(errors='replace'))
+        except BrokenPipeError:
+            pass
+        return status[0] if status else 0
+
+    # Run <cmd1> | <cmd2> | ... with any number of stages. The last stage writes straight to the
+    # terminal (or its redirection target), so output is never collected in memory. Any stage may
+    # carry redirections: external stages get the file fds, builtin stages read/write them directly.
+    # Builtins without a line-stage form run in a forked shell; only other names go through PATH.
+    def __run_pipe(self, commands):
+        command_line = ' | '.join(shlex.join(command.argv) for command in commands)
+        stages = [list(command.argv) for command in commands]
+
+        sys.stdout.flush()
+        processes, feeders, consumed, opened = [], [], [], []
+        private = []  # pipe ends held by the shell: read ends and feeder write ends
+        final = None  # the external process whose exit status is the pipeline's, if any
+        status = 0  # else the status of the last in-process stage
+        try:
+            final_fd = self.__stdout_fileno()
+            # stream is whatever the previous stage produced: None (no input yet), an external
+            # process's stdout pipe, or a lazy iterator of lines from an in-process builtin
+            stream = None
+            with self.__phase('pipe setup', commands):
+                for index, stage in enumerate(stages):
+                    is_last = index == len(stages) - 1
+                    name, args = stage[0], stage[1:]
+                    builtin = self.__pipe_builtin(name)
+                    table, files = self.__open_redirects(commands[index].redirects)
+                    opened.extend(files)
+                    if table[0] != 0:
+                        if stream is not None and hasattr(stream, 'fileno'):
+                            consumed.append(stream)
+                        stream = open(table[0], 'rb', closefd=False)
+                        consumed.append(stream)
+                    if index == 0 and name in ('ls', 'ps', 'find'):
+                        stream = {'ls': self.__list_lines, 'ps': self.__ps_pipe_lines, 'find': self.__find_lines}[name](args)
+                    elif index == 0 and name == 'grep' and stream is None:
+                        stream = self.__grep_lines(args)
+                    elif builtin:
+                        if stream is None:
+                            stream = sys.stdin.buffer
+                        elif hasattr(stream, 'fileno'):
+                            consumed.append(stream)
+                        stream = builtin(stream, args)
+                    else:
+                        forked = name in self.__BUILTINS
+                        executable = None if forked else self.__resolve_command(name)
+                        if not (forked or executable):
+                            raise FileNotFoundError(errno.ENOENT, 'command not found', name)
+                        piped = stream is not None and not hasattr(stream, 'fileno')
+                        # the stage's own stdout: the terminal for the last stage, else a new pipe;
+                        # in its fd table a source of 1 means this, so "2>&1" also feeds the pipe
+                        if is_last and final_fd is not None:
+                            read_end, write_end = None, final_fd
+                        else:
+                            read_end, write_end = os.pipe()
+                        try:
+                            if forked:
+                                process = self.__fork_builtin(stage, table, None if piped or stream is None else stream.fileno(),
+                                                              write_end, private, feed=piped)
+                            else:
+                                process = subprocess.Popen(
+                                    stage,
+                                    executable=executable,
+                                    stdin=subprocess.PIPE if piped else stream,
+                                    stdout=write_end if table[1] == 1 else table[1],
+                                    stderr=None if table[2] == 2 else write_end if table[2] == 1 else table[2],
+                                )
+                        except OSError:
+                            if read_end is not None:
+                                os.close(read_end)
+                                os.close(write_end)
+                            raise
+                        if piped:
+                            private.append(process.stdin)
+                            feeders.append(self.__feed_process(stream, process))
+                        elif stream is not None and stream not in consumed:
+                            stream.close()  # only the next stage keeps the read end open
+                        processes.append(process)
+                        final = process if is_last else None
+                        stream = None
+                        if read_end is not None:
+                            os.close(write_end)
+                            stream = open(read_end, 'rb')
+                            private.append(stream)
+                    if table[1] != 1 and stream is not None and not hasattr(stream, 'fileno'):
+                        # a builtin stage redirected away from the pipe: drain it into its file now
+                        with open(table[1], 'wb', buffering=REDIRECT_BUFFER_SIZE, closefd=False) as output:
+                            status = self.__write_lines(stream, output)
+                        stream = None
+                    if table[1] != 1 and stream is None and not is_last:
+                        stream = iter(())  # the next stage reads an empty pipe
+
+            with self.__phase('pipe run', commands):
+                if stream is not None and not hasattr(stream, 'fileno'):
+                    status = self.__write_lines(stream, None)
+                elif stream is not None:
+                    self.__pump_output(stream)
+                    stream.close()
+                for feeder in feeders:
+                    feeder.join()
+                for pipe in consumed:
+                    pipe.close()  # a stage like "head" may stop early; let the writer see SIGPIPE
+                for process in processes:
+                    process.wait()
+                return final.returncode if final else status
+        except getopt.GetoptError as e:
+            print(self.color_text(f'IIUI-Shell: {e.msg}', 'red'), file=sys.stderr)
+            return 2
+        except FileNotFoundError as e:
+            if e.strerror != 'command not found':
+                print(self.color_text(f'IIUI-Shell: {e.filename}: {e.strerror}', 'red'), file=sys.stderr)
+                return 1
+            print(self.color_text(f'IIUI-Shell: {e.filename or command_line}: command not found.', 'red'), file=sys.stderr)
+            print(self.color_text(self.__HELP_DICT['|'], 'red'), file=sys.stderr)
+            return 127
+        except OSError as e:
+            print(self.color_text(f'IIUI-Shell: {e.filename or command_line}: {e.strerror}', 'red'), file=sys.stderr)
+            return 1
+        except ValueError as e:
+            print(self.color_text(str(e), 'red'), file=sys.stderr)  # xargs/parallel input it cannot split
+            return 1
+        finally:
+            for process in processes:
+                if process.poll() is None:  # only left running when a later stage failed
+                    process.kill()
+                    process.wait()
+            for fd in opened:
+                os.close(fd)
+
+    def run_shell(self, banner=True):
+        if banner and not os.environ.get('IIUI_NO_BANNER'):
+            self.__welcome()
+        # handle auto cmpletion on tab press
+        readline.set_completer(self.__completer)
+        readline.set_completer_delims(' \t\n"\'<>;|&')  # keep "/" so nested paths complete as one word
+        readline.parse_and_bind('tab: complete')
+        readline.parse_and_bind(r'"\C-r": "\C-ahistory -s \C-j"')  # Ctrl-R: search history for the typed text
+        self.__init_job_control()
+        self.__load_history()
+        self.__start_metrics()
+
+        while True:
+            self.__notify_jobs()
+            with self.__phase('prompt'):
+                sys.stdout.write(self.__prompt())
+            
+            command = input("$ ").strip()
+            readline.set_startup_hook(None)
+
+            if not command.strip():
+                continue
+
+            if command == 'exit':
+                print(self.color_text("Exiting IIUI-Shell. Goodbye!", 'crimson'))
+                self.__flush_history()
+                break
+
+            if command.startswith('history -s'):
+                # searches are not history; drop the line readline recorded
+                readline.remove_history_item(readline.get_current_history_length() - 1)
+                self.__run_line(command)
+                continue
+
+            command = self.__expand_history(command)
+            if command is None:
+                continue
+            self.__add_history(command)
+            self.__run_line(command)
+
+    # one interactive line: an unexpected error is reported, as in batch mode, and the session goes on
+    def __run_line(self, command):
+        try:
+            return self.execute(command)
+        except Exception as e:
+            print(self.color_text(f'IIUI-Shell: {command}: {e}', 'red'), file=sys.stderr)
+            return 1
+
+    # Prompt: "user@host IIUI-Shell ~/path $ ". Rebuilt only when the cwd or one of the environment
+    # variables it is made from changes; otherwise the same string is written again.
+    def __prompt(self):
+        key = (os.getcwd(),) + tuple(os.environ.get(name) for name in PROMPT_ENVIRONMENT)
+        if self.__prompt_cache[0] != key:
+            host = os.environ.get('COMPUTERNAME') or os.uname().nodename
+            prompt = ' '.join((self.color_text(f"\n{getpass.getuser()}@{host} ", 'green'),
+                               self.color_text("IIUI-Shell ", 'purple'),
+                               self.color_text(f"~/{'/'.join(key[0].split('\\')[3:])} ", 'yellow')))
+            self.__prompt_cache = (key, prompt + '\n')
+        return self.__prompt_cache[1]
+
+    # cross-process lock for HISTORY_FILE; a separate lock file so compaction can replace the history file
+    def __history_lock(self):
+        if fcntl is None:
+            return contextlib.nullcontext()
+        lock = open(HISTORY_FILE + '.lock', 'a')
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        return lock  # closing the file releases the lock
+
+    # rebuild the search structures from self.__history (after loading or evicting)
+    def __index_history(self):
+        self.__history_last = {command: self.__history_base + index + 1 for index, command in enumerate(self.__history)}
+        self.__history_prefixes = sorted(self.__history_last)
+        text = ''.join(f'{command}\n' for command in self.__history)
+        self.__history_chunks = [text]
+        self.__history_offsets = array.array('q')
+        offset = 0
+        for command in self.__history:
+            self.__history_offsets.append(offset)
+            offset += len(command) + 1
+        self.__history_length = offset
+
+    # Load the tail of HISTORY_FILE. A file that has grown well past HISTORY_FILE_SIZE (several shells
+    # appending) is compacted under the lock: older duplicates are dropped and the newest entries kept.
+    def __load_history(self):
+        self.__history_persist = True
+        atexit.register(self.__flush_history)
+        try:
+            with self.__history_lock():
+                with open(HISTORY_FILE, 'rb') as f:
+                    tail = self.__last_lines(f, HISTORY_SIZE)
+                    size, read = f.tell(), sum(len(line) for line in tail)
+                    # compaction needs every line: read them all only when, going by the length of
+                    # the lines just read, the file holds well over HISTORY_FILE_SIZE of them
+                    if size > read and size * len(tail) > read * (HISTORY_FILE_SIZE + HISTORY_FILE_SIZE // 4):
+                        f.seek(0)
+                        tail = f.readlines()
+                lines = b''.join(tail).decode('utf-8', errors='replace').splitlines()
+                if len(lines) > HISTORY_FILE_SIZE + HISTORY_FILE_SIZE // 4:
+                    latest = list(dict.fromkeys(reversed(lines)))[:HISTORY_FILE_SIZE]
+                    lines = latest[::-1]
+                    temporary = f'{HISTORY_FILE}.{os.getpid()}.tmp'
+                    with open(temporary, 'w', encoding='utf-8') as f:
+                        f.write(''.join(f'{line}\n' for line in lines))
+                    os.replace(temporary, HISTORY_FILE)
+        except OSError:
+            lines = []
+        entries = [line for index, line in enumerate(lines) if line and (index == 0 or line != lines[index - 1])]
+        self.__history = entries[-HISTORY_SIZE:]
+        self.__history_base = 0
+        self.__index_history()
+        for command in self.__history[-HISTORY_READLINE_SIZE:]:
+            readline.add_history(command)
+
+    # append pending entries in one O_APPEND write, so concurrent shells never interleave lines
+    def __flush_history(self):
+        if not self.__history_pending or not self.__history_persist:
+            return
+        data = ''.join(f'{command}\n' for command in self.__history_pending).encode('utf-8', errors='replace')
+        try:
+            with self.__history_lock():
+                descriptor = os.open(HISTORY_FILE, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+                try:
+                    os.write(descriptor, data)
+                finally:
+                    os.close(descriptor)
+            self.__history_pending.clear()
+        except OSError:
+            pass  # read-only home: keep the entries in memory only
+        self.__history_flushed = time.monotonic()
+
+    def __add_history(self, command):
+        if self.__history and self.__history[-1] == command:
+            return  # ignore immediate repeats
+        self.__history.append(command)
+        number = self.__history_base + len(self.__history)
+        if command not in self.__history_last:
+            bisect.insort(self.__history_prefixes, command)
+        self.__history_last[command] = number
+        self.__history_offsets.append(self.__history_length)
+        self.__history_chunks.append(f'{command}\n')
+        self.__history_length += len(command) + 1
+
+        if self.__history_persist:
+            self.__history_pending.append(command)
+            if (len(self.__history_pending) >= HISTORY_FLUSH_BATCH
+                    or time.monotonic() - self.__history_flushed >= HISTORY_FLUSH_INTERVAL):
+                self.__flush_history()
+        if len(self.__history) > HISTORY_SIZE + HISTORY_SIZE // 4:
+            evicted = len(self.__history) - HISTORY_SIZE
+            del self.__history[:evicted]
+            self.__history_base += evicted
+            self.__index_history()
+
+    # Number of the newest entry containing query, older than entry number before. All entries live
+    # in one newline-joined string, so this is a single C-level rfind plus a bisect over the offsets.
+    def __search_history(self, query, before=None):
+        if len(self.__history_chunks) > 1:
+            self.__history_chunks = [''.join(self.__history_chunks)]
+        if before is not None and before - 1 <= self.__history_base:
+            return None
+        text = self.__history_chunks[0] if self.__history_chunks else ''
+        end = len(text) if before is None else self.__history_offsets[before - 1 - self.__history_base]
+        position = text.rfind(query, 0, end)
+        if position == -1:
+            return None
+        return self.__history_base + bisect.bisect_right(self.__history_offsets, position)
+
+    # !! (last), !n (entry n), !-n (n back), !prefix (newest entry starting with prefix)
+    def __history_event(self, event):
+        last = self.__history_base + len(self.__history)
+        if event == '!':
+            number = last
+        elif event.lstrip('-').isdigit():
+            number = int(event) if not event.startswith('-') else last + 1 + int(event)
+        else:
+            start = bisect.bisect_left(self.__history_prefixes, event)
+            end = bisect.bisect_left(self.__history_prefixes, event + '\U0010ffff', start)
+            number = max((self.__history_last[command] for command in self.__history_prefixes[start:end]), default=0)
+        if self.__history_base < number <= last:
+            return self.__history[number - 1 - self.__history_base]
+        return None
+
+    # expand history events in a command line; returns None (and reports) when an event is unknown
+    def __expand_history(self, command):
+        if '!' not in command:
+            return command
+
+        def replace(match):
+            entry = self.__history_event(match.group(1))
+            if entry is None:
+                raise LookupError(match.group(0))
+            return entry
+        try:
+            expanded = HISTORY_EVENT.sub(replace, command)
+        except LookupError as e:
+            print(self.color_text(f'IIUI-Shell: {e.args[0]}: event not found', 'red'), file=sys.stderr)
+            return None
+        if expanded != command:
+            print(expanded)
+        return expanded
+
+    # history [N] | history -c | history -s <text> (reverse search; bound to Ctrl-R)
+    def __history_command(self, args):
+        if args[:1] == ['-c']:
+            self.__history.clear()
+            self.__history_base = 0
+            self.__index_history()
+            return 0
+        if args[:1] == ['-s']:
+            query = ' '.join(args[1:])
+            before = None
+            if self.__history_search and query and query == self.__history_event(str(self.__history_search[1])):
+                query, before = self.__history_search  # Ctrl-R again on a match: keep going back
+            number = self.__search_history(query, before) if query else None
+            if number is None:
+                print(self.color_text(f"(failed reverse-i-search)'{query}'", 'red'), file=sys.stderr)
+                self.__history_search = None
+                return 1
+            match = self.__history_event(str(number))
+            self.__history_search = (query, number)
+            print(f"(reverse-i-search)'{query}': {match}")
+            if self.__history_persist:
+                readline.set_startup_hook(lambda: readline.insert_text(match))  # prefill the next prompt
+            return 0
+        if args and not args[0].isdigit():
+            print(self.color_text(self.__HELP_DICT['history'], 'red'), file=sys.stderr)
+            return 1
+        count = int(args[0]) if args else len(self.__history)
+        first = len(self.__history) - min(count, len(self.__history))
+        sys.stdout.write(''.join(f'{self.__history_base + index + 1:>5}  {command}\n'
+                                 for index, command in enumerate(self.__history[first:], first)))
+        return 0
+
+    # Run one command line through the same dispatch as the interactive loop; returns its exit status.
+    # The line is parsed once (and cached) into ";", "&&"/"||" lists of pipelines.
+    def execute(self, command):
+        try:
+            with self.__phase('parse'):
+                items = parse_command_line(command.strip())
+        except ParseError as e:
+            print(self.color_text(f'IIUI-Shell: {e}', 'red'), file=sys.stderr)
+            return 2
+
+        status = 0
+        for item in items:
+            if item.background:
+                status = self.__run_background(item)
+                continue
+            for operator, pipeline in zip(item.operators, item.pipelines):
+                if (operator == '&&' and status != 0) or (operator == '||' and status == 0):
+                    continue
+                status = self.__run_pipeline(pipeline)
+        return status
+
+    # Run one pipeline (or simple command) and add its latency to the stats of its command names.
+    def __run_pipeline(self, pipeline):
+        if pipeline[0].argv[0] == 'time':
+            return self.__time_pipeline(pipeline)
+        started = time.perf_counter()
+        with self.__phase('command', pipeline):
+            status = self.__run_pipe(pipeline) if len(pipeline) > 1 else self.__run_command(pipeline[0])
+        self.__record_stats('|'.join(command.argv[0] for command in pipeline), time.perf_counter() - started)
+        return status
+
+    # time <pipeline>: real time, user and sys time of the shell and the children it waited for,
+    # and max RSS (the largest child's if one outgrew every earlier child, else the shell's own).
+    def __time_pipeline(self, pipeline):
+        first = pipeline[0]
+        if len(first.argv) == 1:
+            print(self.color_text(self.__HELP_DICT['time'], 'red'), file=sys.stderr)
+            return 2
+        pipeline = (first._replace(argv=first.argv[1:]),) + pipeline[1:]
+        children_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss if resource else 0
+        before, started = os.times(), time.perf_counter()
+        status = self.__run_pipeline(pipeline)
+        real, after = time.perf_counter() - started, os.times()
+
+        minutes = lambda seconds: f'{int(seconds // 60)}m{seconds % 60:.3f}s'
+        lines = [f'\nreal\t{minutes(real)}',
+                 f'user\t{minutes(after.user - before.user + after.children_user - before.children_user)}',
+                 f'sys\t{minutes(after.system - before.system + after.children_system - before.children_system)}']
+        if resource:
+            rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+            if rss <= children_rss:
+                rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            lines.append(f"maxrss\t{self.__human_size(rss if sys.platform == 'darwin' else rss * 1024)}")
+        sys.stdout.flush()
+        print('\n'.join(lines), file=sys.stderr)
+        return status
+
+    # Server mode: keep this warm shell (modules imported, PATH hashed) and fork one session per
+    # client connection, so a command costs a fork instead of an interpreter start. The client
+    # passes its stdin/stdout/stderr over the socket; the session runs on them with the client's
+    # cwd and environment, isolated from other sessions by being its own process, and sends
+    # back the exit status. Only the owning user may connect.
+    def serve(self, path=SERVER_SOCKET):
+        for value in list(globals().values()):
+            if isinstance(value, LazyModule):
+                try:
+                    getattr(value, '__name__')
+                except ImportError:
+                    pass
+        self.__resolve_command('ls')
+        if os.path.dirname(os.path.abspath(path)) == SERVER_DIRECTORY and not self.__private_directory(SERVER_DIRECTORY):
+            print(self.color_text(f'IIUI-Shell: {SERVER_DIRECTORY}: not a private directory of this user', 'red'), file=sys.stderr)
+            return 1
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+                probe.connect(path)
+            print(self.color_text(f'IIUI-Shell: a server is already listening on {path}', 'red'), file=sys.stderr)
+            return 1
+        except FileNotFoundError:
+            pass
+        except ConnectionRefusedError:
+            os.unlink(path)  # left behind by a server that died
+        previous = os.umask(0o077)
+        try:
+            server.bind(path)
+        finally:
+            os.umask(previous)
+        server.listen(SERVER_BACKLOG)
+        signal.signal(signal.SIGCHLD, signal.SIG_IGN)  # the kernel reaps finished sessions
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))  # still remove the socket
+        print(f'IIUI-Shell server listening on {path}', file=sys.stderr)
+        try:
+            while True:
+                connection, _ = server.accept()
+                sys.stdout.flush()
+                sys.stderr.flush()
+                if self.__fork() == 0:
+                    server.close()
+                    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                    status = 1
+                    try:
+                        status = self.__serve_session(connection)
+                    finally:
+                        os._exit(status & 0xFF)
+                connection.close()
+        except (KeyboardInterrupt, SystemExit):
+            return 0
+        finally:
+            server.close()
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+    # The default socket's directory: created with mode 0700, and only trusted when it is a real
+    # directory owned by this user that nobody else can enter (another user may have made it first)
+    @staticmethod
+    def __private_directory(directory):
+        try:
+            os.mkdir(directory, 0o700)
+        except FileExistsError:
+            pass
+        info = os.lstat(directory)
+        return stat.S_ISDIR(info.st_mode) and info.st_uid == os.getuid() and not info.st_mode & 0o077
+
+    # One client session, in its own forked process. Request: a 4-byte length, then NUL-separated
+    # cwd, command line ('' = read commands from stdin) and NAME=value environment entries; the
+    # client's fds 0, 1 and 2 arrive with the first message. Reply: the 4-byte exit status.
+    def __serve_session(self, connection):
+        if hasattr(socket, 'SO_PEERCRED'):
+            _, uid, _ = struct.unpack('3i', connection.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize('3i')))
+            if uid != os.getuid():
+                return 1
+        message, fds, _, _ = socket.recv_fds(connection, 1 << 16, 3)
+        if len(message) < 4 or len(fds) != 3:
+            return 1
+        size = struct.unpack('!I', message[:4])[0]
+        while len(message) < size + 4:
+            chunk = connection.recv(size + 4 - len(message))
+            if not chunk:
+                return 1
+            message += chunk
+        cwd, command, *environment = os.fsdecode(message[4:]).split('\0')
+        for target, fd in enumerate(fds):
+            os.dup2(fd, target)
+            os.close(fd)
+        sys.stdout.reconfigure(line_buffering=sys.stdout.isatty())
+        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+        os.environ.clear()
+        os.environ.update(entry.split('=', 1) for entry in environment if '=' in entry)
+        try:
+            os.chdir(cwd)
+        except OSError as e:
+            print(self.color_text(f'IIUI-Shell: {cwd}: {e.strerror}', 'red'), file=sys.stderr)
+        status = 1
+        try:
+            status = self.run_batch(command.splitlines() if command else sys.stdin)
+        except KeyboardInterrupt:
+            status = 130
+        except SystemExit as e:  # "exit N" inside a longer line
+            status = e.code if isinstance(e.code, int) else 1
+        finally:
+            try:
+                sys.stdout.flush()
+                sys.stderr.flush()
+            finally:
+                connection.sendall(struct.pack('!i', status))
+        return status
+
+    # Record Chrome trace events (chrome://tracing, Perfetto) for every shell phase; written to path at exit.
+    def start_profile(self, path):
+        self.__trace = []
+        self.__trace_start = time.perf_counter_ns()
+
+        def write():
+            try:
+                with open(path, 'w') as f:
+                    json.dump({'traceEvents': self.__trace, 'displayTimeUnit': 'ms'}, f)
+            except OSError as e:
+                print(self.color_text(f'IIUI-Shell: {path}: {e.strerror}', 'red'), file=sys.stderr)
+
+        atexit.register(write)
+
+    # Time a phase of the shell into the trace. With profiling off this is one attribute check
+    # and a shared no-op context manager.
+    def __phase(self, name, detail=None):
+        if self.__trace is None:
+            return NO_PHASE
+        return self.__trace_phase(name, detail)
+
+    @contextlib.contextmanager
+    def __trace_phase(self, name, detail):
+        started = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            event = {'name': name, 'cat': 'shell', 'ph': 'X', 'pid': os.getpid(), 'tid': threading.get_native_id(),
+                     'ts': (started - self.__trace_start) / 1000, 'dur': (time.perf_counter_ns() - started) / 1000}
+            if detail is not None:
+                if not isinstance(detail, str):  # a pipeline
+                    detail = ' | '.join(shlex.join(command.argv) for command in detail)
+                event['args'] = {'command': detail}
+            self.__trace.append(event)
+
+    # add one run of a command to its latency histogram; bucket n holds [2**(n-1), 2**n) microseconds
+    def __record_stats(self, name, elapsed):
+        entry = self.__stats.get(name)
+        if entry is None:
+            entry = self.__stats[name] = [0, 0.0, elapsed, elapsed, [0] * STATS_BUCKETS]
+        entry[0] += 1
+        entry[1] += elapsed
+        entry[2] = min(entry[2], elapsed)
+        entry[3] = max(entry[3], elapsed)
+        entry[4][min(int(elapsed * 1e6).bit_length(), STATS_BUCKETS - 1)] += 1
+
+    def __format_duration(self, seconds):
+        if seconds < 1e-3:
+            return f'{seconds * 1e6:.0f}us'
+        return f'{seconds * 1e3:.1f}ms' if seconds < 1 else f'{seconds:.2f}s'
+
+    # upper bound of the bucket holding the given fraction of runs, capped at the slowest run
+    def __percentile(self, entry, fraction):
+        seen = 0
+        for bucket, count in enumerate(entry[4]):
+            seen += count
+            if seen >= fraction * entry[0]:
+                return min(2 ** bucket / 1e6, entry[3])
+        return entry[3]
+
+    def __stats_command(self, args):
+        if args == ['reset']:
+            self.__stats.clear()
+            return 0
+        if args:
+            entry = self.__stats.get(args[0])
+            if entry is None:
+                print(self.color_text(f'stats: no runs of {args[0]} recorded.', 'red'), file=sys.stderr)
+                return 1
+            used = [bucket for bucket, count in enumerate(entry[4]) if count]
+            widest = max(entry[4])
+            print(f'{args[0]}: {entry[0]} runs, {self.__format_duration(entry[1])} total')
+            for bucket in range(used[0], used[-1] + 1):
+                bound = self.__format_duration(2 ** bucket / 1e6) if bucket < STATS_BUCKETS - 1 else 'more'
+                print(f"  < {bound:>7} {'#' * max(entry[4][bucket] * 40 // widest, bool(entry[4][bucket])):<40} {entry[4][bucket]}")
+            return 0
+        rows = sorted(self.__stats.items(), key=lambda item: item[1][1], reverse=True)
+        lines = [f"{'COMMAND':<20} {'RUNS':>6} {'TOTAL':>8} {'AVG':>8} {'P50':>8} {'P95':>8} {'MAX':>8}"]
+        for name, entry in rows:
+            lines.append(f"{name[:20]:<20} {entry[0]:>6} " + ' '.join(
+                f'{self.__format_duration(value):>8}' for value in (
+                    entry[1], entry[1] / entry[0], self.__percentile(entry, 0.5), self.__percentile(entry, 0.95), entry[3])))
+        sys.stdout.write('\n'.join(lines) + '\n')
+        return 0
+
+    # Run one simple command (no pipes) from the AST. External commands get the redirected fds
+    # directly; builtins write through buffered file objects swapped in for sys.stdout/stderr.
+    def __run_command(self, node):
+        if not node.redirects:
+            return self.__dispatch(list(node.argv))
+        try:
+            table, opened = self.__open_redirects(node.redirects)
+        except OSError as e:
+            print(self.color_text(f'IIUI-Shell: {e.filename}: {e.strerror}', 'red'), file=sys.stderr)
+            return 1
+        try:
+            if node.argv[0] not in self.__BUILTINS:
+                return self.__dispatch(list(node.argv), table)
+            with self.__redirect_builtin(table):
+                return self.__dispatch(list(node.argv))
+        except OSError as e:  # the redirected streams could not be set up or flushed
+            print(self.color_text(f'IIUI-Shell: {node.argv[0]}: {e.strerror}', 'red'), file=sys.stderr)
+            return 1
+        finally:
+            for fd in opened:
+                os.close(fd)
+
+    # Dispatch argv to a builtin, or run it as an external program with the fd table of its redirections.
+    def __dispatch(self, parts, table=None):
+        with self.__phase('dispatch', parts[0]):
+            return self.__dispatch_command(parts, table)
+
+    def __dispatch_command(self, parts, table):
+        status = 0
+        command = shlex.join(parts)
+        cmd = parts[0]
+        arg = parts[1] if len(parts) > 1 else None
+        path = os.path.abspath(arg) if arg else None
+        match cmd:
+            case 'nano':
+                subprocess.run(f"nano {arg}", shell=True)
+
+            case 'hostname':
+                print(os.environ['COMPUTERNAME'])
+
+            case 'cp':
+                status = self.__copy_file(parts)
+            
+            case 'jobs':
+                status = self.__list_jobs(parts[1:])
+
+            case 'fg' | 'bg' | 'wait' | 'disown':
+                status = self.__job_command(cmd, parts[1:])
+            
+            case 'tree':
+                status = self.__print_tree(parts[1:])
+
+            case 'du':
+                status = self.__disk_usage(parts[1:])
+
+            case 'checksum':
+                status = self.__checksum_command(parts[1:])
+
+            case 'archive':
+                status = self.__archive_command(parts[1:])
+
+            case 'open':
+                if not parts[1:]:
+                    print(self.color_text(self.__HELP_DICT['open'], 'red'), file=sys.stderr)
+                else:
+                    os.system(f'start {(" ".join((parts[1:])))}')
+            
+            case 'ram':
+                status = self.__ram_command(parts[1:])
+
+            case 'disk':
+                status = self.__disk_command(parts[1:])
+
+            case 'metrics':
+                status = self.__metrics_command(parts[1:])
+
+            case 'stats':
+                status = self.__stats_command(parts[1:])
+
+            case 'mv':
+                status = self.__move_file(parts)
+
+            case 'cd':
+                status = self.__change_directory(path, arg)
+
+            case 'cat':
+                status = self.__cat_command(parts[1:])
+
+            case 'head' | 'tail':
+                status = self.__head_tail(cmd, parts[1:])
+
+            case 'less':
+                status = self.__page_file(parts[1:])
+
+            case 'top':
+                status = self.__display_running_processes(parts[1:])
+            
+            case 'kill':
+                status = self.__kill_running_process(arg)
+
+            case 'pgrep' | 'pkill':
+                status = self.__signal_processes(cmd, parts[1:])
+
+            case 'pwd':
+                print(os.getcwd())
+
+            case 'ls':
+                status = self.__ls_command(parts[1:])
+
+            case 'ps':
+                status = self.__handle_running_process(parts)
+
+            case 'xargs' | 'parallel':
+                status = self.__parallel_command(cmd, parts[1:])
+
+            case 'find' | 'grep':
+                status = self.__search_command(cmd, parts[1:])
+
+            case 'echo':
+                status = self.__display_echo(arg, parts)
+
+            case 'date':
+                print(datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+
+            case 'whoami':
+                print(getpass.getuser())
+
+            case 'mkdir':
+                status = self.__create_directory(parts[1:])
+
+            case 'rm' | 'rmdir':
+                status = self.__remove_paths(cmd, parts[1:])
+
+            case 'touch':
+                status = self.__create_file(parts[1:])
+            
+            case 'hash':
+                status = self.__hash_command(parts[1:])
+
+            case 'history':
+                status = self.__history_command(parts[1:])
+
+            case 'help':
+                status = self.__display_help()
+
+            case 'clear':
+                os.system('cls' if os.name == 'nt' else 'clear')
+
+            case 'exit':
+                # "exit" inside a longer line (cmd; exit 3); a bare "exit" is handled by the loops
+                raise SystemExit(int(arg) if arg and arg.isdigit() else 0)
+                    
+            case _:
+                status = self.__default_condition(command, parts, table)
+        return status if isinstance(status, int) else 0
+
+    # Non-interactive mode for -c, script files and piped stdin: no banner, readline or prompt.
+    # Stops at "exit [n]" and returns the status of the last command, like sh.
+    def run_batch(self, lines):
+        self.__init_job_control()
+        status = 0
+        for line in lines:
+            command = line.strip()
+            if command == 'exit' or command.startswith('exit '):
+                code = command[4:].strip()
+                status = int(code) if code.isdigit() else status
+                break
+            if not command or command.startswith('#'):
+                continue
+            self.__add_history(command)
+            try:
+                status = self.execute(command)
+            except Exception as e:
+                print(self.color_text(f'IIUI-Shell: {command}: {e}', 'red'), file=sys.stderr)
+                status = 1
+        self.__notify_jobs()
+        sys.stdout.flush()
+        return status
+
 
 if __name__ == "__main__":
+    # getopt rather than argparse: argparse and the modules it pulls in cost more than the rest of startup
+    usage = '''usage: custom_shell.py [-c command | -i | script | --serve] [--socket PATH] [--no-banner] [--profile FILE]
+  -c command        run one command line and exit with its status
+  -i                interactive mode even if stdin is not a terminal
+  script            file of commands to run, one per line
+  --serve           keep a warm shell on a Unix socket for shell_client.py
+  --socket PATH     socket for --serve (default $IIUI_SOCKET or $XDG_RUNTIME_DIR/iiui_shell.sock)
+  --no-banner       start without the welcome banner (or set IIUI_NO_BANNER)
+  --profile FILE    write a Chrome trace of per-phase timings to FILE at exit'''
+    try:
+        options, arguments = getopt.getopt(sys.argv[1:], 'c:ih', ['no-banner', 'profile=', 'help', 'serve', 'socket='])
+        options = dict(options)
+    except getopt.GetoptError as e:
+        sys.exit(f'IIUI-Shell: {e.msg}\n{usage}')
+    if '-h' in options or '--help' in options:
+        print(usage)
+        sys.exit(0)
+    bash = Bash()
+    if '--profile' in options:
+        bash.start_profile(options['--profile'])
+
+    if '--serve' in options:
+        sys.exit(bash.serve(options.get('--socket', SERVER_SOCKET)))
+
+    # batch modes: -c, a script file, or commands piped on stdin
+    if '-c' in options:
+        sys.exit(bash.run_batch(options['-c'].splitlines()))
+    if arguments:
+        try:
+            with open(arguments[0]) as script:
+                sys.exit(bash.run_batch(script))
+        except OSError as e:
+            sys.exit(bash.color_text(f'IIUI-Shell: {arguments[0]}: {e.strerror}', 'red'))
+    if '-i' not in options and not sys.stdin.isatty():
+        sys.exit(bash.run_batch(sys.stdin))
+
     try:
-        bash = Bash()
-        bash.run_shell() #start the bash
+        bash.run_shell('--no-banner' not in options) #start the bash
     
     except KeyboardInterrupt:
         # on any exception exit the code gracefully by printing message
@@ -0,0 +1,7 @@
+# Launcher for the shell: takes the same arguments as custom_shell.py and runs it as __main__, but
+# imported, so Python loads the cached bytecode from __pycache__ instead of compiling the whole
+# file on every start as it does for a script run directly.
+# usage: python iiui_shell.py [-c command | -i | script | --serve] [options]
+import runpy
+
+runpy.run_module('custom_shell', run_name='__main__', alter_sys=True)
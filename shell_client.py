@@ -0,0 +1,56 @@
+# Thin client for "custom_shell.py --serve": hands this process's stdin, stdout and stderr to a
+# warm shell session over a Unix socket and exits with the command's status. It imports nothing
+# from the shell, so a command costs one small interpreter start plus a fork on the server.
+# usage: python shell_client.py [--socket PATH] [command line]   (no command: commands from stdin)
+# One argument is a whole command line ("ls | grep py"); several are words, quoted as given.
+import os
+import sys
+import shlex
+import socket
+import struct
+
+SERVER_SOCKET = os.environ.get('IIUI_SOCKET') or os.path.join(
+    os.environ.get('XDG_RUNTIME_DIR') or f'/tmp/iiui_shell-{os.getuid()}', 'iiui_shell.sock')
+
+
+# run one command line (or, if empty, the commands on stdin) in a server session; returns its status
+def run(command, path=SERVER_SOCKET):
+    payload = '\0'.join([os.getcwd(), command] + [f'{name}={value}' for name, value in os.environ.items()])
+    payload = os.fsencode(payload)
+    sys.stdout.flush()
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.connect(path)
+        # the fds and environment only go to a server run by this user, whoever made the socket
+        if hasattr(socket, 'SO_PEERCRED'):
+            _, uid, _ = struct.unpack('3i', connection.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize('3i')))
+        else:
+            uid = os.stat(path).st_uid
+        if uid != os.getuid():
+            raise ConnectionError(f'{path} belongs to uid {uid}, not to this user')
+        message = struct.pack('!I', len(payload)) + payload
+        sent = socket.send_fds(connection, [message], [0, 1, 2])
+        connection.sendall(message[sent:])
+        reply = b''
+        while len(reply) < 4:
+            chunk = connection.recv(4 - len(reply))
+            if not chunk:
+                raise ConnectionError('the session ended without an exit status')
+            reply += chunk
+    return struct.unpack('!i', reply)[0]
+
+
+if __name__ == '__main__':
+    arguments = sys.argv[1:]
+    path = SERVER_SOCKET
+    if arguments[:1] == ['--socket'] and len(arguments) > 1:
+        path, arguments = arguments[1], arguments[2:]
+    try:
+        sys.exit(run(arguments[0] if len(arguments) == 1 else shlex.join(arguments), path))
+    except (FileNotFoundError, ConnectionRefusedError):
+        sys.exit(f'shell_client: no server on {path} (start one with: python custom_shell.py --serve)')
+    except PermissionError as e:
+        sys.exit(f'shell_client: {path}: {e.strerror}')
+    except ConnectionError as e:
+        sys.exit(f'shell_client: {e}')
+    except KeyboardInterrupt:
+        sys.exit(130)